@@ -0,0 +1,512 @@
+"""
+Ежемесячный отчёт микробиологического мониторинга без окна.
+
+На входе — результаты analyze_microbes / analyze_loci / analyze_resistance (как их хранит
+report_state на экране) плюс отделение и период; на выходе — готовый DOCX. Экран
+(microbio_app.do_save_report_docx) только спрашивает, куда сохранить, и вызывает build_monthly_report.
+
+Пакетом — из папки выгрузок ЛИС, по подпапке на отделение:
+    <папка>/<отделение>/*.xlsx   (микроорганизмы, локусы, резистентность — тип определяется по содержимому)
+
+Без окна (из корня проекта):
+    python -m analysis.monthly_report --dir D:\\выгрузки --out D:\\отчёты --month Январь --year 2026
+    python -m analysis.monthly_report --dir D:\\выгрузки --out D:\\отчёты --dep Хирургия --workers 4
+Отчёты раскладываются как архив программы: <out>/<отделение>/<отделение>_<месяц>_<год>.docx.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from docx import Document
+from docx.shared import Inches
+
+from analysis.loci import LOCUS_COLORS, analyze_loci
+from analysis.microbes import analyze_microbes
+from analysis.resistance import analyze_resistance
+from utils.charts import ChartSpec, render_charts_png
+from utils.gram import classify_gram
+from utils.process_pool import pool_size, spawn_without_main
+
+MONTH_NAMES = [
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
+]
+
+# тип выгрузки -> разбор; порядок — как в отчёте
+ANALYZERS = {
+    "microbes": analyze_microbes,
+    "loci": analyze_loci,
+    "resistance": analyze_resistance,
+}
+
+KIND_TITLES = {
+    "microbes": "Микроорганизмы",
+    "loci": "Локусы",
+    "resistance": "Резистентность",
+}
+
+# подсказка по имени файла, если содержимое подходит под несколько типов
+_KIND_HINTS = {
+    "microbes": ("микроорг", "microb"),
+    "loci": ("локус", "loci", "locus", "биомат"),
+    "resistance": ("резист", "resist", "чувствит"),
+}
+
+GRAM_GROUPS = ("Gram+", "Gram-", "Грибы", "Не классифицировано")
+
+
+# -------------------------
+# данные
+# -------------------------
+
+def normalize_gram(name: str) -> str:
+    name = (name or "").lower()
+    if "полож" in name:
+        return "Gram+"
+    if "отриц" in name:
+        return "Gram-"
+    if "гриб" in name or "fung" in name:
+        return "Грибы"
+    return "Не классифицировано"
+
+
+def apply_gram(result: dict) -> dict:
+    """
+    Группа Gram для каждого микроорганизма (Gram+/Gram-/Грибы/Не классифицировано).
+    Выставленное вручную (gram_source="manual") не трогается. Меняет result на месте.
+    """
+    for m in result.get("microbes", []):
+        if m.get("gram_source") == "manual":
+            continue
+        gram_raw = (m.get("gram") or "").strip()
+        if gram_raw in GRAM_GROUPS:
+            m["gram"] = gram_raw
+        else:
+            m["gram"] = normalize_gram(classify_gram(m.get("microbe", "")))
+        m["gram_source"] = m.get("gram_source") or "auto"
+    return result
+
+
+def gram_counts(microbes) -> dict:
+    gram_map = {g: 0 for g in GRAM_GROUPS}
+    for m in microbes:
+        gram = m.get("gram", "Не классифицировано")
+        if gram not in gram_map:
+            gram = "Не классифицировано"
+        gram_map[gram] += int(m.get("count", 0))
+    return gram_map
+
+
+def detect_export(path: str) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Пробует файл всеми разборами: ({тип: результат}, {тип: ошибка}).
+    """
+    results: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    for kind, analyze in ANALYZERS.items():
+        try:
+            results[kind] = analyze(path)
+        except Exception as e:
+            errors[kind] = str(e) or "Не удалось прочитать файл"
+    return results, errors
+
+
+def load_exports(paths: Iterable[str]) -> Dict[str, dict]:
+    """
+    report_state по набору выгрузок одного отделения: {тип: результат}.
+    Тип определяется по содержимому; если подходит несколько — по имени файла,
+    затем по ещё не занятому типу. Неопознанный или спорный файл — ValueError.
+    """
+    state: Dict[str, dict] = {}
+    for path in sorted(paths):
+        results, errors = detect_export(path)
+        if not results:
+            details = "; ".join(f"{KIND_TITLES[k]}: {e}" for k, e in errors.items())
+            raise ValueError(f"Не удалось определить тип файла {os.path.basename(path)} ({details})")
+
+        kinds = list(results)
+        if len(kinds) > 1:
+            name = os.path.basename(path).lower()
+            hinted = [k for k in kinds if any(h in name for h in _KIND_HINTS[k])]
+            free = [k for k in (hinted or kinds) if k not in state]
+            kinds = hinted if len(hinted) == 1 else free
+        if len(kinds) != 1:
+            raise ValueError(f"Тип файла {os.path.basename(path)} неоднозначен: "
+                             + ", ".join(KIND_TITLES[k] for k in results))
+
+        kind = kinds[0]
+        if kind in state:
+            raise ValueError(f"Две выгрузки «{KIND_TITLES[kind]}»: {os.path.basename(path)}")
+        state[kind] = apply_gram(results[kind]) if kind == "microbes" else results[kind]
+    return state
+
+
+# -------------------------
+# графики и документ
+# -------------------------
+
+def chart_specs(state: dict) -> Dict[str, ChartSpec]:
+    """
+    Графики отчёта: {ключ: ChartSpec} в порядке появления в документе.
+    """
+    specs = {}
+
+    if state.get("microbes"):
+        microbes = sorted(
+            state["microbes"].get("microbes", []),
+            key=lambda x: int(x.get("count", 0)),
+            reverse=True
+        )
+        specs["microbes"] = ChartSpec(
+            kind="barh",
+            title="Микроорганизмы (количество)",
+            xlabel="Количество",
+            labels=tuple(m["microbe"] for m in microbes)[::-1],
+            values=tuple(int(m["count"]) for m in microbes)[::-1],
+        )
+
+        gram_map = gram_counts(microbes)
+        g_labels = tuple(k for k, v in gram_map.items() if v > 0)
+        specs["gram"] = ChartSpec(
+            kind="bar",
+            title="Распределение по Gram",
+            labels=g_labels,
+            values=tuple(gram_map[k] for k in g_labels),
+            figsize=(7.5, 4.5),
+        )
+
+    if state.get("loci"):
+        groups = state["loci"].get("groups", [])
+        if any(g.get("items") for g in groups):
+            groups_sorted = sorted(groups, key=lambda x: x["count"], reverse=True)
+
+            totals = {}
+            for g in groups_sorted:
+                for it in g.get("items", []):
+                    totals[it["name"]] = totals.get(it["name"], 0) + int(it["count"])
+            loci_order = tuple(sorted(totals.keys(), key=lambda k: totals[k], reverse=True))
+
+            specs["loci"] = ChartSpec(
+                kind="stacked",
+                title="Структура биоматериалов по локусам",
+                xlabel="Количество",
+                labels=tuple(g["group"] for g in groups_sorted),
+                values=tuple(g["count"] for g in groups_sorted),
+                series=loci_order,
+                stacks=tuple(
+                    tuple((it["name"], int(it["count"])) for it in g.get("items", []))
+                    for g in groups_sorted
+                ),
+                colors=tuple((k, LOCUS_COLORS[k]) for k in loci_order if k in LOCUS_COLORS),
+                legend_title="Локус",
+                figsize=(10, 5.2),
+            )
+
+    if state.get("resistance"):
+        r = state["resistance"]
+        microbes = sorted(r.get("microbes", []), key=lambda x: x["r_percent"], reverse=True)
+        antibiotics = sorted(r.get("antibiotics", []), key=lambda x: x["r_percent"], reverse=True)
+        specs["res_microbes"] = ChartSpec(
+            kind="barh",
+            title="Резистентность по микроорганизмам",
+            xlabel="R (%)",
+            value_fmt="number",
+            labels=tuple(m["microbe"] for m in microbes)[::-1],
+            values=tuple(m["r_percent"] for m in microbes)[::-1],
+        )
+        specs["res_antibiotics"] = ChartSpec(
+            kind="barh",
+            title="Резистентность по антибиотикам",
+            xlabel="R (%)",
+            value_fmt="number",
+            labels=tuple(a["antibiotic"] for a in antibiotics)[::-1],
+            values=tuple(a["r_percent"] for a in antibiotics)[::-1],
+        )
+
+    return specs
+
+
+def build_report_doc(state: dict, department, month, year, images: Dict[str, bytes]) -> Document:
+    """
+    DOCX отчёта; images — PNG графиков по ключам chart_specs (нет ключа — нет графика).
+    """
+    doc = Document()
+
+    def _add_chart(key):
+        if key in images:
+            doc.add_picture(io.BytesIO(images[key]), width=Inches(6.5))
+
+    # ==================================================
+    # ЗАГОЛОВОК
+    # ==================================================
+    doc.add_heading("Эпидемиологический отчёт", level=1)
+
+    p = doc.add_paragraph()
+    p.add_run("Отделение: ").bold = True
+    p.add_run(str(department or "") + "\n")
+    p.add_run("Период: ").bold = True
+    p.add_run(f"{month or ''} {year or ''}")
+
+    # ==================================================
+    # 1. МИКРООРГАНИЗМЫ + GRAM
+    # ==================================================
+    if state.get("microbes"):
+        r = state["microbes"]
+
+        doc.add_heading("1. Микроорганизмы", level=2)
+
+        total = int(r.get("total", 0))
+        doc.add_paragraph(f"Всего выделено микроорганизмов: {total}.")
+
+        microbes = sorted(
+            r.get("microbes", []),
+            key=lambda x: int(x.get("count", 0)),
+            reverse=True
+        )
+
+        for m in microbes:
+            doc.add_paragraph(
+                f"{m.get('microbe','')} — {m.get('count',0)} ({m.get('percent',0)}%)",
+                style="List Bullet"
+            )
+
+        # ---------- GRAM ----------
+        doc.add_paragraph("Распределение по Gram")
+
+        for gram, count in gram_counts(microbes).items():
+            if count and total:
+                percent = round(count / total * 100, 1)
+                doc.add_paragraph(
+                    f"{gram}: {count} ({percent}%)",
+                    style="List Bullet"
+                )
+
+        # ---------- ГРАФИКИ: микроорганизмы, Gram ----------
+        _add_chart("microbes")
+        _add_chart("gram")
+
+    # ==================================================
+    # 2. ЛОКУСЫ
+    # ==================================================
+    if state.get("loci"):
+        r = state["loci"]
+        groups = r.get("groups", [])
+
+        doc.add_heading("2. Локусы", level=2)
+
+        for g in groups:
+            doc.add_paragraph(
+                f"{g.get('group','')} — {g.get('count',0)} ({g.get('percent',0)}%)",
+                style="List Bullet"
+            )
+            for it in g.get("items", []) or []:
+                doc.add_paragraph(
+                    f"{it.get('name','')} — {it.get('count',0)} ({it.get('percent',0)}%)",
+                    style="List Bullet 2"
+                )
+
+        _add_chart("loci")
+
+    # ==================================================
+    # 3. РЕЗИСТЕНТНОСТЬ
+    # ==================================================
+    if state.get("resistance"):
+        r = state["resistance"]
+
+        doc.add_heading("3. Резистентность", level=2)
+
+        microbes = sorted(r.get("microbes", []), key=lambda x: x["r_percent"], reverse=True)
+        antibiotics = sorted(r.get("antibiotics", []), key=lambda x: x["r_percent"], reverse=True)
+
+        doc.add_paragraph("Резистентность по микроорганизмам")
+        for m in microbes:
+            doc.add_paragraph(
+                f'{m["microbe"]} — R {m["r_percent"]}% ({m["r_count"]}/{m["total"]})',
+                style="List Bullet"
+            )
+
+        doc.add_paragraph("Резистентность по антибиотикам")
+        for a in antibiotics:
+            doc.add_paragraph(
+                f'{a["antibiotic"]} — R {a["r_percent"]}% ({a["r_count"]}/{a["total"]})',
+                style="List Bullet"
+            )
+
+        _add_chart("res_microbes")
+        _add_chart("res_antibiotics")
+
+    return doc
+
+
+def build_monthly_report(state: dict, department, month, year) -> Document:
+    """
+    Готовый DOCX (python-docx Document) по результатам трёх разборов.
+    state — {"microbes": ..., "loci": ..., "resistance": ...}; отсутствующие разделы пропускаются.
+    Графики рисуются в текущем потоке (окно зовёт это из фонового).
+    """
+    specs = chart_specs(state)
+    images = dict(zip(specs, render_charts_png(list(specs.values()))))
+    return build_report_doc(state, department, month, year, images)
+
+
+def report_base_name(department, month, year) -> str:
+    return f"{department}_{month}_{year}".replace(" ", "_")
+
+
+def archive_report_path(archive_dir: str, department, month, year) -> str:
+    """
+    <archive_dir>/<отделение>/<отделение>_<месяц>_<год>.docx — как в архиве программы.
+    """
+    dep_name = (department or "Без_отделения").replace("/", "_").replace("\\", "_")
+    return os.path.join(archive_dir, dep_name, report_base_name(department, month, year) + ".docx")
+
+
+# -------------------------
+# пакет: папка выгрузок -> отчёты всех отделений
+# -------------------------
+
+@dataclass
+class MonthlyItem:
+    department: str
+    docx: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.docx is not None
+
+
+# (готово, всего, последний завершённый)
+MonthlyProgress = Callable[[int, int, MonthlyItem], None]
+
+
+def find_department_exports(folder: str, deps: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """
+    {отделение: [xlsx-выгрузки]} по подпапкам folder; deps — только эти отделения.
+    """
+    wanted = {str(d).strip() for d in deps if str(d).strip()} if deps is not None else None
+    out: Dict[str, List[str]] = {}
+    for sub in sorted(Path(folder).iterdir()):
+        if not sub.is_dir() or (wanted is not None and sub.name not in wanted):
+            continue
+        files = [str(p) for p in sorted(sub.iterdir())
+                 if p.suffix.lower() in (".xlsx", ".xls") and not p.name.startswith("~$")]
+        if files:
+            out[sub.name] = files
+    return out
+
+
+def _build_department(department: str, files: List[str], out_path: str, month, year) -> str:
+    """
+    Один отчёт в процессе пула: разбор выгрузок, графики, DOCX.
+    """
+    state = load_exports(files)
+    doc = build_monthly_report(state, department, month, year)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    doc.save(out_path)
+    return out_path
+
+
+def build_folder_reports(
+    folder: str,
+    out_dir: str,
+    month,
+    year,
+    *,
+    deps: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    progress: Optional[MonthlyProgress] = None,
+) -> List[MonthlyItem]:
+    """
+    Отчёты всех отделений из папки выгрузок (find_department_exports) — по процессу на отделение.
+    Ошибка одного отделения остаётся в MonthlyItem.error и не останавливает остальные.
+    """
+    exports = find_department_exports(folder, deps)
+    items = [MonthlyItem(department=dep) for dep in exports]
+    jobs = {
+        i: (item.department, exports[item.department],
+            archive_report_path(out_dir, item.department, month, year), month, year)
+        for i, item in enumerate(items)
+    }
+
+    done = 0
+
+    def _finish(i: int, result: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        nonlocal done
+        item = items[i]
+        if error is not None:
+            item.error = str(error) or error.__class__.__name__
+        else:
+            item.docx = result
+        done += 1
+        if progress is not None:
+            progress(done, len(items), item)
+
+    n = pool_size(len(jobs), workers)
+    if n <= 1:
+        for i, args in jobs.items():
+            try:
+                _finish(i, _build_department(*args))
+            except Exception as e:
+                _finish(i, error=e)
+        return items
+
+    ex = ProcessPoolExecutor(max_workers=n)
+    try:
+        with spawn_without_main():
+            futures = {ex.submit(_build_department, *args): i for i, args in jobs.items()}
+        left = set(futures)
+        while left:
+            finished, left = wait(left, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                try:
+                    _finish(futures[fut], fut.result())
+                except Exception as e:
+                    _finish(futures[fut], error=e)
+    finally:
+        ex.shutdown(cancel_futures=True)
+    return items
+
+
+def summarize(items: Sequence[MonthlyItem]) -> str:
+    ok = [it for it in items if it.ok]
+    lines = [f"Сформировано отчётов: {len(ok)} из {len(items)}"]
+    for it in items:
+        if not it.ok:
+            lines.append(f"  ✗ {it.department}: {it.error}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    today = datetime.date.today()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dir", required=True, help="папка выгрузок ЛИС: подпапка на отделение")
+    ap.add_argument("--out", required=True, help="папка отчётов (раскладка как в архиве программы)")
+    ap.add_argument("--month", default=MONTH_NAMES[today.month - 1], help="месяц, как в программе: Январь…Декабрь")
+    ap.add_argument("--year", default=str(today.year))
+    ap.add_argument("--dep", action="append", help="отделение (можно несколько); по умолчанию — все подпапки")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    def _progress(done: int, total: int, item: MonthlyItem) -> None:
+        mark = "ok" if item.ok else "ошибка"
+        print(f"[{done}/{total}] {item.department}: {mark}")
+
+    items = build_folder_reports(args.dir, args.out, args.month, args.year,
+                                 deps=args.dep, workers=args.workers, progress=_progress)
+    if not items:
+        print(f"В {args.dir} нет подпапок с выгрузками")
+        return 1
+    print(summarize(items))
+    return 0 if all(it.ok for it in items) else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,373 @@
+"""
+Пакетное формирование протоколов смывов: много (отделение, дата) за один запуск.
+
+- шаблон читается один раз (кеш load_template) и раздаётся воркерам уже подготовленным
+- протоколы, которые уже лежат в папке отчётов с теми же данными и шаблоном, не пересобираются
+  (analysis/report_cache.py)
+- DOCX собираются в пуле процессов (python-docx упирается в CPU)
+- PDF: через Word/LibreOffice — общая очередь конвертации (services/pdf_converter.py),
+  задачи ставятся по мере готовности DOCX и идут параллельно со сборкой следующих;
+  без офиса (pdf_backend="native") — reportlab прямо в воркерах
+
+Без окна (из корня проекта):
+    python -m analysis.report_batch --date 12.01.2026
+    python -m analysis.report_batch --date 12.01.2026 --dep 1АФО --dep ГО --no-pdf
+    python -m analysis.report_batch --date 12.01.2026 --pdf-backend native
+    python -m analysis.report_batch --date 12.01.2026 --combined   # все отделения одним документом
+Пути к журналу/шаблону/папке отчётов и привязки берутся из конфига, если не заданы ключами.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from analysis.report_builder import (
+    PDF_BACKENDS,
+    PDF_NATIVE,
+    PDF_WORD,
+    REPORT_LAYOUT_VERSION,
+    DepartmentFrames,
+    PreparedTemplate,
+    build_combined_report,
+    build_docx_report,
+    check_pdf_backend,
+    combined_file_name,
+    load_template,
+    report_file_name,
+)
+from analysis import report_cache
+from analysis.report_pdf import save_pdf_native
+from analysis.swabs_journal import SHEETS_DEFAULT, SwabsJournal
+from services.pdf_converter import DONE, STATUS_TEXT, PdfJob, get_converter
+from utils.process_pool import pool_size, spawn_without_main
+
+
+@dataclass
+class BatchItem:
+    dep: str
+    day: pd.Timestamp
+    docx: Optional[str] = None        # DOCX в папке отчётов
+    pdf: Optional[str] = None
+    error: Optional[str] = None       # протокол не сформирован
+    pdf_error: Optional[str] = None   # DOCX есть, PDF — нет
+    cached: bool = False              # взят готовый из папки отчётов (данные не менялись)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.docx is not None
+
+
+# (готово, всего, последний завершённый)
+BatchProgress = Callable[[int, int, BatchItem], None]
+
+
+def batch_pairs(journal: SwabsJournal, day: pd.Timestamp,
+                deps: Optional[Iterable[str]] = None) -> List[Tuple[str, pd.Timestamp]]:
+    """
+    (отделение, дата) для пакета: выбранные отделения или все, у кого есть данные на дату.
+    """
+    day = pd.Timestamp(day).normalize()
+    available = journal.departments_for_date(day)
+    if deps is None:
+        return [(dep, day) for dep in available]
+    wanted = [d for d in (str(x).strip() for x in deps) if d]
+    return [(dep, day) for dep in wanted if dep in available]
+
+
+def combined_sections(journal: SwabsJournal, day: pd.Timestamp,
+                      deps: Optional[Iterable[str]] = None) -> List[DepartmentFrames]:
+    """
+    Отделения пакета (batch_pairs) вместе с их листами — для build_combined_report.
+    """
+    return [
+        (dep, *(journal.filter_day(dep, d, sh) for sh in SHEETS_DEFAULT))
+        for dep, d in batch_pairs(journal, day, deps)
+    ]
+
+
+# шаблон в процессе-воркере: передаётся один раз при старте процесса (initializer), а не с каждой задачей
+_TEMPLATE: Optional[PreparedTemplate] = None
+
+
+def _init_worker(template: PreparedTemplate) -> None:
+    global _TEMPLATE
+    _TEMPLATE = template
+
+
+def _build_one(out_path: str, dep: str, day: pd.Timestamp,
+               frames: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame],
+               report_dir: str, native_pdf: bool) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+    """
+    (docx во временной папке, копия в папке отчётов, pdf, ошибка pdf).
+    """
+    saved, word_copy, _ = build_docx_report(
+        _TEMPLATE, out_path, dep, day, *frames,
+        auto_word_dir=report_dir, pdf_backend=None, use_cache=False,
+    )
+    pdf = pdf_error = None
+    if native_pdf:
+        try:
+            pdf = os.path.join(report_dir, Path(saved).stem + ".pdf")
+            save_pdf_native(saved, pdf)
+        except Exception as e:
+            pdf, pdf_error = None, str(e) or e.__class__.__name__
+    return saved, word_copy, pdf, pdf_error
+
+
+def build_reports_batch(
+    journal: SwabsJournal,
+    template_path: str,
+    pairs: Sequence[Tuple[str, pd.Timestamp]],
+    report_dir: str,
+    *,
+    tmp_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    pdf_backend: Optional[str] = PDF_WORD,
+    progress: Optional[BatchProgress] = None,
+    cancel: Optional[threading.Event] = None,
+    use_cache: bool = True,
+) -> List[BatchItem]:
+    """
+    Протоколы для всех pairs. Ошибка одного протокола не останавливает пакет —
+    она остаётся в BatchItem.error; отмена (cancel) помечает недоделанные как "Отменено".
+    Результат — в порядке pairs.
+    pdf_backend — как в build_docx_report ("word" / "libreoffice" / "native" / None — без PDF).
+    progress приходит, когда протокол готов целиком (DOCX и PDF), — в том числе из потока
+    сервиса конвертации.
+    use_cache — готовые протоколы с теми же данными не пересобираются (BatchItem.cached);
+    индекс кеша ведёт только этот процесс, воркеры его не трогают.
+    """
+    pdf_backend = check_pdf_backend(pdf_backend)
+    native_pdf = pdf_backend == PDF_NATIVE
+    template = load_template(template_path)
+    tmp_dir = tmp_dir or str(Path.cwd() / "_tmp_reports")
+    Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+
+    items: List[BatchItem] = []
+    jobs: Dict[int, tuple] = {}
+    keys: Dict[int, str] = {}
+    for dep, day in pairs:
+        day = pd.Timestamp(day).normalize()
+        item = BatchItem(dep=dep, day=day)
+        items.append(item)
+
+        frames = tuple(journal.filter_day(dep, day, sh) for sh in SHEETS_DEFAULT)
+        if all(f is None or f.empty for f in frames):
+            item.error = "Нет данных на эту дату"
+            continue
+        has_air = not frames[1].empty
+        has_smears = not frames[2].empty
+        name = report_file_name(dep, day, has_air, has_smears)
+        if use_cache:
+            key = report_cache.report_key(dep, day, frames, template.digest, REPORT_LAYOUT_VERSION)
+            hit = report_cache.lookup(report_dir, name, key, pdf_backend=pdf_backend)
+            if hit is not None:
+                item.docx, item.pdf = hit
+                item.cached = True
+                continue
+            keys[len(items) - 1] = key
+        jobs[len(items) - 1] = (os.path.join(tmp_dir, name), dep, day, frames, report_dir, native_pdf)
+
+    total = len(items)
+    done = total - len(jobs)
+    done_lock = threading.Lock()
+    converter = get_converter(pdf_backend) if pdf_backend not in (None, PDF_NATIVE) else None
+    pdf_jobs: List[PdfJob] = []
+
+    def _report(item: BatchItem) -> None:
+        nonlocal done
+        with done_lock:
+            done += 1
+            n_done = done
+        if progress is not None:
+            progress(n_done, total, item)
+
+    def _pdf_status(item: BatchItem, job: PdfJob) -> None:
+        if not job.finished:
+            return
+        if job.status == DONE:
+            item.pdf = job.pdf_path
+        else:
+            item.pdf_error = job.error or STATUS_TEXT.get(job.status, job.status)
+        _report(item)
+
+    def _finish(i: int, result=None, error: Optional[BaseException] = None) -> None:
+        item = items[i]
+        if error is not None:
+            item.error = str(error) or error.__class__.__name__
+            _report(item)
+            return
+
+        saved, word_copy, item.pdf, item.pdf_error = result
+        item.docx = word_copy or saved
+        if word_copy is None:
+            keys.pop(i, None)   # в папку отчётов не скопировался — в кеш не пишем
+        if converter is None:
+            _report(item)
+            return
+        pdf_path = os.path.join(report_dir, Path(saved).stem + ".pdf")
+        pdf_jobs.append(converter.submit(saved, pdf_path, on_status=lambda job, item=item: _pdf_status(item, job)))
+
+    n = pool_size(len(jobs), workers)
+    if n <= 1:
+        _init_worker(template)
+        for i, args in jobs.items():
+            if cancel is not None and cancel.is_set():
+                break
+            try:
+                _finish(i, _build_one(*args))
+            except Exception as e:
+                _finish(i, error=e)
+    else:
+        _run_pool(jobs, template, n, _finish, cancel)
+
+    # дожидаемся PDF; при отмене снимаем те, что ещё в очереди
+    for job in pdf_jobs:
+        while not job.wait(0.5):
+            if cancel is not None and cancel.is_set():
+                job.cancel()
+
+    # в индекс — только полные комплекты, собранные сейчас
+    entries = {}
+    for i, key in keys.items():
+        item = items[i]
+        if item.ok and (pdf_backend is None or item.pdf):
+            entries[Path(item.docx).name] = report_cache.make_entry(key, item.docx, item.pdf, pdf_backend)
+    report_cache.record(report_dir, entries)
+
+    for item in items:
+        if item.error is None and item.docx is None:
+            item.error = "Отменено"
+    return items
+
+
+def _run_pool(jobs: Dict[int, tuple], template: PreparedTemplate, workers: int,
+              finish: Callable, cancel: Optional[threading.Event]) -> None:
+    ex = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,))
+    try:
+        with spawn_without_main():
+            futures = {ex.submit(_build_one, *args): i for i, args in jobs.items()}
+
+        left = set(futures)
+        while left:
+            if cancel is not None and cancel.is_set():
+                break
+            done, left = wait(left, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    finish(futures[fut], fut.result())
+                except Exception as e:
+                    finish(futures[fut], error=e)
+    finally:
+        ex.shutdown(wait=cancel is None or not cancel.is_set(), cancel_futures=True)
+
+
+def summarize(items: Sequence[BatchItem]) -> str:
+    """
+    Текстовая сводка пакета (для окна итогов и консоли).
+    """
+    ok = [it for it in items if it.ok]
+    failed = [it for it in items if not it.ok]
+    no_pdf = [it for it in ok if it.pdf_error]
+    cached = [it for it in ok if it.cached]
+
+    lines = [f"Сформировано протоколов: {len(ok)} из {len(items)}"]
+    if cached:
+        lines.append(f"Без изменений (взяты готовые): {len(cached)}")
+    if no_pdf:
+        lines.append(f"Не удалось сохранить PDF: {len(no_pdf)}")
+    for it in failed:
+        lines.append(f"  ✗ {it.dep} {it.day:%d.%m.%Y}: {it.error}")
+    for it in no_pdf:
+        lines.append(f"  PDF {it.dep} {it.day:%d.%m.%Y}: {it.pdf_error}")
+    return "\n".join(lines)
+
+
+# -------------------------
+# запуск без окна
+# -------------------------
+
+def _base_mapping(journal: SwabsJournal, aliases_path: str, departments: List[str]) -> Dict[str, str]:
+    """
+    То же, что build_base_mapping на экране мониторинга: aliases.json + точные совпадения.
+    Неизвестные отделения без окна не спросить — их протоколы просто не попадут в пакет.
+    """
+    from analysis.dep_mapper import load_aliases, try_match_department
+
+    aliases = load_aliases(aliases_path)
+    mapping = dict(aliases)
+    departments = departments or sorted(set(aliases.values()))
+    for raw in journal.unique_raw_departments():
+        if raw in mapping:
+            continue
+        matched, _reason = try_match_department(raw, departments, aliases)
+        if matched:
+            mapping[raw] = matched
+    return mapping
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from config.app_config import load_config
+
+    cfg = load_config()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--date", required=True, help="дата отбора, дд.мм.гггг")
+    ap.add_argument("--dep", action="append", help="отделение (можно несколько); по умолчанию — все за дату")
+    ap.add_argument("--journal", default=cfg.get("swabs_journal_xlsx", ""))
+    ap.add_argument("--template", default=cfg.get("swabs_template_path", ""))
+    ap.add_argument("--out", default=cfg.get("swabs_report_dir", ""), help="папка отчётов")
+    ap.add_argument("--aliases", default=cfg.get("swabs_aliases_json", ""))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--no-pdf", action="store_true")
+    ap.add_argument("--combined", action="store_true", help="один сводный документ с оглавлением вместо протокола на отделение")
+    ap.add_argument("--pdf-backend", choices=PDF_BACKENDS, default=cfg.get("swabs_pdf_backend", PDF_WORD),
+                    help="чем делать PDF: word (Microsoft Word), libreoffice или native (reportlab, без офиса)")
+    args = ap.parse_args(argv)
+
+    if not args.template or not args.out:
+        ap.error("не задан шаблон (--template) или папка отчётов (--out)")
+
+    journal = SwabsJournal(path=args.journal, engine=cfg.get("swabs_journal_engine", "auto"))
+    journal.load()
+    departments = [str(d).strip() for d in (cfg.get("departments") or []) if str(d).strip()]
+    journal.apply_department_mapping(_base_mapping(journal, args.aliases, departments))
+
+    day = pd.to_datetime(args.date, dayfirst=True).normalize()
+    pairs = batch_pairs(journal, day, args.dep)
+    if not pairs:
+        print(f"Нет данных на {day:%d.%m.%Y}")
+        return 1
+
+    if args.combined:
+        out = os.path.join(str(Path.cwd() / "_tmp_reports"), combined_file_name(day))
+        _, docx, pdf = build_combined_report(
+            args.template, out, day, combined_sections(journal, day, args.dep),
+            auto_word_dir=args.out, auto_pdf_dir=args.out,
+            pdf_backend=None if args.no_pdf else args.pdf_backend,
+        )
+        print(f"Сводный протокол ({len(pairs)} отд.): {docx or out}")
+        if pdf:
+            print(f"PDF: {pdf}")
+        return 0 if docx else 2
+
+    def _progress(done: int, total: int, item: BatchItem) -> None:
+        mark = "ok" if item.ok else "ошибка"
+        print(f"[{done}/{total}] {item.dep}: {mark}")
+
+    items = build_reports_batch(
+        journal, args.template, pairs, args.out,
+        workers=args.workers, pdf_backend=None if args.no_pdf else args.pdf_backend, progress=_progress,
+    )
+    print(summarize(items))
+    return 0 if all(it.ok for it in items) else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+import hashlib
+import io
 import os
 import re
-import time
+import threading
 import shutil
 from copy import deepcopy
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import pandas as pd
 from docx import Document
 from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from docx.shared import Pt
+from docx.shared import Cm, Pt
+
+from analysis import report_cache
+from analysis.report_pdf import render_docx_pdf
+from analysis.swabs_cache import file_signature
+from services.copy_queue import CopyQueue
+from services.pdf_converter import PdfJob, get_converter
 
 
 # =========================
@@ -48,6 +58,11 @@ def _norm_culture(x: object) -> str:
 
 
 def _find_col_like(df: pd.DataFrame, needle: str) -> Optional[str]:
+    # кадры из SwabsJournal уже несут найденные колонки (attrs["resolved_columns"]) — не ищем заново
+    resolved = (df.attrs.get("resolved_columns") or {}).get(needle)
+    if resolved is not None and resolved in df.columns:
+        return resolved
+
     needle = (needle or "").strip().lower()
     for c in df.columns:
         if needle in str(c).strip().lower():
@@ -152,6 +167,67 @@ def _clear_table_data_rows(table) -> None:
         tr.getparent().remove(tr)
 
 
+def _table_rows(df: pd.DataFrame, cols: List[str]) -> List[List[str]]:
+    """
+    Строки таблицы акта по колонкам df (последняя — выделенная культура), с номером первой ячейкой.
+    Строка без текста и без культуры пропускается и номер не занимает.
+    """
+    *text_cols, cult_col = cols
+    texts = [[_norm_text(v) for v in df[c].tolist()] for c in text_cols]
+    cults = [_norm_culture(v) for v in df[cult_col].tolist()]
+
+    rows: List[List[str]] = []
+    for *vals, cult in zip(*texts, cults):
+        if cult == "-" and not any(vals):
+            continue
+        rows.append([str(len(rows) + 1), *vals, cult])
+    return rows
+
+
+_RUN_SPECIAL_RE = re.compile(r"[\t\r\n]")
+
+
+def _set_run_text(r, text: str) -> None:
+    """
+    Текст готового w:r (с rPr): обычную строку пишем прямо в w:t,
+    табы/переводы строк и пустую строку отдаём python-docx — он раскладывает их на w:tab/w:br.
+    """
+    t = r.find(qn("w:t"))
+    if t is None or not text or _RUN_SPECIAL_RE.search(text):
+        r.text = text
+        return
+    t.text = text
+    if len(text.strip()) < len(text):
+        t.set(qn("xml:space"), "preserve")
+
+
+def _append_table_rows(table, rows: List[List[str]], *,
+                       font_name: str = "Times New Roman", font_size: int = 12) -> None:
+    """
+    Быстрое заполнение таблицы: одна строка-образец <w:tr> оформляется через python-docx
+    (как _set_cell_text), дальше для каждой строки данных — копия образца и подстановка текста.
+    XML получается тот же, что при add_row + _set_cell_text на каждую ячейку.
+    """
+    if not rows:
+        return
+
+    proto = table.add_row()
+    cells = proto.cells
+    for k in range(len(rows[0])):
+        _set_cell_text(cells[k], "0", font_name=font_name, font_size=font_size)
+
+    tr = proto._tr
+    tbl = tr.getparent()
+    tbl.remove(tr)
+
+    for values in rows:
+        new_tr = deepcopy(tr)
+        # в каждой оформленной ячейке текст несёт последний run первого абзаца
+        for r, text in zip(new_tr.xpath("./w:tc/w:p[1]/w:r[last()]"), values):
+            _set_run_text(r, text)
+        tbl.append(new_tr)
+
+
 # -------------------------
 # Word -> PDF
 # -------------------------
@@ -159,60 +235,72 @@ def _clear_table_data_rows(table) -> None:
 def save_pdf_via_word(docx_path: str, pdf_path: str) -> None:
     """
     Конвертирует DOCX в PDF через установленный Microsoft Word (Windows only).
+    Идёт через общий сервис конвертации: Word уже запущен — повторно не стартует.
     """
-    import win32com.client  # type: ignore
+    get_converter(PDF_WORD).convert(docx_path, pdf_path)
 
-    docx_path = os.path.normpath(os.path.abspath(docx_path))
-    pdf_path = os.path.normpath(os.path.abspath(pdf_path))
 
-    if not os.path.exists(docx_path):
-        raise FileNotFoundError(f"DOCX не найден: {docx_path}")
+# чем делать PDF протокола: Word (COM, только Windows), LibreOffice без окна —
+# оба через общий сервис конвертации (services/pdf_converter.py) — или reportlab (analysis/report_pdf.py)
+PDF_WORD = "word"
+PDF_LIBREOFFICE = "libreoffice"
+PDF_NATIVE = "native"
+PDF_BACKENDS = (PDF_WORD, PDF_LIBREOFFICE, PDF_NATIVE)
 
-    word = win32com.client.DispatchEx("Word.Application")
-    word.Visible = False
-    word.DisplayAlerts = 0
 
-    doc = None
-    try:
-        time.sleep(0.1)
-        doc = word.Documents.Open(docx_path, ReadOnly=1)
-        # 17 = wdFormatPDF
-        doc.SaveAs(pdf_path, FileFormat=17)
-    finally:
-        try:
-            if doc is not None:
-                doc.Close(False)
-        except Exception:
-            pass
-        word.Quit()
+def check_pdf_backend(backend: Optional[str]) -> Optional[str]:
+    """
+    Проверяет значение (в т.ч. из конфига swabs_pdf_backend); None — PDF не делать.
+    """
+    if backend is None:
+        return None
+    backend = str(backend).strip().lower()
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Неизвестный способ PDF: {backend!r} (ожидается {' / '.join(PDF_BACKENDS)})")
+    return backend
 
 
 # -------------------------
 # header fill
 # -------------------------
 
-def _set_sampling_date_and_dep(doc: Document, dep: str, date_str: str) -> None:
+_DATE_LINE_RE = re.compile(r"(Дата\s+отбора\s+проб:\s*)(.+)$")
+
+
+def _find_date_anchors(doc: Document) -> List[Tuple[int, Optional[int]]]:
     """
-    Для КАЖДОГО блока:
-    1) заменяем дату в строках "Дата отбора проб: ..."
-    2) следующий непустой абзац после этой строки считаем отделением:
-       жирный, Times New Roman 14
+    (абзац "Дата отбора проб: ...", следующий непустой абзац — отделение или None)
+    — индексы в doc.paragraphs.
     """
     paras = doc.paragraphs
-
+    anchors: List[Tuple[int, Optional[int]]] = []
     for i, p in enumerate(paras):
-        replaced = _replace_in_paragraph(
-            p,
-            r"(Дата\s+отбора\s+проб:\s*)(.+)$",
-            r"\g<1>" + date_str
-        )
-        if not replaced:
+        if not _DATE_LINE_RE.search("".join(r.text for r in p.runs)):
             continue
-
         j = i + 1
         while j < len(paras) and not (paras[j].text or "").strip():
             j += 1
-        if j < len(paras):
+        anchors.append((i, j if j < len(paras) else None))
+    return anchors
+
+
+def _set_sampling_date_and_dep(doc: Document, dep: str, date_str: str,
+                               anchors: Optional[List[Tuple[int, Optional[int]]]] = None) -> None:
+    """
+    Для КАЖДОГО блока:
+    1) заменяем дату в строках "Дата отбора проб: ..."
+    2) следующий непустой абзац после этой строки считаем отделением:
+       жирный, Times New Roman 14
+
+    anchors — уже найденные в шаблоне абзацы (см. _find_date_anchors), чтобы не искать заново.
+    """
+    paras = doc.paragraphs
+    if anchors is None:
+        anchors = _find_date_anchors(doc)
+
+    for i, j in anchors:
+        _replace_in_paragraph(paras[i], _DATE_LINE_RE.pattern, r"\g<1>" + date_str)
+        if j is not None:
             _set_paragraph_text(
                 paras[j],
                 dep,
@@ -222,6 +310,81 @@ def _set_sampling_date_and_dep(doc: Document, dep: str, date_str: str) -> None:
             )
 
 
+# -------------------------
+# template cache
+# -------------------------
+
+@dataclass
+class PreparedTemplate:
+    """
+    Шаблон, уже прочитанный и подготовленный: альбомная ориентация выставлена,
+    абзацы даты/отделения найдены. data — готовый DOCX в памяти, каждый отчёт открывает его заново.
+    digest — sha1 исходного файла шаблона (для кеша готовых протоколов).
+    """
+    data: bytes
+    anchors: List[Tuple[int, Optional[int]]]
+    digest: str
+
+    def open(self) -> Document:
+        return Document(io.BytesIO(self.data))
+
+
+# ключ: путь (или sha1 содержимого для bytes) -> (сигнатура файла, шаблон)
+_TEMPLATES: Dict[str, Tuple[Optional[Tuple[int, int]], PreparedTemplate]] = {}
+_TEMPLATES_LOCK = threading.Lock()
+_TEMPLATES_MAX = 4
+
+
+def _prepare_template(source: Union[str, bytes]) -> PreparedTemplate:
+    raw = source if isinstance(source, bytes) else Path(source).read_bytes()
+    doc = Document(io.BytesIO(raw))
+    _enforce_landscape(doc)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return PreparedTemplate(
+        data=buf.getvalue(),
+        anchors=_find_date_anchors(doc),
+        digest=hashlib.sha1(raw).hexdigest(),
+    )
+
+
+def load_template(template: Union[str, bytes, PreparedTemplate]) -> PreparedTemplate:
+    """
+    Подготовленный шаблон из кеша процесса. Для пути — ключ путь + (размер, mtime):
+    пока файл не меняли, сеть трогает только stat. Для bytes — ключ по содержимому.
+    Уже подготовленный (PreparedTemplate, например переданный в воркер пакета) — как есть.
+    """
+    if isinstance(template, PreparedTemplate):
+        return template
+    if isinstance(template, bytes):
+        key = "sha1:" + hashlib.sha1(template).hexdigest()
+        sig = None
+    else:
+        key = os.path.normcase(os.path.abspath(str(template)))
+        sig = file_signature(key)
+        if sig is None:
+            raise FileNotFoundError(f"Шаблон не найден: {template}")
+
+    with _TEMPLATES_LOCK:
+        hit = _TEMPLATES.get(key)
+        if hit is not None and hit[0] == sig:
+            return hit[1]
+
+    prepared = _prepare_template(template)
+
+    with _TEMPLATES_LOCK:
+        _TEMPLATES.pop(key, None)
+        while len(_TEMPLATES) >= _TEMPLATES_MAX:
+            _TEMPLATES.pop(next(iter(_TEMPLATES)))
+        _TEMPLATES[key] = (sig, prepared)
+    return prepared
+
+
+def clear_template_cache() -> None:
+    with _TEMPLATES_LOCK:
+        _TEMPLATES.clear()
+
+
 # -------------------------
 # tables fill
 # -------------------------
@@ -240,22 +403,7 @@ def _fill_swabs_table(table, df_swabs: pd.DataFrame) -> None:
 
     _set_table_borders(table)
     _clear_table_data_rows(table)
-
-    n = 1
-    for _, row in df_swabs.iterrows():
-        room = _norm_text(row.get(room_col, ""))
-        place = _norm_text(row.get(place_col, ""))
-        cult = _norm_culture(row.get(cult_col, ""))
-
-        if not room and not place and cult == "-":
-            continue
-
-        cells = table.add_row().cells
-        _set_cell_text(cells[0], str(n), font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[1], room, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[2], place, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[3], cult, font_name="Times New Roman", font_size=12)
-        n += 1
+    _append_table_rows(table, _table_rows(df_swabs, [room_col, place_col, cult_col]))
 
 
 def _fill_air_table(table, df_air: pd.DataFrame) -> None:
@@ -273,24 +421,7 @@ def _fill_air_table(table, df_air: pd.DataFrame) -> None:
 
     _set_table_borders(table)
     _clear_table_data_rows(table)
-
-    n = 1
-    for _, row in df_air.iterrows():
-        room = _norm_text(row.get(room_col, ""))
-        cond = _norm_text(row.get(cond_col, ""))
-        omch = _norm_text(row.get(omch_col, ""))
-        cult = _norm_culture(row.get(cult_col, ""))
-
-        if not room and not cond and not omch and cult == "-":
-            continue
-
-        cells = table.add_row().cells
-        _set_cell_text(cells[0], str(n), font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[1], room, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[2], cond, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[3], omch, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[4], cult, font_name="Times New Roman", font_size=12)
-        n += 1
+    _append_table_rows(table, _table_rows(df_air, [room_col, cond_col, omch_col, cult_col]))
 
 
 def _fill_smears_table(table, df_smears: pd.DataFrame) -> None:
@@ -307,46 +438,34 @@ def _fill_smears_table(table, df_smears: pd.DataFrame) -> None:
 
     _set_table_borders(table)
     _clear_table_data_rows(table)
-
-    n = 1
-    for _, row in df_smears.iterrows():
-        fio = _norm_text(row.get(fio_col, ""))
-        place = _norm_text(row.get(place_col, ""))
-        cult = _norm_culture(row.get(cult_col, ""))
-
-        if not fio and not place and cult == "-":
-            continue
-
-        cells = table.add_row().cells
-        _set_cell_text(cells[0], str(n), font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[1], fio, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[2], place, font_name="Times New Roman", font_size=12)
-        _set_cell_text(cells[3], cult, font_name="Times New Roman", font_size=12)
-        n += 1
+    _append_table_rows(table, _table_rows(df_smears, [fio_col, place_col, cult_col]))
 
 
 # -------------------------
-# section removal + page breaks (clean)
+# section layout (drop unused acts + page breaks)
 # -------------------------
 
-def _insert_page_break_at_body_index(doc: Document, idx: int) -> None:
+_W_NS = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+
+
+def _page_break_paragraph():
     """
-    Вставляет разрыв страницы в body перед элементом с индексом idx.
-    На уровне XML, чтобы разрыв гарантированно встал до заголовков акта.
+    Абзац с одним разрывом страницы (w:p/w:r/w:br type=page).
     """
-    body = doc._element.body  # pylint: disable=protected-access
-    children = list(body.iterchildren())
-    if idx <= 0 or idx > len(children):
-        return
-
     p = OxmlElement("w:p")
     r = OxmlElement("w:r")
     br = OxmlElement("w:br")
     br.set(qn("w:type"), "page")
     r.append(br)
     p.append(r)
+    return p
+
 
-    body.insert(idx, p)
+def _is_page_break_paragraph(el) -> bool:
+    if el.tag != qn("w:p"):
+        return False
+    br = el.find(".//w:br", namespaces=_W_NS)
+    return br is not None and br.get(qn("w:type")) == "page"
 
 
 def _is_empty_paragraph_el(p_el) -> bool:
@@ -359,138 +478,246 @@ def _is_empty_paragraph_el(p_el) -> bool:
     if p_el.tag != qn("w:p"):
         return False
 
-    ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
-
     # не трогаем абзацы с разрывом страницы
-    br = p_el.find(".//w:br", namespaces=ns)
-    if br is not None and br.get(qn("w:type")) == "page":
+    if _is_page_break_paragraph(p_el):
         return False
 
     # не трогаем абзацы с рисунками
-    if p_el.find(".//w:drawing", namespaces=ns) is not None:
+    if p_el.find(".//w:drawing", namespaces=_W_NS) is not None:
         return False
 
     # текст
     texts = []
-    for t in p_el.findall(".//w:t", namespaces=ns):
+    for t in p_el.findall(".//w:t", namespaces=_W_NS):
         if t.text:
             texts.append(t.text)
     return "".join(texts).strip() == ""
 
 
-def _start_each_act_on_new_page(doc: Document) -> None:
+def _find_sect_pr(children):
     """
-    Каждый акт с новой страницы, БЕЗ огромных отступов.
-    Удаляем пустые абзацы в начале каждого акта и ставим break перед первым нормальным абзацем.
+    Копия sectPr документа: из body, а если его там нет — из последнего абзаца с pPr/sectPr.
     """
-    body = doc._element.body  # pylint: disable=protected-access
+    for el in children:
+        if el.tag == qn("w:sectPr"):
+            return deepcopy(el)
+    for el in reversed(children):
+        if el.tag == qn("w:p"):
+            pPr = el.find(qn("w:pPr"))
+            if pPr is not None:
+                sp = pPr.find(qn("w:sectPr"))
+                if sp is not None:
+                    return deepcopy(sp)
+    return None
+
+
+def _layout_sections(doc: Document, keep_sections: list[bool]) -> None:
+    """
+    Раскладка актов за один проход по body.
+
+    В шаблоне блоки идут по таблицам:
+      table0 -> смывы
+      table1 -> воздух
+      table2 -> мазки (персонал)
+    Блок — всё от предыдущей таблицы до своей таблицы включительно.
+    keep_sections = [keep_swabs, keep_air, keep_smears]
 
+    - блок без данных удаляется целиком (заголовки/абзацы + таблица)
+    - каждый оставшийся акт (кроме первого) — с новой страницы: пустые абзацы
+      после предыдущей таблицы вычищаются, перед актом ставится разрыв (если его ещё нет)
+    - sectPr сохраняется, чтобы не слетала ориентация
+
+    body собирается заново одним присваиванием.
+    """
+    body = doc._element.body  # pylint: disable=protected-access
     children = list(body.iterchildren())
-    tbl_els = [t._element for t in doc.tables]
+    tbl_tag = qn("w:tbl")
+
+    sectPr_copy = _find_sect_pr(children)
+
+    # 1) блоки по таблицам: выкидываем ненужные
+    kept = []
+    section = 0
+    n_sections = min(len(keep_sections), sum(1 for el in children if el.tag == tbl_tag))
+    for el in children:
+        if section < n_sections:
+            if keep_sections[section]:
+                kept.append(el)
+            if el.tag == tbl_tag:
+                section += 1
+        else:
+            kept.append(el)
+
+    # 2) между оставшимися таблицами: чистим "дыру" сверху и ставим разрыв страницы
+    tables_left = sum(1 for el in kept if el.tag == tbl_tag)
+    out = []
+    gap_start = False
+    for el in kept:
+        if gap_start:
+            if _is_empty_paragraph_el(el):
+                continue
+            if not _is_page_break_paragraph(el):
+                out.append(_page_break_paragraph())
+            gap_start = False
+        out.append(el)
+        if el.tag == tbl_tag:
+            tables_left -= 1
+            gap_start = tables_left > 0
+
+    body[:] = out
+
+    # restore sectPr if it disappeared
+    if body.find(qn("w:sectPr")) is None and sectPr_copy is not None:
+        body.append(sectPr_copy)
 
-    tbl_pos: list[int] = []
-    for tbl_el in tbl_els:
-        for i, el in enumerate(children):
-            if el is tbl_el:
-                tbl_pos.append(i)
-                break
 
-    if len(tbl_pos) <= 1:
-        return
+# -------------------------
+# fill + save/deliver
+# -------------------------
+
+def _fill_protocol(doc: Document, template: PreparedTemplate, dep: str, date_str: str,
+                   frames: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]) -> None:
+    """
+    Заполняет только что открытый шаблон протоколом одного отделения:
+    дата/отделение, раскладка актов (пустые вырезаются), таблицы.
+    """
+    df_swabs, df_air, df_smears = frames
+    has_swabs = df_swabs is not None and not df_swabs.empty
+    has_air = df_air is not None and not df_air.empty
+    has_smears = df_smears is not None and not df_smears.empty
 
-    # идём с конца: безопасно для индексов
-    for k in range(len(tbl_pos) - 1, 0, -1):
-        start_idx = tbl_pos[k - 1] + 1
+    # дата/отделение во всех блоках (смывы/воздух/персонал)
+    _set_sampling_date_and_dep(doc, dep=dep, date_str=date_str, anchors=template.anchors)
 
-        children = list(body.iterchildren())
+    # 1) убираем пустые блоки шаблона; каждый оставшийся акт — с новой страницы (кроме первого)
+    _layout_sections(doc, keep_sections=[has_swabs, has_air, has_smears])
 
-        # вычищаем пустые абзацы, которые дают "дыру" сверху
-        while start_idx < len(children) and _is_empty_paragraph_el(children[start_idx]):
-            body.remove(children[start_idx])
-            children = list(body.iterchildren())
+    # 2) заполняем таблицы по порядку оставшихся
+    table_idx = 0
+    if has_swabs and len(doc.tables) > table_idx:
+        _fill_swabs_table(doc.tables[table_idx], df_swabs)
+        table_idx += 1
 
-        # если уже стоит page break — не дублируем
-        children = list(body.iterchildren())
-        if start_idx < len(children):
-            el = children[start_idx]
-            if el.tag == qn("w:p"):
-                ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
-                br = el.find(".//w:br", namespaces=ns)
-                if br is not None and br.get(qn("w:type")) == "page":
-                    continue
+    if has_air and len(doc.tables) > table_idx:
+        _fill_air_table(doc.tables[table_idx], df_air)
+        table_idx += 1
 
-        _insert_page_break_at_body_index(doc, start_idx)
+    if has_smears and len(doc.tables) > table_idx:
+        _fill_smears_table(doc.tables[table_idx], df_smears)
+        table_idx += 1
 
 
-def _drop_unused_sections_by_tables(doc: Document, keep_sections: list[bool]) -> None:
+def _pdf_target(saved_docx: str, pdf_dir: str, copy_queue: Optional[CopyQueue]) -> Tuple[str, str]:
     """
-    В шаблоне блоки идут по таблицам:
-      table0 -> смывы
-      table1 -> воздух
-      table2 -> мазки (персонал)
+    (сетевой путь PDF, куда его писать сейчас): при очереди — в outbox, иначе сразу в сеть.
+    """
+    pdf_name = Path(saved_docx).stem + ".pdf"
+    auto_pdf = os.path.normpath(str(Path(pdf_dir) / pdf_name))
+    if copy_queue is not None:
+        return auto_pdf, copy_queue.outbox_path(pdf_name)
+    Path(pdf_dir).mkdir(parents=True, exist_ok=True)
+    return auto_pdf, auto_pdf
 
-    Удаляем блок целиком (заголовки/абзацы + таблица),
-    если по категории нет данных — чтобы не оставлять пустых "актов".
 
-    keep_sections = [keep_swabs, keep_air, keep_smears]
+def _save_outputs(doc: Document, out_path: str, word_dir: str, pdf_dir: str,
+                  pdf_backend: Optional[str], pdf_status: Optional[Callable[[PdfJob], None]],
+                  copy_queue: Optional[CopyQueue], cache_key: Optional[str]) -> Tuple[str, Optional[str], Optional[str]]:
     """
-    body = doc._element.body  # pylint: disable=protected-access
-    children = list(body.iterchildren())
+    Сохраняет готовый документ в out_path, кладёт копию DOCX и PDF в папки отчётов
+    (сразу или через очередь отправки) и записывает комплект в кеш.
+    """
+    saved_docx = os.path.normpath(os.path.abspath(str(out_path)))
+    Path(saved_docx).parent.mkdir(parents=True, exist_ok=True)
 
-    # preserve sectPr (чтобы не слетала ориентация)
-    sectPr_copy = None
-    sectPr = body.find(qn("w:sectPr"))
-    if sectPr is not None:
-        sectPr_copy = deepcopy(sectPr)
-    else:
-        for el in reversed(children):
-            if el.tag == qn("w:p"):
-                pPr = el.find(qn("w:pPr"))
-                if pPr is not None:
-                    sp = pPr.find(qn("w:sectPr"))
-                    if sp is not None:
-                        sectPr_copy = deepcopy(sp)
-                        break
-
-    # positions of each table element in body children
-    tbl_els = [t._element for t in doc.tables]
-    tbl_pos: list[int] = []
-    for tbl_el in tbl_els:
-        for idx, el in enumerate(children):
-            if el is tbl_el:
-                tbl_pos.append(idx)
-                break
-
-    n_tables = len(tbl_pos)
-    n_sections = min(len(keep_sections), n_tables)
-
-    # ranges for each section: start..end (inclusive), end includes the table itself
-    ranges: list[tuple[int, int]] = []
-    for k in range(n_sections):
-        start = 0 if k == 0 else (tbl_pos[k - 1] + 1)
-        end = tbl_pos[k]
-        ranges.append((start, end))
-
-    # delete from bottom to top so indexes don't shift
-    for k in range(n_sections - 1, -1, -1):
-        if keep_sections[k]:
-            continue
-        start, end = ranges[k]
-        for el in children[start:end + 1]:
-            if el.getparent() is body:
-                body.remove(el)
+    auto_word_docx = None
+    auto_pdf = None
 
-    # restore sectPr if it disappeared
-    if body.find(qn("w:sectPr")) is None and sectPr_copy is not None:
-        body.append(sectPr_copy)
+    local_docx = None
+    local_pdf = None
+    deliveries: List[Tuple[str, str]] = []     # (outbox, сетевой путь) — в очередь в самом конце
+
+    # --- свой PDF рисуем до сохранения DOCX: та же раскладка проставляет номера страниц оглавления ---
+    if pdf_backend == PDF_NATIVE:
+        try:
+            auto_pdf, local_pdf = _pdf_target(saved_docx, pdf_dir, copy_queue)
+            render_docx_pdf(doc, local_pdf)
+        except Exception as e:
+            print(f"Не удалось сохранить PDF: {e}")
+            auto_pdf = None
+            local_pdf = None
+
+    # --- сохраняем основной DOCX ---
+    # (без своего PDF номера страниц в оглавлении посчитает Word/LibreOffice — updateFields)
+    doc.save(saved_docx)
+
+    # --- автосохранение Word (копия DOCX в сетевую папку) ---
+    try:
+        auto_word_docx = os.path.normpath(str(Path(word_dir) / Path(saved_docx).name))
+        if copy_queue is not None:
+            # отправляем свою копию: сохранённый файл пользователь может открыть и править
+            local_docx = copy_queue.outbox_path(Path(saved_docx).name)
+            shutil.copy2(saved_docx, local_docx)
+            deliveries.append((local_docx, auto_word_docx))
+        else:
+            Path(word_dir).mkdir(parents=True, exist_ok=True)
+            shutil.copy2(saved_docx, auto_word_docx)
+    except Exception as e:
+        print(f"Не удалось сохранить Word-копию: {e}")
+        auto_word_docx = None
+
+    # --- автосохранение PDF через конвертер (из сохранённого DOCX) ---
+    if pdf_backend is not None and pdf_backend != PDF_NATIVE:
+        try:
+            auto_pdf, local_pdf = _pdf_target(saved_docx, pdf_dir, copy_queue)
+            get_converter(pdf_backend).convert(saved_docx, local_pdf, on_status=pdf_status)
+        except Exception as e:
+            print(f"Не удалось сохранить PDF: {e}")
+            auto_pdf = None
+            local_pdf = None
+
+    if copy_queue is not None and local_pdf is not None:
+        deliveries.append((local_pdf, auto_pdf))
+
+    # в кеш — только полный комплект (DOCX в папке отчётов и, если просили, PDF)
+    if cache_key is not None and auto_word_docx and (pdf_backend is None or auto_pdf):
+        queued = copy_queue is not None
+        report_cache.record(word_dir, {
+            Path(saved_docx).name: report_cache.make_entry(
+                cache_key, auto_word_docx, auto_pdf, pdf_backend,
+                docx_src=local_docx if queued else None,
+                pdf_src=local_pdf if queued else None,
+            ),
+        })
+
+    # отдаём очереди только теперь: доставленный outbox-файл она удаляет
+    for src, dst in deliveries:
+        copy_queue.submit(src, dst, owned=True)
+
+    return saved_docx, auto_word_docx, auto_pdf
 
 
 # -------------------------
 # main entry
 # -------------------------
 
+# меняется вместе с раскладкой/оформлением протокола — старые готовые протоколы из кеша не берутся
+REPORT_LAYOUT_VERSION = 1
+
+
+def report_file_name(dep: str, day: pd.Timestamp, has_air: bool, has_smears: bool) -> str:
+    """
+    Имя файла протокола: "Протокол результатов <отделение> <дд.мм.гггг>[ + воздух][ + мазок].docx".
+    """
+    name = f"Протокол результатов {dep} {_fmt_date_ddmmyyyy(day)}"
+    if has_air:
+        name += " + воздух"
+    if has_smears:
+        name += " + мазок"
+    return name + ".docx"
+
+
 def build_docx_report(
-    template_path: str,
+    template_path: Union[str, bytes, PreparedTemplate],
     out_path: str,
     dep: str,
     day: pd.Timestamp,
@@ -500,11 +727,29 @@ def build_docx_report(
     *,
     auto_word_dir: Optional[str] = None,
     auto_pdf_dir: Optional[str] = None,
+    pdf_backend: Optional[str] = PDF_WORD,
+    pdf_status: Optional[Callable[[PdfJob], None]] = None,
+    use_cache: bool = True,
+    copy_queue: Optional[CopyQueue] = None,
 ) -> Tuple[str, Optional[str], Optional[str]]:
     """
     Возвращает:
       (saved_docx_path, auto_word_docx_path_or_None, auto_pdf_path_or_None)
 
+    template_path — путь к шаблону или его содержимое (bytes, уже прочитанный шаблон);
+    шаблон берётся из кеша (load_template) — повторные отчёты не читают его по сети.
+    pdf_backend — чем делать PDF: "word" (Microsoft Word через COM), "libreoffice"
+    или "native" (reportlab, без офиса, из того же документа); None — PDF не делать.
+    word/libreoffice идут через общую очередь конвертации (один прогретый Word на процесс);
+    pdf_status получает смены статуса задачи (из потока сервиса).
+    use_cache — если в папке отчётов уже лежит протокол из тех же данных, шаблона и настроек
+    (и файлы с тех пор не меняли), сразу возвращаются его пути: без сборки, копирования и PDF
+    (см. analysis/report_cache.py). saved_docx_path тогда — та же Word-копия.
+    copy_queue — не копировать в сетевые папки самим, а поставить в очередь отправки
+    (services/copy_queue.py): PDF делается локально (outbox очереди), функция не ждёт SMB.
+    Возвращаемые пути Word/PDF тогда — куда файлы будут доставлены. Индекс кеша локальный;
+    по сети — только stat найденного в кеше протокола, и то если он уже не в очереди.
+
     Поведение:
     - создаём DOCX по шаблону и сохраняем в out_path
     - дополнительно копируем DOCX в AUTO_WORD_DIR (или auto_word_dir, если задан)
@@ -514,12 +759,7 @@ def build_docx_report(
     - ориентация всегда LANDSCAPE
     """
     date_str = _fmt_date_ddmmyyyy(day)
-
-    doc = Document(template_path)
-    _enforce_landscape(doc)
-
-    # дата/отделение во всех блоках (смывы/воздух/персонал)
-    _set_sampling_date_and_dep(doc, dep=dep, date_str=date_str)
+    pdf_backend = check_pdf_backend(pdf_backend)
 
     has_swabs = df_swabs is not None and not df_swabs.empty
     has_air = df_air is not None and not df_air.empty
@@ -528,54 +768,224 @@ def build_docx_report(
     if not (has_swabs or has_air or has_smears):
         raise ValueError("Нет данных для отчёта: смывы/воздух/персонал пустые.")
 
-    # 1) убираем пустые блоки в шаблоне
-    _drop_unused_sections_by_tables(doc, keep_sections=[has_swabs, has_air, has_smears])
+    template = load_template(template_path)
+    word_dir = auto_word_dir or AUTO_WORD_DIR
+    docx_name = Path(str(out_path)).name
 
-    # 2) каждый оставшийся акт — с новой страницы (кроме первого), + чистим пустые абзацы
-    _start_each_act_on_new_page(doc)
+    # тот же протокол уже лежит в папке отчётов — отдаём его
+    cache_key = None
+    if use_cache:
+        cache_key = report_cache.report_key(
+            dep, day, (df_swabs, df_air, df_smears), template.digest, REPORT_LAYOUT_VERSION,
+        )
+        hit = report_cache.lookup(word_dir, docx_name, cache_key, pdf_backend=pdf_backend,
+                                  pending=copy_queue.pending_destinations() if copy_queue else ())
+        if hit is not None:
+            docx, pdf = hit
+            return docx, docx, pdf
+
+    doc = template.open()
+    _fill_protocol(doc, template, dep, date_str, (df_swabs, df_air, df_smears))
+    _enforce_landscape(doc)
 
-    # 3) заполняем таблицы по порядку оставшихся
-    table_idx = 0
-    if has_swabs and len(doc.tables) > table_idx:
-        _fill_swabs_table(doc.tables[table_idx], df_swabs)
-        table_idx += 1
+    pdf_dir = auto_pdf_dir or AUTO_PDF_DIR
+    return _save_outputs(doc, out_path, word_dir, pdf_dir, pdf_backend, pdf_status, copy_queue, cache_key)
 
-    if has_air and len(doc.tables) > table_idx:
-        _fill_air_table(doc.tables[table_idx], df_air)
-        table_idx += 1
 
-    if has_smears and len(doc.tables) > table_idx:
-        _fill_smears_table(doc.tables[table_idx], df_smears)
-        table_idx += 1
+# -------------------------
+# сводный протокол: все отделения за дату одним документом
+# -------------------------
 
-    _enforce_landscape(doc)
+# (отделение, смывы, воздух, персонал)
+DepartmentFrames = Tuple[str, pd.DataFrame, pd.DataFrame, pd.DataFrame]
 
-    # --- сохраняем основной DOCX ---
-    saved_docx = os.path.normpath(os.path.abspath(str(out_path)))
-    Path(saved_docx).parent.mkdir(parents=True, exist_ok=True)
-    doc.save(saved_docx)
+# после updateFields в settings.xml (порядок элементов CT_Settings)
+_SETTINGS_AFTER_UPDATE_FIELDS = (
+    "w:hdrShapeDefaults", "w:footnotePr", "w:endnotePr", "w:compat", "w:docVars", "w:rsids",
+    "m:mathPr", "w:attachedSchema", "w:themeFontLang", "w:clrSchemeMapping",
+    "w:doNotIncludeSubdocsInStats", "w:doNotAutoCompressPictures", "w:forceUpgrade", "w:captions",
+    "w:readModeInkLockDown", "w:smartTagType", "sl:schemaLibrary", "w:shapeDefaults",
+    "w:doNotEmbedSmartTags", "w:decimalSymbol", "w:listSeparator",
+)
 
-    auto_word_docx = None
-    auto_pdf = None
 
-    # --- автосохранение Word (копия DOCX в сетевую папку) ---
-    try:
-        word_dir = auto_word_dir or AUTO_WORD_DIR
-        Path(word_dir).mkdir(parents=True, exist_ok=True)
-        auto_word_docx = os.path.normpath(str(Path(word_dir) / Path(saved_docx).name))
-        shutil.copy2(saved_docx, auto_word_docx)
-    except Exception as e:
-        print(f"Не удалось сохранить Word-копию: {e}")
-        auto_word_docx = None
+def combined_file_name(day: pd.Timestamp) -> str:
+    return f"Протоколы результатов все отделения {_fmt_date_ddmmyyyy(day)}.docx"
 
-    # --- автосохранение PDF (в сетевую папку) ---
-    try:
-        pdf_dir = auto_pdf_dir or AUTO_PDF_DIR
-        Path(pdf_dir).mkdir(parents=True, exist_ok=True)
-        auto_pdf = os.path.normpath(str(Path(pdf_dir) / (Path(saved_docx).stem + ".pdf")))
-        save_pdf_via_word(saved_docx, auto_pdf)
-    except Exception as e:
-        print(f"Не удалось сохранить PDF: {e}")
-        auto_pdf = None
 
-    return saved_docx, auto_word_docx, auto_pdf
+def _section_titles(frames) -> str:
+    names = ("смывы", "воздух", "персонал")
+    return ", ".join(n for n, df in zip(names, frames) if df is not None and not df.empty)
+
+
+def _bookmark_start(el, bm_id: int, name: str) -> None:
+    """
+    Закладка name на первый абзац блока (el — w:p): номер его страницы попадёт в оглавление.
+    """
+    start = OxmlElement("w:bookmarkStart")
+    start.set(qn("w:id"), str(bm_id))
+    start.set(qn("w:name"), name)
+    end = OxmlElement("w:bookmarkEnd")
+    end.set(qn("w:id"), str(bm_id))
+    pPr = el.find(qn("w:pPr"))
+    pos = 1 if pPr is not None else 0
+    el.insert(pos, start)
+    el.insert(pos + 1, end)
+
+
+def _add_pageref(paragraph, bookmark: str, *, font_size: int = 12) -> None:
+    """
+    Поле PAGEREF на закладку: begin / instrText / separate / результат / end.
+    """
+    def _fld(kind: str):
+        run = paragraph.add_run()
+        _set_run_font(run, size_pt=font_size)
+        fld = OxmlElement("w:fldChar")
+        fld.set(qn("w:fldCharType"), kind)
+        run._r.append(fld)
+
+    _fld("begin")
+    run = paragraph.add_run()
+    _set_run_font(run, size_pt=font_size)
+    instr = OxmlElement("w:instrText")
+    instr.set(qn("xml:space"), "preserve")
+    instr.text = f" PAGEREF {bookmark} \\h "
+    run._r.append(instr)
+    _fld("separate")
+    _set_run_font(paragraph.add_run("–"), size_pt=font_size)
+    _fld("end")
+
+
+def _request_fields_update(doc: Document) -> None:
+    """
+    Word пересчитает поля (номера страниц оглавления) при открытии документа.
+    """
+    settings = doc.settings.element
+    if settings.find(qn("w:updateFields")) is not None:
+        return
+    el = OxmlElement("w:updateFields")
+    el.set(qn("w:val"), "true")
+    settings.insert_element_before(el, *_SETTINGS_AFTER_UPDATE_FIELDS)
+
+
+def _build_toc(doc: Document, date_str: str, entries: List[Tuple[str, str, str]]) -> list:
+    """
+    Первая страница сводного протокола: заголовок и таблица «отделение — акты — страница».
+    entries: [(отделение, акты, закладка)]. Возвращает элементы body (body на входе — только sectPr).
+    """
+    title = doc.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    _set_paragraph_text(title, f"Протоколы результатов исследований за {date_str}", bold=True, font_size=14)
+    doc.add_paragraph()
+
+    table = doc.add_table(rows=1, cols=4)
+    _set_table_borders(table)
+    for cell, text in zip(table.rows[0].cells, ("№", "Отделение", "Исследования", "Стр.")):
+        _set_cell_text(cell, text, bold=True)
+    for i, (dep, sections, bookmark) in enumerate(entries, 1):
+        cells = table.add_row().cells
+        _set_cell_text(cells[0], str(i))
+        _set_cell_text(cells[1], dep)
+        _set_cell_text(cells[2], sections)
+        cells[3].text = ""
+        _add_pageref(cells[3].paragraphs[0], bookmark)
+
+    for col, width in zip(table.columns, (Cm(1.5), Cm(10), Cm(9), Cm(2))):
+        for cell in col.cells:
+            cell.width = width
+    grid = table._tbl.tblGrid
+    for gc, width in zip(grid.gridCol_lst, (Cm(1.5), Cm(10), Cm(9), Cm(2))):
+        gc.w = width
+
+    return [el for el in doc.element.body.iterchildren() if el.tag != qn("w:sectPr")]
+
+
+def build_combined_report(
+    template_path: Union[str, bytes, PreparedTemplate],
+    out_path: str,
+    day: pd.Timestamp,
+    departments: Sequence[DepartmentFrames],
+    *,
+    auto_word_dir: Optional[str] = None,
+    auto_pdf_dir: Optional[str] = None,
+    pdf_backend: Optional[str] = PDF_WORD,
+    pdf_status: Optional[Callable[[PdfJob], None]] = None,
+    use_cache: bool = True,
+    copy_queue: Optional[CopyQueue] = None,
+) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Сводный протокол за дату: акты всех отделений одним DOCX/PDF.
+
+    Возвращает то же, что build_docx_report. Шаблон открывается один раз: для каждого отделения
+    body заполняется копией исходных элементов шаблона, заполняется как обычный протокол
+    и откладывается; отделения без данных пропускаются.
+    Каждое отделение — с новой страницы; первая страница — оглавление со страницами отделений
+    (поля PAGEREF на закладки: Word/LibreOffice пересчитывают их сами, для native
+    номера проставляет раскладка reportlab). PDF — одна конвертация на весь документ.
+    Папки, кеш, очередь отправки и pdf_backend — как в build_docx_report.
+    """
+    date_str = _fmt_date_ddmmyyyy(day)
+    pdf_backend = check_pdf_backend(pdf_backend)
+
+    sections = [
+        (dep, (sw, air, sm)) for dep, sw, air, sm in departments
+        if any(df is not None and not df.empty for df in (sw, air, sm))
+    ]
+    if not sections:
+        raise ValueError(f"Нет данных для сводного протокола за {date_str}.")
+
+    template = load_template(template_path)
+    word_dir = auto_word_dir or AUTO_WORD_DIR
+    docx_name = Path(str(out_path)).name
+
+    cache_key = None
+    if use_cache:
+        cache_key = report_cache.report_key(
+            "\x1e".join(["combined"] + [dep for dep, _ in sections]), day,
+            [df for _, frames in sections for df in frames], template.digest, REPORT_LAYOUT_VERSION,
+        )
+        hit = report_cache.lookup(word_dir, docx_name, cache_key, pdf_backend=pdf_backend,
+                                  pending=copy_queue.pending_destinations() if copy_queue else ())
+        if hit is not None:
+            docx, pdf = hit
+            return docx, docx, pdf
+
+    doc = template.open()
+    body = doc.element.body
+    sect_tag = qn("w:sectPr")
+    sect_pr = body.find(sect_tag)
+    proto = [el for el in body.iterchildren() if el.tag != sect_tag]
+
+    parts: list = []
+    toc: List[Tuple[str, str, str]] = []
+    for i, (dep, frames) in enumerate(sections, 1):
+        body[:] = [deepcopy(el) for el in proto]
+        _fill_protocol(doc, template, dep, date_str, frames)
+        chunk = [el for el in body.iterchildren() if el.tag != sect_tag]
+
+        # закладки шаблона повторились бы в каждом отделении — оставляем только свои
+        for el in chunk:
+            for bm in list(el.iter(qn("w:bookmarkStart"), qn("w:bookmarkEnd"))):
+                bm.getparent().remove(bm)
+        first = next((el for el in chunk if el.tag == qn("w:p")), None)
+        if first is None or first is not chunk[0]:
+            first = OxmlElement("w:p")
+            chunk.insert(0, first)
+        bookmark = f"_Dep{i}"
+        _bookmark_start(first, i, bookmark)
+
+        parts.append(_page_break_paragraph())
+        parts.extend(chunk)
+        toc.append((dep, _section_titles(frames), bookmark))
+
+    body[:] = [sect_pr] if sect_pr is not None else []
+    toc_els = _build_toc(doc, date_str, toc)
+    body[:] = toc_els + parts + ([sect_pr] if sect_pr is not None else [])
+
+    _enforce_landscape(doc)
+    # номера страниц оглавления: Word/LibreOffice пересчитают поля при открытии,
+    # свой PDF (PDF_NATIVE) проставит их в той же раскладке (_save_outputs)
+    _request_fields_update(doc)
+
+    pdf_dir = auto_pdf_dir or AUTO_PDF_DIR
+    return _save_outputs(doc, out_path, word_dir, pdf_dir, pdf_backend, pdf_status, copy_queue, cache_key)
@@ -0,0 +1,161 @@
+"""
+Кеш готовых протоколов: повторная генерация того же (отделение, дата) с теми же данными,
+шаблоном и настройками возвращает уже лежащие в папке отчётов DOCX/PDF.
+
+Ключ — sha1 от данных трёх листов (значения + колонки), отделения, даты, отпечатка шаблона
+и версии раскладки протокола. Индекс — локальный JSON (AppData, свой файл на каждую папку
+отчётов): имя DOCX -> ключ, пути DOCX/PDF и их (размер, mtime) на момент записи.
+По сети ходит только проверка найденной записи (stat её DOCX/PDF); файл, который с тех пор
+меняли или удалили, — промах, запись выбрасывается, протокол собирается заново.
+
+Индекс пишется целиком через временный файл (os.replace); протоколы, собранные на другой
+машине, сюда не попадают — это только лишний промах.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Collection, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from analysis.swabs_cache import file_signature
+
+INDEX_VERSION = 2
+
+
+def _frame_digest(h, df: Optional[pd.DataFrame]) -> None:
+    if df is None or df.empty:
+        h.update(b"-|")
+        return
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update(b"|")
+
+
+def report_key(dep: str, day: pd.Timestamp, frames: Iterable[Optional[pd.DataFrame]],
+               template_digest: str, layout_version: int) -> str:
+    h = hashlib.sha1()
+    h.update(f"v{layout_version}|{template_digest}|{dep}|{pd.Timestamp(day):%Y-%m-%d}|".encode("utf-8"))
+    for df in frames:
+        _frame_digest(h, df)
+    return h.hexdigest()
+
+
+def default_index_dir() -> str:
+    return os.path.join(
+        os.environ.get("APPDATA", os.path.expanduser("~")),
+        "EpidMonitor",
+        "cache",
+        "protocols",
+    )
+
+
+def index_path(reports_dir: str, index_dir: Optional[str] = None) -> str:
+    """
+    Локальный файл индекса для папки отчётов reports_dir (её путь может быть сетевым).
+    """
+    tag = hashlib.sha1(os.path.normcase(os.path.normpath(reports_dir)).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir or default_index_dir(), f"protocols_{tag}.json")
+
+
+def _load(path: str) -> Dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f) or {}
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("reports") or {}
+
+
+def _write(path: str, reports: Dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "reports": reports}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _sig(path: Optional[str]):
+    sig = file_signature(path) if path else None
+    return list(sig) if sig is not None else None
+
+
+def make_entry(key: str, docx: str, pdf: Optional[str] = None, pdf_backend: Optional[str] = None,
+               *, docx_src: Optional[str] = None, pdf_src: Optional[str] = None) -> dict:
+    """
+    Запись индекса для только что сохранённых файлов (сигнатуры снимаются сейчас).
+    docx_src/pdf_src — локальные оригиналы, если файлы ещё в очереди отправки
+    (services/copy_queue): копия через copy2 сохранит их размер и mtime.
+    """
+    return {
+        "key": key,
+        "docx": docx,
+        "docx_sig": _sig(docx_src or docx),
+        "pdf": pdf,
+        "pdf_sig": _sig(pdf_src or pdf),
+        "pdf_backend": pdf_backend if pdf else None,
+    }
+
+
+def _still_there(path: Optional[str], sig, pending: Collection[str]) -> bool:
+    if not path or sig is None:
+        return False
+    if path in pending:
+        return True     # ещё в очереди отправки: доставлена будет ровно записанная копия
+    return _sig(path) == sig
+
+
+def _drop(path: str, name: str) -> None:
+    try:
+        reports = _load(path)
+        if reports.pop(name, None) is not None:
+            _write(path, reports)
+    except Exception as e:
+        print(f"Не удалось обновить индекс протоколов: {e}")
+
+
+def lookup(reports_dir: str, name: str, key: str, pdf_backend: Optional[str] = None, *,
+           index_dir: Optional[str] = None,
+           pending: Collection[str] = ()) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    (docx, pdf) уже готового протокола или None. pdf_backend задан — нужен и PDF,
+    сделанный тем же способом; None — хватает DOCX.
+    pending — пути, доставка в которые ещё в очереди (CopyQueue.pending_destinations):
+    их не проверяем stat'ом по сети — файла там пока нет, а сеть может лежать.
+    Запись, чьи файлы с тех пор поменяли или удалили, выбрасывается из индекса.
+    """
+    path = index_path(reports_dir, index_dir)
+    entry = _load(path).get(name)
+    if not entry or entry.get("key") != key:
+        return None
+    if pdf_backend is not None and (not entry.get("pdf") or entry.get("pdf_backend") != pdf_backend):
+        return None
+
+    docx = entry.get("docx")
+    pdf = entry.get("pdf") if pdf_backend is not None else None
+    if not _still_there(docx, entry.get("docx_sig"), pending) or (
+            pdf_backend is not None and not _still_there(pdf, entry.get("pdf_sig"), pending)):
+        _drop(path, name)
+        return None
+    return docx, pdf
+
+
+def record(reports_dir: str, entries: Dict[str, dict], *, index_dir: Optional[str] = None) -> None:
+    """
+    Дописывает записи (имя DOCX -> make_entry(...)) в локальный индекс папки reports_dir.
+    Сеть не трогается: устаревшие записи выбрасывает lookup при промахе.
+    Ошибки записи не мешают отчёту — кеш просто не пополнится.
+    """
+    if not entries:
+        return
+    try:
+        path = index_path(reports_dir, index_dir)
+        reports = _load(path)
+        reports.update(entries)
+        _write(path, reports)
+    except Exception as e:
+        print(f"Не удалось обновить индекс протоколов: {e}")
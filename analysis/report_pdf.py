@@ -0,0 +1,462 @@
+"""
+PDF протокола без Word: заполненный документ (python-docx) рисуется через reportlab.
+
+Раскладка берётся из самого документа — размер страницы и поля секции (альбомная),
+абзацы с выравниванием/жирностью/кеглем, таблицы с шириной колонок из шаблона,
+разрывы страниц между актами. Поэтому PDF повторяет тот же шаблон, что и DOCX,
+а работает на любой ОС и за доли секунды.
+
+Ссылки на страницы (поля PAGEREF на закладки — оглавление сводного протокола) считаются
+в той же раскладке, что рисует PDF: в ячейке поля — ссылка на PDF-форму, а сама форма
+с номером страницы дописывается в конце, когда все закладки уже разложены. Те же номера
+render_docx_pdf проставляет в результаты полей документа (для DOCX, сохраняемого следом).
+
+Нужны reportlab и TTF-шрифт с кириллицей (Times New Roman из Windows, на Linux —
+Liberation Serif / DejaVu Serif).
+"""
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.table import Table, _Cell
+from docx.text.paragraph import Paragraph
+
+FONT_FAMILY = "ProtocolSerif"
+
+# (обычный, жирный, курсив, жирный курсив); первый найденный комплект
+_FONT_CANDIDATES = [
+    (r"{win}\Fonts\times.ttf", r"{win}\Fonts\timesbd.ttf", r"{win}\Fonts\timesi.ttf", r"{win}\Fonts\timesbi.ttf"),
+    ("/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman.ttf",
+     "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman_Bold.ttf",
+     "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman_Italic.ttf",
+     "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman_Bold_Italic.ttf"),
+    ("/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSerif-Italic.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSerif-BoldItalic.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSerif-BoldItalic.ttf"),
+]
+
+_ALIGN = {
+    WD_ALIGN_PARAGRAPH.CENTER: 1,   # TA_CENTER
+    WD_ALIGN_PARAGRAPH.RIGHT: 2,    # TA_RIGHT
+    WD_ALIGN_PARAGRAPH.JUSTIFY: 4,  # TA_JUSTIFY
+}
+
+_TABLE_ALIGN = {
+    WD_TABLE_ALIGNMENT.CENTER: "CENTER",
+    WD_TABLE_ALIGNMENT.RIGHT: "RIGHT",
+}
+
+DEFAULT_FONT_SIZE = 12.0
+
+_PAGEREF_RE = re.compile(r"^\s*PAGEREF\s+(\S+)")
+
+
+@lru_cache(maxsize=1)
+def register_fonts() -> str:
+    """
+    Регистрирует семейство FONT_FAMILY в reportlab (один раз на процесс).
+    Нет шрифта с кириллицей — RuntimeError: встроенные шрифты reportlab кириллицу не рисуют.
+    """
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    win = os.environ.get("WINDIR", r"C:\Windows")
+    for candidate in _FONT_CANDIDATES:
+        paths = [p.format(win=win) for p in candidate]
+        if not (os.path.exists(paths[0]) and os.path.exists(paths[1])):
+            continue
+        # курсива может не быть — тогда обычный/жирный
+        italic = paths[2] if os.path.exists(paths[2]) else paths[0]
+        bold_italic = paths[3] if os.path.exists(paths[3]) else paths[1]
+        for name, path in ((FONT_FAMILY, paths[0]), (FONT_FAMILY + "-Bold", paths[1]),
+                           (FONT_FAMILY + "-Italic", italic), (FONT_FAMILY + "-BoldItalic", bold_italic)):
+            pdfmetrics.registerFont(TTFont(name, path))
+        addMapping(FONT_FAMILY, 0, 0, FONT_FAMILY)
+        addMapping(FONT_FAMILY, 1, 0, FONT_FAMILY + "-Bold")
+        addMapping(FONT_FAMILY, 0, 1, FONT_FAMILY + "-Italic")
+        addMapping(FONT_FAMILY, 1, 1, FONT_FAMILY + "-BoldItalic")
+        return FONT_FAMILY
+
+    raise RuntimeError("Не найден TTF-шрифт с кириллицей (Times New Roman / Liberation Serif / DejaVu Serif)")
+
+
+# -------------------------
+# docx -> разметка reportlab
+# -------------------------
+
+def _style_props(paragraph: Paragraph, cache: dict) -> dict:
+    """
+    Свойства стиля абзаца с учётом базовых стилей: bold/italic/size/alignment (None — не задано).
+    Кешируются по id стиля на одну отрисовку: paragraph.style в python-docx каждый раз
+    перебирает все стили документа, а абзацев в сводном протоколе — тысячи.
+    """
+    key = ("style", paragraph._p.style)
+    props = cache.get(key)
+    if props is None:
+        props = {"bold": None, "italic": None, "size": None, "alignment": None}
+        style = paragraph.style
+        while style is not None:
+            for attr in ("bold", "italic", "size"):
+                if props[attr] is None:
+                    props[attr] = getattr(style.font, attr, None)
+            if props["alignment"] is None:
+                props["alignment"] = style.paragraph_format.alignment
+            style = style.base_style
+        cache[key] = props
+    return props
+
+
+def _font_size(paragraph: Paragraph, default: float, props: dict) -> float:
+    for r in paragraph.runs:
+        if r.text and r.font.size is not None:
+            return r.font.size.pt
+    size = props["size"]
+    return size.pt if size is not None else default
+
+
+def _paragraph_markup(paragraph: Paragraph, default_size: float, props: dict) -> Tuple[str, float]:
+    """
+    (разметка для reportlab Paragraph, кегль абзаца). Жирный/курсив/кегль — по run'ам, иначе из стиля.
+    """
+    style_bold = bool(props["bold"])
+    style_italic = bool(props["italic"])
+    size = _font_size(paragraph, default_size, props)
+
+    parts: List[str] = []
+    for r in paragraph.runs:
+        text = r.text
+        if not text:
+            continue
+        chunk = escape(text).replace("\t", "    ").replace("\n", "<br/>")
+        bold = style_bold if r.bold is None else r.bold
+        italic = style_italic if r.italic is None else r.italic
+        if r.font.size is not None and r.font.size.pt != size:
+            chunk = f'<font size="{r.font.size.pt:g}">{chunk}</font>'
+        if italic:
+            chunk = f"<i>{chunk}</i>"
+        if bold:
+            chunk = f"<b>{chunk}</b>"
+        parts.append(chunk)
+    return "".join(parts), size
+
+
+def _has_page_break(p_el) -> bool:
+    for br in p_el.iter(qn("w:br")):
+        if br.get(qn("w:type")) == "page":
+            return True
+    return False
+
+
+def _alignment(paragraph: Paragraph, props: dict) -> int:
+    align = paragraph.alignment
+    if align is None:
+        align = props["alignment"]
+    return _ALIGN.get(align, 0)
+
+
+def _make_paragraph(paragraph: Paragraph, default_size: float, styles: dict):
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph as RLParagraph, Spacer
+
+    props = _style_props(paragraph, styles)
+    markup, size = _paragraph_markup(paragraph, default_size, props)
+    if not markup.strip():
+        return Spacer(1, size * 1.15)
+
+    refs = styles.get(_REFS_KEY)
+    if refs is not None and paragraph._p in refs:
+        return _page_ref(refs, refs[paragraph._p], size, _alignment(paragraph, props))
+
+    key = (size, _alignment(paragraph, props))
+    style = styles.get(key)
+    if style is None:
+        style = ParagraphStyle(
+            f"p{len(styles)}", fontName=FONT_FAMILY, fontSize=size,
+            leading=size * 1.15, alignment=key[1], spaceAfter=size * 0.3,
+        )
+        styles[key] = style
+    return RLParagraph(markup, style)
+
+
+def _cell_flowables(cell: _Cell, default_size: float, styles: dict) -> list:
+    out = []
+    for p in cell.paragraphs:
+        if p.text.strip():
+            out.append(_make_paragraph(p, default_size, styles))
+    return out or [""]
+
+
+def _make_table(table: Table, avail_width: float, default_size: float, styles: dict):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table as RLTable, TableStyle
+
+    # ширины колонок — из сетки шаблона (twips), ужатые до ширины страницы
+    grid = table._tbl.tblGrid
+    widths = [float(gc.w.pt) if gc.w is not None else 0.0 for gc in grid.gridCol_lst] if grid is not None else []
+    n_cols = len(widths) or max((len(tr.tc_lst) for tr in table._tbl.tr_lst), default=1)
+    if not widths or not all(widths):
+        widths = [avail_width / n_cols] * n_cols
+    scale = min(1.0, avail_width / sum(widths))
+    widths = [w * scale for w in widths]
+
+    data: List[list] = []
+    spans: List[tuple] = []
+    for r, tr in enumerate(table._tbl.tr_lst):
+        row: list = []
+        for tc in tr.tc_lst:
+            span = tc.grid_span
+            if span > 1:
+                spans.append(("SPAN", (len(row), r), (len(row) + span - 1, r)))
+            row.append(_cell_flowables(_Cell(tc, table), default_size, styles))
+            row.extend([""] * (span - 1))
+        row.extend([""] * (n_cols - len(row)))
+        data.append(row[:n_cols])
+
+    if not data:
+        return None
+
+    # как в Word: без явного выравнивания таблица прижата к левому полю
+    t = RLTable(data, colWidths=widths, repeatRows=1, hAlign=_TABLE_ALIGN.get(table.alignment, "LEFT"))
+    t.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 3),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+        *spans,
+    ]))
+    return t
+
+
+def _page_geometry(doc: Document) -> Tuple[Tuple[float, float], Tuple[float, float, float, float]]:
+    """
+    ((ширина, высота), (левое, правое, верхнее, нижнее поле)) в пунктах — по последней секции.
+    """
+    sec = doc.sections[-1]
+
+    def _pt(length, default: float) -> float:
+        return float(length.pt) if length is not None else default
+
+    width = _pt(sec.page_width, 841.89)
+    height = _pt(sec.page_height, 595.28)
+    margins = (_pt(sec.left_margin, 56.7), _pt(sec.right_margin, 42.5),
+               _pt(sec.top_margin, 42.5), _pt(sec.bottom_margin, 42.5))
+    return (width, height), margins
+
+
+def _bookmarks(el) -> List[str]:
+    return [b.get(qn("w:name")) for b in el.iter(qn("w:bookmarkStart")) if b.get(qn("w:name"))]
+
+
+def _page_anchor(name: str, pages: Dict[str, int]):
+    """
+    Невидимый flowable: запоминает страницу, на которую попала закладка name.
+    """
+    from reportlab.platypus import Flowable
+
+    class _Anchor(Flowable):
+        def wrap(self, avail_width, avail_height):
+            return 0, 0
+
+        def draw(self):
+            pages[name] = self.canv.getPageNumber()
+
+    return _Anchor()
+
+
+# ключ в кеше отрисовки (styles): абзац с полем PAGEREF -> закладка, плюс список форм
+_REFS_KEY = ("pagerefs",)
+_FORMS_KEY = "forms"        # в refs: [(форма, закладка, кегль, выравнивание)]
+
+
+def _page_ref(refs: dict, name: str, size: float, align: int):
+    """
+    Номер страницы закладки name в ячейке оглавления: flowable рисует PDF-форму,
+    которую _RefCanvas определит при сохранении, когда страница уже известна.
+    """
+    from reportlab.platypus import Flowable
+
+    forms = refs[_FORMS_KEY]
+    form = f"pageref{len(forms)}"
+    forms.append((form, name, size, align))
+
+    class _Ref(Flowable):
+        def wrap(self, avail_width, avail_height):
+            self.width = avail_width
+            return avail_width, size * 1.15
+
+        def draw(self):
+            self.canv.saveState()
+            self.canv.translate(self.width * {1: 0.5, 2: 1.0}.get(align, 0.0), size * 0.15)
+            self.canv.doForm(form)
+            self.canv.restoreState()
+
+    return _Ref()
+
+
+def _ref_canvas(forms: list, pages: Dict[str, int]):
+    """
+    Canvas, который перед записью файла определяет формы номеров страниц (_page_ref).
+    """
+    from reportlab.pdfgen.canvas import Canvas
+
+    class _RefCanvas(Canvas):
+        def save(self):
+            for form, name, size, align in forms:
+                self.beginForm(form, lowerx=-1000, lowery=-size, upperx=1000, uppery=size * 2)
+                self.setFont(FONT_FAMILY, size)
+                text = str(pages.get(name, "–"))
+                if align == 1:
+                    self.drawCentredString(0, 0, text)
+                elif align == 2:
+                    self.drawRightString(0, 0, text)
+                else:
+                    self.drawString(0, 0, text)
+                self.endForm()
+            super().save()
+
+    return _RefCanvas
+
+
+def _build_story(doc: Document, avail_width: float, pages: Optional[Dict[str, int]] = None,
+                 refs: Optional[dict] = None) -> list:
+    """
+    Flowable'ы reportlab по body документа. pages задан — перед абзацами с закладками
+    ставятся якоря, которые при раскладке запишут туда номера страниц; refs — абзацы
+    с полями PAGEREF (см. _page_ref).
+    """
+    from reportlab.platypus import PageBreak
+
+    try:
+        normal = doc.styles["Normal"].font.size
+    except KeyError:
+        normal = None
+    default_size = normal.pt if normal is not None else DEFAULT_FONT_SIZE
+
+    styles: dict = {}   # ParagraphStyle по (кегль, выравнивание), свойства стилей docx, поля PAGEREF
+    if refs is not None:
+        styles[_REFS_KEY] = refs
+    story: list = []
+    body = doc.element.body
+    for el in body.iterchildren():
+        if pages is not None:
+            for name in _bookmarks(el):
+                story.append(_page_anchor(name, pages))
+        if el.tag == qn("w:p"):
+            p = Paragraph(el, doc._body)
+            if _has_page_break(el):
+                if p.text.strip():
+                    story.append(_make_paragraph(p, default_size, styles))
+                if story and not isinstance(story[-1], PageBreak):
+                    story.append(PageBreak())
+                continue
+            story.append(_make_paragraph(p, default_size, styles))
+        elif el.tag == qn("w:tbl"):
+            t = _make_table(Table(el, doc._body), avail_width, default_size, styles)
+            if t is not None:
+                story.append(t)
+
+    # хвостовые пустые абзацы дают лишнюю пустую страницу
+    while story and isinstance(story[-1], PageBreak):
+        story.pop()
+    return story
+
+
+def _build_pdf(doc: Document, target, title: str) -> Dict[str, int]:
+    """
+    Одна раскладка документа в target. Возвращает {закладка: страница} для закладок,
+    на которые ссылаются поля PAGEREF ({} — полей нет).
+    """
+    from reportlab.platypus import SimpleDocTemplate, Spacer
+
+    register_fonts()
+
+    fields = _pageref_fields(doc)
+    pages: Dict[str, int] = {}
+    refs = None
+    if fields:
+        refs = {_FORMS_KEY: []}
+        for name, texts in fields:
+            if texts:
+                refs[texts[0].getparent().getparent()] = name     # w:t -> w:r -> w:p
+
+    (width, height), (left, right, top, bottom) = _page_geometry(doc)
+    story = _build_story(doc, width - left - right, pages if fields else None, refs)
+    template = SimpleDocTemplate(
+        target, pagesize=(width, height),
+        leftMargin=left, rightMargin=right, topMargin=top, bottomMargin=bottom,
+        title=title,
+    )
+    if refs is not None:
+        template.build(story or [Spacer(1, 1)], canvasmaker=_ref_canvas(refs[_FORMS_KEY], pages))
+    else:
+        template.build(story or [Spacer(1, 1)])
+
+    for name, texts in fields:
+        if name in pages and texts:
+            texts[0].text = str(pages[name])
+            for t in texts[1:]:
+                t.text = ""
+    return pages
+
+
+def _pageref_fields(doc: Document) -> List[Tuple[str, list]]:
+    """
+    [(закладка, w:t результата поля)] для всех полей PAGEREF (сложные поля begin/separate/end).
+    """
+    fields: List[Tuple[str, list]] = []
+    state = None
+    instr: List[str] = []
+    result: list = []
+    for r in doc.element.body.iter(qn("w:r")):
+        fld = r.find(qn("w:fldChar"))
+        if fld is not None:
+            kind = fld.get(qn("w:fldCharType"))
+            if kind == "begin":
+                state, instr, result = "instr", [], []
+            elif kind == "separate":
+                state = "result"
+            elif kind == "end":
+                m = _PAGEREF_RE.match("".join(instr))
+                if m:
+                    fields.append((m.group(1), result))
+                state = None
+            continue
+        if state == "instr":
+            instr.extend(t.text or "" for t in r.iter(qn("w:instrText")))
+        elif state == "result":
+            result.extend(r.iter(qn("w:t")))
+    return fields
+
+
+def render_docx_pdf(doc: Document, pdf_path: str) -> str:
+    """
+    Рисует заполненный документ в PDF (pdf_path). Возвращает путь к PDF.
+    Номера страниц полей PAGEREF считаются в этой же раскладке и проставляются
+    и в PDF, и в сам doc (документ меняется на месте — его можно сохранять уже с ними).
+    """
+    pdf_path = os.path.normpath(os.path.abspath(pdf_path))
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    _build_pdf(doc, pdf_path, os.path.splitext(os.path.basename(pdf_path))[0])
+    return pdf_path
+
+
+def save_pdf_native(docx_path: str, pdf_path: str, doc: Optional[Document] = None) -> None:
+    """
+    DOCX -> PDF без Word (та же сигнатура, что у save_pdf_via_word).
+    doc — уже открытый документ, чтобы не читать docx_path заново.
+    """
+    render_docx_pdf(doc if doc is not None else Document(docx_path), pdf_path)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+
+# меняем при любом изменении формата/логики очистки — старые снимки станут невалидными
+SNAPSHOT_VERSION = 2
+
+
+def default_cache_dir() -> str:
+    """
+    Локальная папка кэша (НЕ сетевая): снимок нужен как раз затем,
+    чтобы не ходить по SMB за каждым открытием экрана.
+    """
+    return os.path.join(
+        os.environ.get("APPDATA", os.path.expanduser("~")),
+        "EpidMonitor",
+        "cache",
+        "swabs_journal",
+    )
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """
+    (size, mtime_ns) файла или None, если файл недоступен.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+def header_fingerprint(columns) -> str:
+    """
+    Отпечаток шапки листа (уже очищенные названия колонок, в исходном порядке).
+    """
+    h = hashlib.sha1()
+    for c in columns:
+        h.update(str(c).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def snapshot_path(journal_path: str, cache_dir: Optional[str] = None, key: Optional[dict] = None) -> str:
+    """
+    Файл снимка: хэш пути журнала и параметров загрузки (key) — журнал, прочитанный
+    с разным набором колонок (экран — все, report_batch — нужные), держит два снимка,
+    а не перетирает один и тот же.
+    """
+    ident = os.path.normcase(os.path.abspath(journal_path or ""))
+    if key:
+        ident += "\x1e" + json.dumps(key, sort_keys=True, ensure_ascii=False)
+    name = hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".pkl"
+    return os.path.join(cache_dir or default_cache_dir(), name)
+
+
+def _expected_meta(journal_path: str, sheets: Tuple[str, ...],
+                   sig: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+    if sig is None:
+        sig = file_signature(journal_path)
+    if sig is None:
+        return None
+    size, mtime_ns = sig
+    return {
+        "version": SNAPSHOT_VERSION,
+        "path": os.path.normcase(os.path.abspath(journal_path)),
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "sheets": list(sheets),
+    }
+
+
+def load_snapshot(
+    journal_path: str,
+    sheets: Tuple[str, ...],
+    cache_dir: Optional[str] = None,
+    key: Optional[dict] = None,
+    allow_stale: bool = False,
+) -> Optional[Tuple[Dict[str, pd.DataFrame], dict]]:
+    """
+    Возвращает (data_by_sheet, meta), если снимок есть и файл журнала
+    с тех пор не менялся (путь/размер/mtime/листы/версия совпадают).
+    key — дополнительные параметры загрузки, которые тоже должны совпасть.
+    Иначе None — значит нужен полный разбор.
+
+    allow_stale=True — вернуть последний снимок без проверки размера/mtime
+    (и без обращения к самому файлу журнала).
+    """
+    if allow_stale:
+        expected = {
+            "version": SNAPSHOT_VERSION,
+            "path": os.path.normcase(os.path.abspath(journal_path or "")),
+            "sheets": list(sheets),
+        }
+    else:
+        expected = _expected_meta(journal_path, sheets)
+        if expected is None:
+            return None
+    expected.update(key or {})
+
+    p = snapshot_path(journal_path, cache_dir, key)
+    if not os.path.exists(p):
+        return None
+
+    try:
+        with open(p, "rb") as f:
+            payload = pickle.load(f)
+    except Exception:
+        return None
+
+    meta = (payload or {}).get("meta") or {}
+    frames = (payload or {}).get("frames") or {}
+
+    for k, v in expected.items():
+        if meta.get(k) != v:
+            return None
+
+    # отпечатки шапок должны соответствовать самим кадрам (защита от битого/чужого снимка)
+    headers = meta.get("headers") or {}
+    for sh in sheets:
+        df = frames.get(sh)
+        if df is None or headers.get(sh) != header_fingerprint(df.columns):
+            return None
+
+    return frames, meta
+
+
+def save_snapshot(
+    journal_path: str,
+    sheets: Tuple[str, ...],
+    data_by_sheet: Dict[str, pd.DataFrame],
+    cache_dir: Optional[str] = None,
+    key: Optional[dict] = None,
+    extra: Optional[dict] = None,
+    signature: Optional[Tuple[int, int]] = None,
+) -> Optional[str]:
+    """
+    Сохраняет очищенные кадры листов. Ошибки записи кэша не критичны — просто None.
+
+    signature — (size, mtime_ns), снятые ДО чтения журнала: если файл поменяли
+    во время разбора, снимок не совпадёт со следующим stat и будет перечитан.
+    """
+    meta = _expected_meta(journal_path, sheets, signature)
+    if meta is None:
+        return None
+
+    meta.update(key or {})
+    meta["headers"] = {sh: header_fingerprint(df.columns) for sh, df in data_by_sheet.items()}
+    if extra:
+        meta.update(extra)
+
+    p = snapshot_path(journal_path, cache_dir, key)
+    tmp = p + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump({"meta": meta, "frames": data_by_sheet}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+    except Exception:
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        except Exception:
+            pass
+        return None
+    return p
+
+
+# -------------------------
+# схемы листов (какая колонка — дата/отделение/..., формат даты) по отпечатку шапки
+# -------------------------
+
+SCHEMA_VERSION = 1
+
+
+def schema_path(cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or default_cache_dir(), "schemas.json")
+
+
+def load_schemas(cache_dir: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Отпечаток шапки -> {"columns": {логическая колонка: реальная}, "date_format": ...}.
+    Нет файла/битый/другая версия — пустой словарь (схемы просто выведутся заново).
+    """
+    try:
+        with open(schema_path(cache_dir), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != SCHEMA_VERSION:
+        return {}
+    return dict(payload.get("headers") or {})
+
+
+def save_schemas(schemas: Dict[str, dict], cache_dir: Optional[str] = None) -> None:
+    """
+    Дописывает схемы к уже сохранённым (журналы разных лет делят один файл).
+    Ошибки записи не критичны.
+    """
+    merged = load_schemas(cache_dir)
+    merged.update(schemas)
+
+    p = schema_path(cache_dir)
+    tmp = f"{p}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SCHEMA_VERSION, "headers": merged}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, p)
+    except Exception:
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        except Exception:
+            pass
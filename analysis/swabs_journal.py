@@ -1,17 +1,42 @@
 from __future__ import annotations
 
+import glob
+import hashlib
+import importlib.util
+import copy
+import os
 import re
+import threading
 import unicodedata
 import datetime as dt
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from analysis import swabs_cache
+from utils.process_pool import pool_size, spawn_without_main
 
 
 DATE_COL = "Дата исследования"
 DEP_COL = "Подразделение"
 BUILDING_COL = "Корпус"
 
+# колонки, которые реально нужны экрану мониторинга и report_builder
+ROOM_COL = "Наименование помещения"
+PLACE_COL = "Место отбора проб"
+CULTURE_COL = "Выделенная культура"
+COND_COL = "Условия отбора"
+OMCH_COL = "ОМЧ"
+FIO_COL = "ФИО"
+
+USED_COLUMNS = (
+    DATE_COL, DEP_COL, BUILDING_COL,
+    ROOM_COL, PLACE_COL, CULTURE_COL, COND_COL, OMCH_COL, FIO_COL,
+)
+
 SHEETS_DEFAULT = ("Абиотические", "Воздух", "Персонал")
 
 
@@ -59,6 +84,126 @@ def _to_date(x) -> Optional[pd.Timestamp]:
     return pd.Timestamp(dtv.date())
 
 
+# невидимые символы, которые _clean_text просто выкидывает
+_INVISIBLE_RE = "[\u200b\ufeff\u00ad]"
+
+# форматы, которые реально встречаются в журнале; всё остальное — поштучно через _to_date
+_DATE_FORMATS = (
+    "%d.%m.%Y",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y",
+)
+
+
+def _clean_text_series(s: pd.Series) -> pd.Series:
+    """
+    Векторный аналог s.apply(_clean_text).
+    Чистим только уникальные значения (отделений/корпусов — сотни на весь год)
+    и раскладываем результат обратно по кодам.
+    """
+    codes, uniques = pd.factorize(s)
+    if len(uniques) == 0:
+        return pd.Series("", index=s.index, dtype=object)
+
+    u = pd.Series([str(v) for v in np.asarray(uniques, dtype=object)], dtype=object)
+    u = (
+        u.str.normalize("NFKC")
+        .str.replace(_INVISIBLE_RE, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+    out = np.where(codes >= 0, u.to_numpy(dtype=object)[codes], "")
+    return pd.Series(out, index=s.index, dtype=object)
+
+
+def _detect_date_format(txt: pd.Series) -> Optional[str]:
+    """
+    Подбираем формат по выборке строк: тот, который разобрал больше всего значений.
+    """
+    sample = txt.iloc[:500]
+    best, best_hits = None, 0
+    for fmt in _DATE_FORMATS:
+        hits = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+def _date_text(u: pd.Series) -> pd.Series:
+    """
+    Строковые даты в том виде, в каком их разбирают по формату (без "г.", пустые выброшены).
+    """
+    txt = _clean_text_series(u)
+    txt = txt.str.replace("г.", "", regex=False).str.replace("г", "", regex=False).str.strip()
+    return txt[txt != ""]
+
+
+def _infer_date_format(s: pd.Series) -> Optional[str]:
+    """
+    Формат строковых дат колонки (None — строк нет или формат не распознан).
+    """
+    u = pd.Series(pd.unique(s.dropna().to_numpy(dtype=object)), dtype=object)
+    u = u[~u.map(lambda x: isinstance(x, (pd.Timestamp, dt.datetime, dt.date))).astype(bool)]
+    txt = _date_text(u) if len(u) else u
+    return _detect_date_format(txt) if len(txt) else None
+
+
+def _to_date_series(s: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+    """
+    Векторный аналог s.apply(_to_date) -> datetime64[ns] (NaT вместо None).
+    - готовые даты (datetime/date) конвертируются одним pd.to_datetime
+    - строки: формат определяется один раз на колонку и разбирается одним вызовом
+    - то, что не подошло под формат, добирается поштучно через _to_date
+    """
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        v = s
+        if getattr(v.dt, "tz", None) is not None:
+            v = v.dt.tz_localize(None)
+        return v.dt.normalize().astype("datetime64[ns]")
+
+    codes, uniques = pd.factorize(s)
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+
+    u = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    parsed = pd.Series(pd.NaT, index=u.index, dtype="datetime64[ns]")
+
+    is_dt = u.map(lambda x: isinstance(x, (pd.Timestamp, dt.datetime, dt.date))).astype(bool)
+
+    dt_vals = u[is_dt]
+    if len(dt_vals):
+        try:
+            conv = pd.DatetimeIndex(pd.to_datetime(dt_vals.tolist()))
+            if conv.tz is not None:
+                conv = conv.tz_localize(None)
+            parsed.loc[dt_vals.index] = conv.normalize().to_numpy()
+        except Exception:
+            parsed.loc[dt_vals.index] = [_to_date(x) for x in dt_vals]
+
+    txt = _date_text(u[~is_dt])
+
+    if len(txt):
+        fmt = fmt or _detect_date_format(txt)
+        if fmt:
+            conv = pd.to_datetime(txt, format=fmt, errors="coerce")
+            ok = conv.notna()
+            parsed.loc[conv.index[ok]] = conv[ok].dt.normalize().to_numpy()
+            left = conv.index[~ok]
+        else:
+            left = txt.index
+
+        if len(left):
+            parsed.loc[left] = [_to_date(u[i]) for i in left]
+
+    vals = parsed.to_numpy(dtype="datetime64[ns]")
+    out = np.where(codes >= 0, vals[codes], np.datetime64("NaT", "ns"))
+    return pd.Series(out, index=s.index, dtype="datetime64[ns]")
+
+
+@lru_cache(maxsize=4096)
 def _canon_operblock(dep_clean: str, building_clean: str) -> Optional[str]:
     dep_l = (dep_clean or "").lower()
     if "оперблок" not in dep_l:
@@ -106,105 +251,984 @@ def _find_col(df: pd.DataFrame, want: str) -> Optional[str]:
     return None
 
 
+def _resolve_columns(columns, wanted: Tuple[str, ...] = USED_COLUMNS) -> Dict[str, str]:
+    """
+    Все логические колонки за один проход по шапке. Правило то же, что у _find_col:
+    точное совпадение важнее вхождения, среди равных — первая слева.
+    """
+    wants = [(w, _norm_col(w)) for w in wanted]
+    exact: Dict[str, str] = {}
+    partial: Dict[str, str] = {}
+    for c in columns:
+        n = _norm_col(c)
+        for w, wn in wants:
+            if not wn:
+                continue
+            if n == wn:
+                exact.setdefault(w, c)
+            elif wn in n:
+                partial.setdefault(w, c)
+
+    out = {}
+    for w, _ in wants:
+        c = exact.get(w) or partial.get(w)
+        if c:
+            out[w] = c
+    return out
+
+
+# кадры журнала несут найденные колонки в attrs: логическое имя (DATE_COL, ROOM_COL, ...) -> реальное
+SCHEMA_ATTR = "resolved_columns"
+
+
+def _resolved_col(df: pd.DataFrame, want: str) -> Optional[str]:
+    c = (df.attrs.get(SCHEMA_ATTR) or {}).get(want)
+    if c is not None and c in df.columns:
+        return c
+    return _find_col(df, want)
+
+
 def _as_str(v) -> str:
     return v if isinstance(v, str) else ""
 
 
-@dataclass
-class SwabsJournal:
-    path: str
-    sheets: Tuple[str, ...] = SHEETS_DEFAULT
-    data_by_sheet: Dict[str, pd.DataFrame] = None
+def _usecols_filter(columns: Optional[Tuple[str, ...]]):
+    """
+    usecols для read_excel: берём колонку, если её шапка содержит одно из нужных названий
+    (то же правило "похожей" колонки, что и в _find_col). None -> читаем всё.
+    """
+    if not columns:
+        return None
+    wanted = [w for w in (_norm_col(c) for c in columns) if w]
+    return lambda c: any(w in _norm_col(c) for w in wanted)
+
+
+def _engine_candidates(engine: Optional[str]) -> List[Optional[str]]:
+    """
+    Порядок движков для read_excel. None — выбор pandas по расширению файла
+    (последний откат: так же, как было до настройки).
+    """
+    engine = (engine or "auto").strip().lower()
+    out: List[Optional[str]] = []
+    if engine == "auto":
+        if importlib.util.find_spec("python_calamine") is not None:
+            out.append("calamine")
+    else:
+        out.append(engine)
+    out.append(None)
+    return out
 
-    def load(self) -> None:
-        data: Dict[str, pd.DataFrame] = {}
 
-        for sh in self.sheets:
-            df = pd.read_excel(self.path, sheet_name=sh)
-            df = df.dropna(how="all").copy()
+class JournalLoadCancelled(Exception):
+    """
+    Загрузка журнала прервана (например, пользователь ушёл с экрана).
+    """
 
-            df.columns = [_clean_text(c) for c in df.columns]
 
-            date_col = _find_col(df, DATE_COL)
-            dep_col = _find_col(df, DEP_COL)
-            building_col = _find_col(df, BUILDING_COL)
+# progress(stage, detail): stage — "read" | "clean" | "map" | "index", detail — имя листа или ""
+ProgressCallback = Callable[[str, str], None]
 
-            if not date_col:
-                raise ValueError(f"На листе '{sh}' нет колонки '{DATE_COL}' (или похожей)")
-            if not dep_col:
-                raise ValueError(f"На листе '{sh}' нет колонки '{DEP_COL}' (или похожей)")
 
-            if not building_col:
-                df[BUILDING_COL] = ""
-                building_col = BUILDING_COL
+def _step(progress: Optional[ProgressCallback], cancel: Optional[threading.Event],
+          stage: str, detail: str = "") -> None:
+    if cancel is not None and cancel.is_set():
+        raise JournalLoadCancelled()
+    if progress is not None:
+        progress(stage, detail)
 
-            df["_sheet"] = sh
-            df["_date"] = df[date_col].apply(_to_date)
 
-            # сохраняем ОРИГИНАЛ (для совместимости старых алиасов)
-            df["_dep_raw_orig"] = df[dep_col].astype(str)
+def _read_sheets(path: str, sheets: Tuple[str, ...], usecols, engine: Optional[str],
+                 progress: Optional[ProgressCallback] = None,
+                 cancel: Optional[threading.Event] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Все листы за одно открытие книги: zip и sharedStrings разбираются один раз,
+    а не на каждый лист. Между листами — прогресс и проверка отмены.
+    """
+    last_err: Optional[Exception] = None
+    for eng in _engine_candidates(engine):
+        try:
+            out: Dict[str, pd.DataFrame] = {}
+            with pd.ExcelFile(path, engine=eng) as xf:
+                for sh in sheets:
+                    _step(progress, cancel, "read", sh)
+                    out[sh] = xf.parse(sh, usecols=usecols)
+            return out
+        except (FileNotFoundError, PermissionError, JournalLoadCancelled):
+            raise
+        except Exception as e:
+            last_err = e
+            continue
+    raise last_err
+
+
+def _row_hashes(raw_df: pd.DataFrame) -> np.ndarray:
+    """
+    Хэш каждой строки сырого листа (uint64): строка хэшируется сама по себе,
+    поэтому хэши первых N строк не зависят от того, что дописано после них.
+    """
+    return pd.util.hash_pandas_object(raw_df.astype(str), index=False).to_numpy()
+
+
+def _prefix_hash(row_hashes: np.ndarray, rows: int) -> str:
+    return hashlib.sha1(row_hashes[:rows].tobytes()).hexdigest()
+
+
+def _sheet_state(raw_df: pd.DataFrame, row_hashes: Optional[np.ndarray] = None) -> dict:
+    """
+    Что запоминаем про сырой лист: шапку, число строк и хэш ВСЕХ строк —
+    лаборатория вписывает культуру в старые строки спустя дни, правка любой строки
+    должна уводить refresh() в полный разбор.
+    """
+    if row_hashes is None:
+        row_hashes = _row_hashes(raw_df)
+    n = len(raw_df)
+    return {
+        "header": swabs_cache.header_fingerprint(_clean_text(c) for c in raw_df.columns),
+        "rows": n,
+        "rows_hash": _prefix_hash(row_hashes, n),
+    }
+
+
+def _appended_from(raw_df: pd.DataFrame, state: Optional[dict],
+                   row_hashes: Optional[np.ndarray] = None) -> Optional[int]:
+    """
+    Номер первой новой строки, если лист только дописан (все прежние строки совпали);
+    None — нужен полный разбор.
+    """
+    if not state or "rows_hash" not in state:
+        return None
+    if swabs_cache.header_fingerprint(_clean_text(c) for c in raw_df.columns) != state.get("header"):
+        return None
 
-            df["_dep_raw_clean"] = df[dep_col].apply(_clean_text)
-            df["_building_clean"] = df[building_col].apply(_clean_text)
+    rows = int(state.get("rows", -1))
+    if rows < 0 or len(raw_df) < rows:
+        return None
 
-            df = df[df["_date"].notna() & df["_dep_raw_clean"].astype(bool)].copy()
-            data[sh] = df
+    if row_hashes is None:
+        row_hashes = _row_hashes(raw_df)
+    if _prefix_hash(row_hashes, rows) != state["rows_hash"]:
+        return None
+    return rows
+
+
+# ключ привязки отделения: (очищенное, корпус, исходное из Excel)
+_DEP_KEY_COLS = ["_dep_raw_clean", "_building_clean", "_dep_raw_orig"]
+
+# колонки с несколькими сотнями разных значений на весь год — храним категориями
+# (коды + один экземпляр строки), а не строкой Python в каждой ячейке
+_CATEGORY_INTERNAL = ("_sheet", "_dep_raw_orig", "_dep_raw_clean", "_building_clean")
+_CATEGORY_TEXT = (DEP_COL, BUILDING_COL, ROOM_COL, PLACE_COL, CULTURE_COL, COND_COL, FIO_COL)
 
-        self.data_by_sheet = data
 
-    def unique_raw_departments(self) -> List[str]:
-        s = set()
-        for df in self.data_by_sheet.values():
-            for t in df["_dep_raw_clean"].dropna().astype(str):
-                t = _clean_text(t)
-                if t:
-                    s.add(t)
-        return sorted(s)
-
-    def apply_department_mapping(self, mapping: Dict[str, str]) -> None:
-        for sh, df in self.data_by_sheet.items():
+def _to_categories(df: pd.DataFrame, resolved: Dict[str, str]) -> pd.DataFrame:
+    """
+    Повторяющиеся текстовые колонки листа -> category (на месте, df уже свой).
+    resolved — найденные колонки листа (см. _resolve_columns).
+    """
+    cols = list(_CATEGORY_INTERNAL)
+    for want in _CATEGORY_TEXT:
+        c = resolved.get(want)
+        if c and c not in cols:
+            cols.append(c)
+
+    for c in cols:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    return df
 
-            def map_row(row) -> str:
-                dep_clean = row.get("_dep_raw_clean", "") or ""
-                b_clean = row.get("_building_clean", "") or ""
 
-                oper = _canon_operblock(dep_clean, b_clean)
-                if oper:
-                    return oper
+def _concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat, который не теряет категории: при разных наборах категорий pandas
+    откатывает колонку в object, поэтому сначала приводим её к объединённому набору.
+    """
+    first = frames[0]
+    for c in first.columns:
+        if not isinstance(first[c].dtype, pd.CategoricalDtype):
+            continue
+        cats = first[c].cat.categories
+        for f in frames[1:]:
+            if c in f.columns:
+                v = f[c] if isinstance(f[c].dtype, pd.CategoricalDtype) else f[c].astype("category")
+                cats = cats.union(v.cat.categories, sort=False)
+        dtype = pd.CategoricalDtype(cats)
+        aligned = []
+        for f in frames:
+            if c in f.columns and f[c].dtype != dtype:
+                f = f.copy(deep=False)
+                f[c] = f[c].astype(dtype)
+            aligned.append(f)
+        frames = aligned
+        first = frames[0]
+    return pd.concat(frames)
+
+
+# "ничего не выделено" — как на экране мониторинга (пусто или прочерк)
+_NO_CULTURE = ("", "-", "—", "–")
+
+
+def _culture_labels(s: pd.Series) -> np.ndarray:
+    """
+    Выделенная культура по строкам: очищенный текст или "" — если не выделено.
+    Считается по уникальным значениям (категории), а не по строкам.
+    """
+    codes, uniques = pd.factorize(s)
+    if len(uniques) == 0:
+        return np.full(len(s), "", dtype=object)
+
+    u = _clean_text_series(pd.Series(np.asarray(uniques, dtype=object), dtype=object))
+    labels = u.where(~u.isin(_NO_CULTURE), "").to_numpy(dtype=object)
+    return np.where(codes >= 0, labels[codes], "")
+
+
+def _range_bounds(start, end) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    start = pd.Timestamp.min if start is None else pd.Timestamp(start).normalize()
+    end = pd.Timestamp.max if end is None else pd.Timestamp(end).normalize()
+    return start, end
+
+
+_PERIOD_FREQ = {"W": "W-SUN", "M": "M"}
+
+
+def _canon_categorical(canon: np.ndarray, codes: np.ndarray) -> pd.Categorical:
+    """
+    Отделения строк по кодам ключей сразу категорией: разные ключи часто дают одно отделение,
+    поэтому категории — уникальные значения canon, а коды пересчитываются через inverse.
+    """
+    cats, inverse = np.unique(canon.astype(str), return_inverse=True)
+    return pd.Categorical.from_codes(inverse[codes], categories=cats)
+
+
+def _map_department(dep_clean: str, b_clean: str, raw_orig: str, mapping: Dict[str, str]) -> str:
+    oper = _canon_operblock(dep_clean or "", b_clean or "")
+    if oper:
+        return oper
+
+    v = _as_str(mapping.get(dep_clean or ""))
+    if v:
+        return v
+
+    v2 = _as_str(mapping.get(_clean_text(raw_orig)))
+    if v2:
+        return v2
+
+    return ""
+
+
+# -------------------------
+# несколько годовых книг (журнал ведётся по файлу на год)
+# -------------------------
+
+_YEAR_RE = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+
+
+def _is_multi_path(path) -> bool:
+    if isinstance(path, (list, tuple)):
+        return True
+    return any(ch in str(path or "") for ch in "*?[")
+
+
+def journal_year(path: str) -> Optional[int]:
+    """
+    Год книги по имени файла ("Журнал смывов 2025.xlsx" -> 2025); None — год не указан.
+    """
+    found = _YEAR_RE.findall(os.path.basename(str(path or "")))
+    return int(found[-1]) if found else None
+
+
+def resolve_journal_paths(path) -> List[str]:
+    """
+    Книги журнала: один путь, маска (glob) или список путей/масок.
+    Временные файлы Excel (~$...) пропускаются, порядок — по году из имени.
+    """
+    items = list(path) if isinstance(path, (list, tuple)) else [path]
+
+    out: List[str] = []
+    for item in items:
+        item = str(item or "").strip()
+        if not item:
+            continue
+        found = sorted(glob.glob(item)) if _is_multi_path(item) else [item]
+        for f in found:
+            if os.path.basename(f).startswith("~$") or f in out:
+                continue
+            out.append(f)
 
-                v = _as_str(mapping.get(dep_clean))
-                if v:
-                    return v
+    return sorted(out, key=lambda f: (journal_year(f) or 0, f))
 
-                raw_orig = _clean_text(row.get("_dep_raw_orig", ""))
-                v2 = _as_str(mapping.get(raw_orig))
-                if v2:
-                    return v2
 
-                return ""
+def journal_signature(path) -> Optional[tuple]:
+    """
+    Сигнатура для наблюдателя за файлом: (size, mtime_ns) одной книги, а для маски/списка —
+    по всем книгам сразу (так замечается и появление книги нового года).
+    """
+    if not _is_multi_path(path):
+        return swabs_cache.file_signature(path)
 
-            df["_dep_canon"] = df.apply(map_row, axis=1)
-            self.data_by_sheet[sh] = df
+    paths = resolve_journal_paths(path)
+    if not paths:
+        return None
+    return tuple((p, swabs_cache.file_signature(p)) for p in paths)
 
-    def unknown_departments_for_mapping(self, mapping: Dict[str, str]) -> List[str]:
-        unknown = set()
 
-        for df in self.data_by_sheet.values():
-            if df is None or df.empty:
+def _load_part_worker(params: dict) -> Tuple[Dict[str, pd.DataFrame], dict]:
+    """
+    Разбор одной книги в процессе пула (функция верхнего уровня — иначе не передать в пул).
+    Снимок книга сохраняет сама; обратно — очищенные листы и состояние для refresh().
+    """
+    part = SwabsJournal(**params)
+    part.load()
+    return part.data_by_sheet, part._state_meta()
+
+
+def _merge_dates(lists) -> List[pd.Timestamp]:
+    """
+    Даты из нескольких книг — одним списком по убыванию (на стыке лет даты могут повторяться).
+    """
+    return sorted(set().union(*lists), reverse=True)
+
+
+@dataclass
+class SwabsJournal:
+    # путь к xlsx; маска ("...\\Журнал смывов *.xlsx") или список — несколько годовых книг,
+    # каждая становится отдельным разделом (см. _load_parts), запросы объединяют их результаты
+    path: str
+    sheets: Tuple[str, ...] = SHEETS_DEFAULT
+    data_by_sheet: Dict[str, pd.DataFrame] = None
+    # локальный снимок очищенных листов; None -> папка по умолчанию (AppData)
+    cache_dir: Optional[str] = None
+    use_cache: bool = True
+    # какие колонки читать из xlsx (None — все) и чем читать (см. _engine_candidates)
+    columns: Optional[Tuple[str, ...]] = USED_COLUMNS
+    engine: str = "auto"
+    # True, если последний load() поднял данные из снимка, а не разбирал xlsx
+    loaded_from_cache: bool = False
+    # год книги (по имени файла); frozen — год закрыт: книга больше не меняется,
+    # её снимок берётся без stat по сети, а refresh() её не перечитывает
+    year: Optional[int] = None
+    frozen: bool = False
+    # сколько процессов разбирают книги при загрузке нескольких лет (None — по числу ядер)
+    workers: Optional[int] = None
+
+    # индекс (см. _build_index): лист -> (отделение, дата) -> позиции строк
+    _pos: Optional[Dict[str, Dict[Tuple[str, pd.Timestamp], np.ndarray]]] = field(
+        default=None, init=False, repr=False
+    )
+    _pos_by_date: Dict[str, Dict[pd.Timestamp, np.ndarray]] = field(default_factory=dict, init=False, repr=False)
+    _dates_by_dep: Dict[str, List[pd.Timestamp]] = field(default_factory=dict, init=False, repr=False)
+    # (отделение, дата) -> битовая маска листов (бит i = self.sheets[i])
+    _presence: Dict[Tuple[str, pd.Timestamp], int] = field(default_factory=dict, init=False, repr=False)
+    _all_dates: List[pd.Timestamp] = field(default_factory=list, init=False, repr=False)
+    _public_cols: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False)
+    # уникальные ключи отделений (см. _department_keys) + коды строк по листам
+    _dep_keys: Optional[List[Tuple[str, str, str]]] = field(default=None, init=False, repr=False)
+    _dep_codes: Dict[str, np.ndarray] = field(default_factory=dict, init=False, repr=False)
+    # последняя применённая привязка и её результат по кодам ключей (для дописанных строк)
+    _mapping: Optional[Dict[str, str]] = field(default=None, init=False, repr=False)
+    _canon: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    # состояние для refresh(): (size, mtime_ns) и хэши строк листов на момент загрузки
+    _signature: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False)
+    _loaded_path: Optional[str] = field(default=None, init=False, repr=False)
+    _sheet_state: Dict[str, dict] = field(default_factory=dict, init=False, repr=False)
+    # схемы листов по отпечатку шапки (см. _schema_for)
+    _schemas: Optional[Dict[str, dict]] = field(default=None, init=False, repr=False)
+    _schemas_dirty: bool = field(default=False, init=False, repr=False)
+    # разделы по книгам (путь -> журнал одной книги); None — журнал из одной книги
+    _parts: Optional[Dict[str, "SwabsJournal"]] = field(default=None, init=False, repr=False)
+
+    def load(self, progress: Optional[ProgressCallback] = None,
+             cancel: Optional[threading.Event] = None) -> None:
+        if _is_multi_path(self.path):
+            self._load_parts(progress, cancel)
+            return
+
+        self.loaded_from_cache = False
+        if self._load_cached(progress, cancel):
+            return
+
+        # stat ДО чтения: если файл поменяют во время разбора, снимок окажется устаревшим
+        sig = swabs_cache.file_signature(self.path)
+        raw = _read_sheets(self.path, self.sheets, _usecols_filter(self.columns), self.engine, progress, cancel)
+        self._load_from_raw(raw, sig, progress, cancel)
+
+    def _load_cached(self, progress: Optional[ProgressCallback] = None,
+                     cancel: Optional[threading.Event] = None) -> bool:
+        if not self.use_cache:
+            return False
+        # закрытый год сверять с файлом незачем: любой его снимок актуален
+        cached = swabs_cache.load_snapshot(
+            self.path, self.sheets, self.cache_dir, key=self._cache_key(), allow_stale=self.frozen
+        )
+        if cached is None:
+            return False
+        _step(progress, cancel, "index")
+        self._restore(*cached)
+        return True
+
+    def restore_snapshot(self) -> bool:
+        """
+        Поднимает последний снимок, даже если журнал с тех пор поменялся, и не обращается
+        к самому xlsx: экран сразу показывает прошлые данные, пока в фоне идёт refresh().
+        """
+        if not self.use_cache:
+            return False
+
+        if _is_multi_path(self.path):
+            parts = {}
+            for p in resolve_journal_paths(self.path):
+                part = self._make_part(p)
+                if part.restore_snapshot():
+                    parts[p] = part
+            if not parts:
+                return False
+            self._parts = parts
+            self._loaded_path = self.path
+            self.loaded_from_cache = True
+            return True
+
+        cached = swabs_cache.load_snapshot(
+            self.path, self.sheets, self.cache_dir, key=self._cache_key(), allow_stale=True
+        )
+        if cached is None:
+            return False
+        self._restore(*cached)
+        return True
+
+    def _restore(self, frames: Dict[str, pd.DataFrame], meta: dict) -> None:
+        self.data_by_sheet = frames
+        self.loaded_from_cache = True
+        self._dep_keys = None
+        self._canon = None
+        self._signature = (meta["size"], meta["mtime_ns"]) if meta.get("size") is not None else None
+        self._loaded_path = self.path
+        self._sheet_state = meta.get("sheet_state") or {}
+        self._build_index()
+
+    def _state_meta(self) -> dict:
+        """
+        Состояние загрузки в том же виде, что meta снимка (для передачи из процесса пула).
+        """
+        size, mtime_ns = self._signature or (None, None)
+        return {"size": size, "mtime_ns": mtime_ns, "sheet_state": self._sheet_state}
+
+    # -------------------------
+    # разделы по годам
+    # -------------------------
+
+    def partitions(self) -> List["SwabsJournal"]:
+        """
+        Журналы отдельных книг (по возрастанию года); для одной книги — сам журнал.
+        """
+        if self._parts is not None:
+            return list(self._parts.values())
+        return [] if _is_multi_path(self.path) else [self]
+
+    def memory_report(self) -> Dict[str, dict]:
+        """
+        Память кадров по листам (для нескольких книг — суммарно):
+          rows         — строк
+          bytes        — сколько занимает сейчас
+          bytes_object — сколько заняли бы те же кадры со строками (object) вместо категорий
+        Считается с deep=True (по каждой строке), поэтому только для отчётов/бенчмарка.
+        """
+        report: Dict[str, dict] = {}
+        for part in self.partitions():
+            for sh, df in (part.data_by_sheet or {}).items():
+                r = report.setdefault(sh, {"rows": 0, "bytes": 0, "bytes_object": 0})
+                cats = {c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+                r["rows"] += len(df)
+                r["bytes"] += int(df.memory_usage(deep=True).sum())
+                r["bytes_object"] += int(df.astype(cats).memory_usage(deep=True).sum())
+        return report
+
+    def _make_part(self, path: str) -> "SwabsJournal":
+        year = journal_year(path)
+        return SwabsJournal(
+            path=path,
+            sheets=self.sheets,
+            cache_dir=self.cache_dir,
+            use_cache=self.use_cache,
+            columns=self.columns,
+            engine=self.engine,
+            year=year,
+            frozen=year is not None and year < dt.date.today().year,
+        )
+
+    def _load_parts(self, progress: Optional[ProgressCallback] = None,
+                    cancel: Optional[threading.Event] = None, reuse: bool = False) -> None:
+        """
+        Несколько книг: у каждой свой снимок и своё состояние refresh().
+        Что есть в снимках, поднимается сразу; остальные книги разбираются параллельно
+        (разбор xlsx упирается в CPU, поэтому процессы, а не потоки).
+        reuse=True — уже загруженные книги остаются как есть (меняется только состав).
+        """
+        paths = resolve_journal_paths(self.path)
+        if not paths:
+            raise FileNotFoundError(f"Не найдено ни одной книги журнала: {self.path}")
+
+        old = (self._parts or {}) if reuse else {}
+        parts: Dict[str, SwabsJournal] = {}
+        pending: List[SwabsJournal] = []
+        for p in paths:
+            part = old.get(p)
+            if part is None or part.data_by_sheet is None:
+                part = self._make_part(p)
+                if not part._load_cached(progress, cancel):
+                    pending.append(part)
+            parts[p] = part
+
+        self._parse_parts(pending, progress, cancel)
+
+        self._parts = parts
+        self._loaded_path = self.path
+        self.loaded_from_cache = not pending
+
+    def _parse_parts(self, pending: List["SwabsJournal"],
+                     progress: Optional[ProgressCallback] = None,
+                     cancel: Optional[threading.Event] = None) -> None:
+        if not pending:
+            return
+
+        workers = pool_size(len(pending), self.workers)
+        if workers <= 1:
+            for part in pending:
+                _step(progress, cancel, "read", os.path.basename(part.path))
+                part.load(progress, cancel)
+            return
+
+        _step(progress, cancel, "read", ", ".join(os.path.basename(p.path) for p in pending))
+        ex = ProcessPoolExecutor(max_workers=workers)
+        try:
+            with spawn_without_main():
+                futures = {ex.submit(_load_part_worker, part._worker_params()): part for part in pending}
+
+            left = set(futures)
+            while left:
+                # отмена проверяется между ожиданиями: книга в процессе дочитывается, но её не ждём
+                done, left = wait(left, timeout=0.5, return_when=FIRST_COMPLETED)
+                _step(None, cancel, "read")
+                for fut in done:
+                    part = futures[fut]
+                    frames, meta = fut.result()
+                    _step(progress, cancel, "index", os.path.basename(part.path))
+                    part._restore(frames, meta)
+                    part.loaded_from_cache = False
+        except BaseException:
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
+        ex.shutdown()
+
+    def _worker_params(self) -> dict:
+        return {
+            "path": self.path,
+            "sheets": self.sheets,
+            "cache_dir": self.cache_dir,
+            "use_cache": self.use_cache,
+            "columns": self.columns,
+            "engine": self.engine,
+            "year": self.year,
+        }
+
+    def _refresh_parts(self, progress: Optional[ProgressCallback] = None,
+                       cancel: Optional[threading.Event] = None) -> str:
+        if self._parts is None or self._loaded_path != self.path:
+            self.load(progress, cancel)
+            return "full"
+
+        modes = []
+        if resolve_journal_paths(self.path) != list(self._parts):
+            # появилась книга нового года (или книгу убрали): меняется только состав разделов
+            self._load_parts(progress, cancel, reuse=True)
+            modes.append("full")
+
+        modes.extend(part.refresh(progress, cancel) for part in self._parts.values())
+        self.loaded_from_cache = all(part.loaded_from_cache for part in self._parts.values())
+        if "full" in modes:
+            return "full"
+        return "append" if "append" in modes else "unchanged"
+
+    def _concat_parts(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        nonempty = [f for f in frames if not f.empty]
+        if not nonempty:
+            return frames[0] if frames else pd.DataFrame()
+        if len(nonempty) == 1:
+            return nonempty[0]
+        return _concat_frames(nonempty)
+
+    def copy(self) -> "SwabsJournal":
+        """
+        Копия для фоновой перезагрузки: кадры общие (refresh/привязка их не меняют на месте),
+        контейнеры и индекс — свои. Пока копия грузится, оригинал спокойно читает экран.
+        """
+        new = copy.copy(self)
+        if self.data_by_sheet is not None:
+            new.data_by_sheet = {sh: df.copy(deep=False) for sh, df in self.data_by_sheet.items()}
+        if self._pos is not None:
+            new._pos = {sh: dict(d) for sh, d in self._pos.items()}
+        new._pos_by_date = {sh: dict(d) for sh, d in self._pos_by_date.items()}
+        new._dates_by_dep = dict(self._dates_by_dep)
+        new._presence = dict(self._presence)
+        new._all_dates = list(self._all_dates)
+        new._public_cols = dict(self._public_cols)
+        new._dep_keys = list(self._dep_keys) if self._dep_keys is not None else None
+        new._dep_codes = dict(self._dep_codes)
+        new._sheet_state = dict(self._sheet_state)
+        if self._parts is not None:
+            new._parts = {p: part.copy() for p, part in self._parts.items()}
+        return new
+
+    def _load_from_raw(self, raw: Dict[str, pd.DataFrame], sig: Optional[Tuple[int, int]],
+                       progress: Optional[ProgressCallback] = None,
+                       cancel: Optional[threading.Event] = None) -> None:
+        data: Dict[str, pd.DataFrame] = {}
+        sheet_state: Dict[str, dict] = {}
+
+        for sh in self.sheets:
+            _step(progress, cancel, "clean", sh)
+            df = raw[sh]
+            sheet_state[sh] = _sheet_state(df)
+            data[sh] = self._prepare_sheet(sh, df)
+
+        _step(progress, cancel, "index")
+        self.data_by_sheet = data
+        self._dep_keys = None
+        self._canon = None
+        self._signature = sig
+        self._loaded_path = self.path
+        self._sheet_state = sheet_state
+        self._build_index()
+        self._save_snapshot(sig)
+        self._save_schemas()
+
+    def _prepare_sheet(self, sh: str, raw_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Очистка сырого листа (или его нового хвоста). Индекс строк = номер строки в листе.
+        """
+        df = raw_df.dropna(how="all")
+
+        df.columns = [_clean_text(c) for c in df.columns]
+
+        schema = self._schema_for(df)
+        resolved = dict(schema["columns"])
+        date_col = resolved.get(DATE_COL)
+        dep_col = resolved.get(DEP_COL)
+        building_col = resolved.get(BUILDING_COL)
+
+        if not date_col:
+            raise ValueError(f"На листе '{sh}' нет колонки '{DATE_COL}' (или похожей)")
+        if not dep_col:
+            raise ValueError(f"На листе '{sh}' нет колонки '{DEP_COL}' (или похожей)")
+
+        if not building_col:
+            df[BUILDING_COL] = ""
+            building_col = resolved[BUILDING_COL] = BUILDING_COL
+
+        df["_sheet"] = sh
+        df["_date"] = _to_date_series(df[date_col], schema.get("date_format"))
+
+        # сохраняем ОРИГИНАЛ (для совместимости старых алиасов)
+        df["_dep_raw_orig"] = df[dep_col].astype(str)
+
+        df["_dep_raw_clean"] = _clean_text_series(df[dep_col])
+        df["_building_clean"] = _clean_text_series(df[building_col])
+
+        keep = df["_date"].notna().to_numpy() & (df["_dep_raw_clean"].to_numpy() != "")
+        # категории — до фильтра: отбор строк и копия тогда двигают только коды
+        out = _to_categories(df, resolved)[keep].copy()
+        out.attrs[SCHEMA_ATTR] = resolved
+        return out
+
+    def _schema_for(self, df: pd.DataFrame) -> dict:
+        """
+        Схема листа по отпечатку шапки: где какая колонка и в каком формате строковые даты.
+        Для уже встречавшейся шапки (в т.ч. в прошлых запусках — schemas.json рядом со снимками)
+        ни поиск колонок, ни подбор формата даты не повторяются.
+        """
+        if self._schemas is None:
+            self._schemas = swabs_cache.load_schemas(self.cache_dir) if self.use_cache else {}
+
+        fp = swabs_cache.header_fingerprint(df.columns)
+        schema = self._schemas.get(fp)
+        if schema is not None and all(c in df.columns for c in (schema.get("columns") or {}).values()):
+            return schema
+
+        resolved = _resolve_columns(df.columns)
+        date_col = resolved.get(DATE_COL)
+        schema = {
+            "columns": resolved,
+            "date_format": _infer_date_format(df[date_col]) if date_col else None,
+        }
+        self._schemas[fp] = schema
+        self._schemas_dirty = True
+        return schema
+
+    def _save_schemas(self) -> None:
+        if self.use_cache and self._schemas_dirty and self._schemas:
+            swabs_cache.save_schemas(self._schemas, self.cache_dir)
+        self._schemas_dirty = False
+
+    def _save_snapshot(self, sig: Optional[Tuple[int, int]]) -> None:
+        if not self.use_cache or sig is None:
+            return
+        # привязка в снимок не пишется: её всегда применяют заново по актуальным алиасам
+        frames = {sh: df.drop(columns=["_dep_canon"], errors="ignore") for sh, df in self.data_by_sheet.items()}
+        swabs_cache.save_snapshot(
+            self.path, self.sheets, frames, self.cache_dir,
+            key=self._cache_key(), extra={"sheet_state": self._sheet_state}, signature=sig,
+        )
+
+    def _cache_key(self) -> dict:
+        # набор колонок влияет на содержимое снимка
+        return {"columns": list(self.columns) if self.columns else None}
+
+    # -------------------------
+    # инкрементальное обновление (журнал за год только дописывается)
+    # -------------------------
+
+    def refresh(self, progress: Optional[ProgressCallback] = None,
+                cancel: Optional[threading.Event] = None) -> str:
+        """
+        Перечитывает журнал, обрабатывая только дописанные строки.
+        Возвращает:
+          "unchanged" — файл не менялся (xlsx даже не открывается)
+          "append"    — добавлены строки в конец: очищены/привязаны/проиндексированы только они
+          "full"      — первая загрузка, другой файл, правка старых строк или смена шапки
+        Для нескольких книг — худший из режимов по книгам; закрытые годы не перечитываются.
+        """
+        if _is_multi_path(self.path):
+            return self._refresh_parts(progress, cancel)
+
+        if self.data_by_sheet is None or self._loaded_path != self.path:
+            self.load(progress, cancel)
+            return "full"
+
+        if self.frozen:
+            return "unchanged"
+
+        sig = swabs_cache.file_signature(self.path)
+        if sig is not None and sig == self._signature:
+            return "unchanged"
+
+        raw = _read_sheets(self.path, self.sheets, _usecols_filter(self.columns), self.engine, progress, cancel)
+
+        tails: Dict[str, pd.DataFrame] = {}
+        new_state: Dict[str, dict] = {}
+        for sh in self.sheets:
+            hashes = _row_hashes(raw[sh])
+            start = _appended_from(raw[sh], self._sheet_state.get(sh), hashes)
+            if start is None:
+                self._load_from_raw(raw, sig, progress, cancel)
+                return "full"
+            tails[sh] = raw[sh].iloc[start:]
+            new_state[sh] = _sheet_state(raw[sh], hashes)
+
+        for sh in self.sheets:
+            tail = tails[sh]
+            if tail.empty:
+                continue
+
+            _step(progress, cancel, "clean", sh)
+
+            part = self._prepare_sheet(sh, tail)
+            if part.empty:
+                continue
+
+            old = self.data_by_sheet[sh]
+            if self._canon is not None:
+                part["_dep_canon"] = self._canon_for_new_rows(sh, part)
+            else:
+                self._dep_keys = None
+
+            self.data_by_sheet[sh] = _concat_frames([old, part])
+            self._index_rows(sh, part, offset=len(old))
+
+        self._signature = sig
+        self._sheet_state = new_state
+        self._save_snapshot(sig)
+        self._save_schemas()
+        return "append"
+
+    @property
+    def mapping(self) -> Optional[Dict[str, str]]:
+        """
+        Последняя применённая привязка (None, если apply_department_mapping ещё не вызывался).
+        """
+        return self._mapping
+
+    def _canon_for_new_rows(self, sh: str, part: pd.DataFrame) -> np.ndarray:
+        """
+        Привязка только новых строк: ключи дописываются к уже известным,
+        для новых ключей считается отделение по последнему mapping.
+        """
+        keys, codes_by_sheet = self._department_keys()
+        known = {k: i for i, k in enumerate(keys)}
+
+        part_keys = part[_DEP_KEY_COLS].astype(str).itertuples(index=False, name=None)
+        codes = np.empty(len(part), dtype=np.intp)
+        new_canon = []
+        for j, k in enumerate(part_keys):
+            i = known.get(k)
+            if i is None:
+                i = len(keys)
+                known[k] = i
+                keys.append(k)
+                new_canon.append(_map_department(k[0], k[1], k[2], self._mapping or {}))
+            codes[j] = i
+
+        if new_canon:
+            self._canon = np.concatenate([self._canon, np.array(new_canon, dtype=object)])
+        codes_by_sheet[sh] = np.concatenate([codes_by_sheet.get(sh, np.empty(0, dtype=np.intp)), codes])
+        return self._canon[codes]
+
+    # -------------------------
+    # индекс по (отделение, дата, лист)
+    # -------------------------
+
+    def _build_index(self) -> None:
+        """
+        Один groupby на лист вместо полного прохода маской на каждый клик:
+        - (отделение, дата) -> позиции строк (для take)
+        - дата -> позиции строк (режим "все отделения")
+        - отделение -> даты (по убыванию)
+        - (отделение, дата) -> в каких листах есть данные
+
+        Отделение — _dep_canon, если привязка уже применена, иначе _dep_raw_clean
+        (как и раньше в filter_day).
+        """
+        self._pos = {}
+        self._pos_by_date = {}
+        self._dates_by_dep = {}
+        self._presence = {}
+        self._all_dates = []
+        self._public_cols = {}
+
+        for sh, df in (self.data_by_sheet or {}).items():
+            self._pos[sh] = {}
+            self._pos_by_date[sh] = {}
+            self._public_cols[sh] = [c for c in df.columns if not str(c).startswith("_")]
+            self._index_rows(sh, df, offset=0)
+
+    def _index_rows(self, sh: str, df: pd.DataFrame, offset: int) -> None:
+        """
+        Добавляет в индекс строки df, которые лежат в листе sh начиная с позиции offset
+        (offset=0 — весь лист, иначе — дописанный хвост).
+        """
+        if df.empty:
+            return
+
+        bit = 1 << self.sheets.index(sh) if sh in self.sheets else 0
+        key_col = "_dep_canon" if "_dep_canon" in df.columns else "_dep_raw_clean"
+
+        sheet_pos = self._pos.setdefault(sh, {})
+        new_dates: Dict[str, set] = {}
+        groups = df.groupby([key_col, "_date"], sort=False, observed=True).indices
+        for (dep, day), idx in groups.items():
+            key = (dep, pd.Timestamp(day))
+            idx = idx + offset
+            prev = sheet_pos.get(key)
+            sheet_pos[key] = idx if prev is None else np.concatenate([prev, idx])
+            new_dates.setdefault(dep, set()).add(key[1])
+            self._presence[key] = self._presence.get(key, 0) | bit
+
+        for dep, ds in new_dates.items():
+            self._dates_by_dep[dep] = sorted(ds.union(self._dates_by_dep.get(dep, [])), reverse=True)
+
+        by_date = self._pos_by_date.setdefault(sh, {})
+        for d, idx in df.groupby("_date", sort=False).indices.items():
+            d = pd.Timestamp(d)
+            idx = idx + offset
+            prev = by_date.get(d)
+            by_date[d] = idx if prev is None else np.concatenate([prev, idx])
+
+        self._all_dates = sorted(set(self._all_dates).union(by_date), reverse=True)
+
+    def _ensure_index(self) -> None:
+        if self._pos is None:
+            self._build_index()
+
+    def _take(self, sheet: str, idx: Optional[np.ndarray]) -> pd.DataFrame:
+        df = self.data_by_sheet.get(sheet)
+        cols = self._public_cols.get(sheet) or [c for c in df.columns if not str(c).startswith("_")]
+        if idx is None:
+            return df.iloc[0:0][cols]
+        return df.take(idx)[cols]
+
+    def _department_keys(self) -> Tuple[List[Tuple[str, str, str]], Dict[str, np.ndarray]]:
+        """
+        Уникальные тройки (_dep_raw_clean, _building_clean, _dep_raw_orig) по всем листам
+        и коды строк каждого листа в этом списке. Считается один раз на загрузку:
+        строк десятки тысяч, а разных троек — несколько сотен.
+        """
+        if self._dep_keys is not None:
+            return self._dep_keys, self._dep_codes
+
+        sheets = [sh for sh, df in self.data_by_sheet.items() if df is not None]
+        frames = [self.data_by_sheet[sh][_DEP_KEY_COLS].astype(str) for sh in sheets]
+
+        if not frames or sum(len(f) for f in frames) == 0:
+            self._dep_keys = []
+            self._dep_codes = {sh: np.empty(0, dtype=np.intp) for sh in sheets}
+            return self._dep_keys, self._dep_codes
+
+        all_keys = pd.concat(frames, ignore_index=True)
+        codes, uniques = pd.MultiIndex.from_frame(all_keys).factorize()
+
+        bounds = np.cumsum([len(f) for f in frames])[:-1]
+        self._dep_keys = list(uniques)
+        self._dep_codes = dict(zip(sheets, np.split(np.asarray(codes, dtype=np.intp), bounds)))
+        return self._dep_keys, self._dep_codes
+
+    def unique_raw_departments(self) -> List[str]:
+        if self._parts is not None:
+            return sorted(set().union(*(p.unique_raw_departments() for p in self._parts.values())))
+
+        keys, _ = self._department_keys()
+        return sorted({t for t in (_clean_text(k[0]) for k in keys) if t})
+
+    def apply_department_mapping(self, mapping: Dict[str, str],
+                                 progress: Optional[ProgressCallback] = None,
+                                 cancel: Optional[threading.Event] = None) -> None:
+        """
+        Привязка считается по уникальным ключам и раскладывается по строкам кодами,
+        поэтому повторная привязка (после окна алиасов) занимает миллисекунды.
+        """
+        if self._parts is not None:
+            for part in self._parts.values():
+                part.apply_department_mapping(mapping, progress, cancel)
+            self._mapping = dict(mapping)
+            return
+
+        _step(progress, cancel, "map")
+        keys, codes_by_sheet = self._department_keys()
+        canon = np.array([_map_department(d, b, o, mapping) for d, b, o in keys] or [""], dtype=object)
+        self._mapping = dict(mapping)
+        self._canon = canon
+
+        for sh, df in self.data_by_sheet.items():
+            codes = codes_by_sheet.get(sh)
+            if codes is None:
                 continue
+            df["_dep_canon"] = _canon_categorical(canon, codes)
+            self.data_by_sheet[sh] = df
 
-            for _, row in df.iterrows():
-                dep_clean = row.get("_dep_raw_clean", "") or ""
-                b_clean = row.get("_building_clean", "") or ""
+        _step(progress, cancel, "index")
+        self._build_index()
 
-                if not dep_clean:
-                    continue
-                if _canon_operblock(dep_clean, b_clean):
-                    continue
-                if _as_str(mapping.get(dep_clean)):
-                    continue
+    def unknown_departments_for_mapping(self, mapping: Dict[str, str]) -> List[str]:
+        if self._parts is not None:
+            return sorted(set().union(*(p.unknown_departments_for_mapping(mapping) for p in self._parts.values())))
 
-                unknown.add(dep_clean)
+        keys, _ = self._department_keys()
+
+        unknown = set()
+        for dep_clean, b_clean, _orig in keys:
+            if not dep_clean:
+                continue
+            if _canon_operblock(dep_clean, b_clean or ""):
+                continue
+            if _as_str(mapping.get(dep_clean)):
+                continue
+            unknown.add(dep_clean)
 
         return sorted(unknown)
 
@@ -213,38 +1237,205 @@ class SwabsJournal:
         if not dep:
             return []
 
-        dates = set()
-        for df in self.data_by_sheet.values():
-            part = df[df["_dep_canon"] == dep] if "_dep_canon" in df.columns else df[df["_dep_raw_clean"] == dep]
-            dates.update(part["_date"].unique().tolist())
+        if self._parts is not None:
+            return _merge_dates(p.list_dates_for_department(dep) for p in self._parts.values())
+
+        self._ensure_index()
+        return list(self._dates_by_dep.get(dep, []))
+
+    def sheets_with_data(self, dep: str, day: pd.Timestamp) -> List[str]:
+        """
+        Листы, в которых есть строки по отделению на дату (без выборки самих строк).
+        """
+        dep = _clean_text(dep)
+        if not dep or day is None:
+            return []
+
+        if self._parts is not None:
+            found = set().union(*(p.sheets_with_data(dep, day) for p in self._parts.values()))
+            return [sh for sh in self.sheets if sh in found]
+
+        self._ensure_index()
+        mask = self._presence.get((dep, pd.Timestamp(day).normalize()), 0)
+        return [sh for i, sh in enumerate(self.sheets) if mask & (1 << i)]
 
-        return sorted(dates, reverse=True)
+    def departments_for_date(self, day: pd.Timestamp) -> List[str]:
+        """
+        Отделения, у которых на дату есть строки хотя бы на одном листе (по алфавиту).
+        """
+        if day is None:
+            return []
+        if self._parts is not None:
+            return sorted(set().union(*(p.departments_for_date(day) for p in self._parts.values())))
+
+        self._ensure_index()
+        day = pd.Timestamp(day).normalize()
+        return sorted({dep for dep, d in self._presence if d == day and dep})
 
     def filter_day(self, dep: str, day: pd.Timestamp, sheet: str) -> pd.DataFrame:
+        if self._parts is not None:
+            return self._concat_parts([p.filter_day(dep, day, sheet) for p in self._parts.values()])
+
         dep = _clean_text(dep)
         df = self.data_by_sheet.get(sheet)
         if df is None or not dep:
             return pd.DataFrame()
 
+        self._ensure_index()
         day = pd.Timestamp(day).normalize()
-        out = df[(df["_dep_canon"] == dep) & (df["_date"] == day)].copy() if "_dep_canon" in df.columns \
-            else df[(df["_dep_raw_clean"] == dep) & (df["_date"] == day)].copy()
-
-        return out[[c for c in out.columns if not c.startswith("_")]]
+        return self._take(sheet, self._pos.get(sheet, {}).get((dep, day)))
 
     def list_all_dates(self) -> List[pd.Timestamp]:
-        dates = set()
-        for df in self.data_by_sheet.values():
-            if df is None or df.empty:
-                continue
-            dates.update(df["_date"].dropna().unique().tolist())
-        return sorted(dates, reverse=True)
+        if self._parts is not None:
+            return _merge_dates(p.list_all_dates() for p in self._parts.values())
+
+        self._ensure_index()
+        return list(self._all_dates)
 
     def filter_day_all(self, day: pd.Timestamp, sheet: str) -> pd.DataFrame:
+        if self._parts is not None:
+            return self._concat_parts([p.filter_day_all(day, sheet) for p in self._parts.values()])
+
         df = self.data_by_sheet.get(sheet)
         if df is None:
             return pd.DataFrame()
 
+        self._ensure_index()
         day = pd.Timestamp(day).normalize()
-        out = df[df["_date"] == day].copy()
-        return out[[c for c in out.columns if not c.startswith("_")]]
+        return self._take(sheet, self._pos_by_date.get(sheet, {}).get(day))
+
+    # -------------------------
+    # период и сводки (для разбора за неделю/месяц)
+    # -------------------------
+
+    def filter_range(self, dep: Optional[str], start=None, end=None,
+                     sheets: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Строки за период [start, end] (границы включительно, None — без границы)
+        по отделению или по всем отделениям (dep=None): лист -> кадр, как у filter_day.
+        """
+        sheets = list(sheets or self.sheets)
+        if self._parts is not None:
+            return {
+                sh: self._concat_parts([p.filter_range(dep, start, end, [sh])[sh] for p in self._parts.values()])
+                for sh in sheets
+            }
+
+        dep = _clean_text(dep) if dep is not None else None
+        self._ensure_index()
+        start, end = _range_bounds(start, end)
+
+        out: Dict[str, pd.DataFrame] = {}
+        for sh in sheets:
+            if self.data_by_sheet.get(sh) is None:
+                out[sh] = pd.DataFrame()
+                continue
+            out[sh] = self._take(sh, self._range_positions(sh, dep, start, end))
+        return out
+
+    def _range_positions(self, sh: str, dep: Optional[str],
+                         start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+        """
+        Позиции строк листа за период — из индекса (дни отделения/дни листа), без прохода по листу.
+        """
+        if dep is None:
+            chunks = [idx for d, idx in self._pos_by_date.get(sh, {}).items() if start <= d <= end]
+        else:
+            pos = self._pos.get(sh, {})
+            chunks = [
+                pos[(dep, d)] for d in self._dates_by_dep.get(dep, [])
+                if start <= d <= end and (dep, d) in pos
+            ]
+        if not chunks:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(chunks))
+
+    def _range_rows(self, dep: Optional[str], start, end,
+                    sheets: Optional[Sequence[str]]) -> pd.DataFrame:
+        """
+        Компактный кадр для сводок: dep, date, sheet, culture ("" — ничего не выделено).
+        """
+        sheets = list(sheets or self.sheets)
+        cols = ["dep", "date", "sheet", "culture"]
+        if self._parts is not None:
+            frames = [p._range_rows(dep, start, end, sheets) for p in self._parts.values()]
+            frames = [f for f in frames if not f.empty]
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=cols)
+
+        dep = _clean_text(dep) if dep is not None else None
+        self._ensure_index()
+        start, end = _range_bounds(start, end)
+
+        frames = []
+        for sh in sheets:
+            df = self.data_by_sheet.get(sh)
+            if df is None:
+                continue
+            idx = self._range_positions(sh, dep, start, end)
+            if not len(idx):
+                continue
+
+            key_col = "_dep_canon" if "_dep_canon" in df.columns else "_dep_raw_clean"
+            cult_col = _resolved_col(df, CULTURE_COL)
+            part = df[[c for c in (key_col, "_date", cult_col) if c]].take(idx)
+            frames.append(pd.DataFrame({
+                "dep": part[key_col].to_numpy(dtype=object),
+                "date": part["_date"].to_numpy(),
+                "sheet": sh,
+                "culture": _culture_labels(part[cult_col]) if cult_col else "",
+            }))
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=cols)
+
+    def positivity(self, dep: Optional[str] = None, start=None, end=None,
+                   sheets: Optional[Sequence[str]] = None, freq: str = "M") -> pd.DataFrame:
+        """
+        Доля положительных проб по отделению и периоду (freq: "W" — неделя с понедельника, "M" — месяц).
+        Колонки: dep, period (начало периода), total, positive, percent.
+        """
+        if freq not in _PERIOD_FREQ:
+            raise ValueError(f"freq должен быть 'W' или 'M', а не {freq!r}")
+
+        rows = self._range_rows(dep, start, end, sheets)
+        if rows.empty:
+            return pd.DataFrame(columns=["dep", "period", "total", "positive", "percent"])
+
+        rows["period"] = pd.to_datetime(rows["date"]).dt.to_period(_PERIOD_FREQ[freq]).dt.start_time
+        rows["positive"] = rows["culture"] != ""
+        out = (
+            rows.groupby(["dep", "period"], sort=True)["positive"]
+            .agg(total="size", positive="sum")
+            .reset_index()
+        )
+        out["percent"] = (out["positive"] / out["total"] * 100).round(1)
+        return out
+
+    def culture_counts(self, dep: Optional[str] = None, start=None, end=None,
+                       sheets: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Сколько раз выделена каждая культура, по листам. Колонки: culture, sheet, count
+        (по убыванию count).
+        """
+        rows = self._range_rows(dep, start, end, sheets)
+        rows = rows[rows["culture"] != ""]
+        if rows.empty:
+            return pd.DataFrame(columns=["culture", "sheet", "count"])
+
+        out = rows.groupby(["culture", "sheet"], sort=False).size().reset_index(name="count")
+        return out.sort_values(["count", "culture"], ascending=[False, True], ignore_index=True)
+
+    def sheet_counts(self, dep: Optional[str] = None, start=None, end=None,
+                     sheets: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Пробы по листам за период. Колонки: sheet, total, positive, percent (в порядке self.sheets).
+        """
+        order = list(sheets or self.sheets)
+        rows = self._range_rows(dep, start, end, order)
+        positive = (rows["culture"] != "").groupby(rows["sheet"]).sum()
+        total = rows.groupby("sheet").size()
+
+        out = pd.DataFrame({"sheet": order})
+        out["total"] = out["sheet"].map(total).fillna(0).astype(int)
+        out["positive"] = out["sheet"].map(positive).fillna(0).astype(int)
+        out["percent"] = (out["positive"] / out["total"].where(out["total"] > 0) * 100).round(1).fillna(0.0)
+        return out
@@ -13,6 +13,11 @@ DEFAULTS = {
     "tg_exam_report_api_key": "",
     "swabs_template_path": "",
     "swabs_report_dir": "",
+    # "auto" | "calamine" | "openpyxl" — чем читать журнал смывов (с откатом на стандартный)
+    "swabs_journal_engine": "auto",
+    # "word" | "libreoffice" | "native" — чем делать PDF протоколов: Microsoft Word (COM),
+    # LibreOffice без окна или reportlab без офиса
+    "swabs_pdf_backend": "word",
     "departments": [],
     "webdav_url": "https://dav.epid-test.ru/",
     "webdav_user": "epiduser",
@@ -1,9 +1,8 @@
 ﻿import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from docx import Document
-from docx.shared import Inches
-import tempfile
+import multiprocessing
 import os
+import threading
 import shutil
 import calendar
 import datetime
@@ -23,21 +22,21 @@ from screens.testing import open_testing_screen
 from screens.swab_monitoring import build_swab_monitoring_screen
 from PIL import Image, ImageTk
 
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-from analysis.loci import LOCUS_COLORS
 from screens.photo_rounds import build_photo_rounds_screen
 from screens.ai_analysis import build_ai_analysis_screen
 from screens.microbes_tab import build_microbes_tab
 from screens.loci_tab import build_loci_tab
 from screens.resistance_tab import build_resistance_tab
-from utils.charts import (
-    bar_with_value_labels,
-    barh_with_value_labels,
-    reset_canvas,
-    stacked_barh,
+from analysis.monthly_report import (
+    apply_gram,
+    archive_report_path,
+    build_monthly_report,
+    normalize_gram,
+    report_base_name,
 )
+from utils.charts import reset_canvas
 
 
 APP_PASSWORD = "2"  # ← поменяешь на свой
@@ -137,17 +136,6 @@ report_state = {
 }
 
 
-def normalize_gram(name: str) -> str:
-    name = (name or "").lower()
-    if "полож" in name:
-        return "Gram+"
-    if "отриц" in name:
-        return "Gram-"
-    if "гриб" in name or "fung" in name:
-        return "Грибы"
-    return "Не классифицировано"
-
-
 def _get_windows_user() -> str:
     try:
         name = getpass.getuser()
@@ -188,9 +176,23 @@ def save_report():
 
 
 
+def _show_busy_window(message: str):
+    win = tk.Toplevel(main_frame)
+    win.title("Подождите")
+    win.resizable(False, False)
+    win.transient(main_frame.winfo_toplevel())
+    win.grab_set()
+    tk.Label(win, text=message, font=("Segoe UI", 10)).pack(padx=20, pady=(16, 8))
+    pb = ttk.Progressbar(win, mode="indeterminate", length=260)
+    pb.pack(padx=20, pady=(0, 16))
+    pb.start(12)
+    win.protocol("WM_DELETE_WINDOW", lambda: None)
+    return win
+
+
 def do_save_report_docx():
     # ---------- ИМЯ ФАЙЛА ----------
-    base_name = f"{current_department}_{current_month}_{current_year}".replace(" ", "_")
+    base_name = report_base_name(current_department, current_month, current_year)
 
     file = filedialog.asksaveasfilename(
         defaultextension=".docx",
@@ -200,271 +202,46 @@ def do_save_report_docx():
     if not file:
         return
 
-    dep_name = (current_department or "Без_отделения").replace("/", "_").replace("\\", "_")
-    dep_dir = os.path.join(ARCHIVE_DIR, dep_name)
-    os.makedirs(dep_dir, exist_ok=True)
-
-    archive_path = os.path.join(dep_dir, base_name + ".docx")
-
-    # ---------- DOCX ----------
-    doc = Document()
-    tmp_dir = tempfile.mkdtemp()
-
-    # ==================================================
-    # ЗАГОЛОВОК
-    # ==================================================
-    doc.add_heading("Эпидемиологический отчёт", level=1)
-
-    p = doc.add_paragraph()
-    p.add_run("Отделение: ").bold = True
-    p.add_run(str(current_department or "") + "\n")
-    p.add_run("Период: ").bold = True
-    p.add_run(f"{current_month or ''} {current_year or ''}")
-
-    # ==================================================
-    # 1. МИКРООРГАНИЗМЫ + GRAM
-    # ==================================================
-    if report_state.get("microbes"):
-        r = report_state["microbes"]
-
-        doc.add_heading("1. Микроорганизмы", level=2)
-
-        total = int(r.get("total", 0))
-        doc.add_paragraph(f"Всего выделено микроорганизмов: {total}.")
-
-        microbes = sorted(
-            r.get("microbes", []),
-            key=lambda x: int(x.get("count", 0)),
-            reverse=True
-        )
-
-        for m in microbes:
-            doc.add_paragraph(
-                f"{m.get('microbe','')} — {m.get('count',0)} ({m.get('percent',0)}%)",
-                style="List Bullet"
-            )
-
-        # ---------- GRAM ----------
-        doc.add_paragraph("Распределение по Gram")
-
-        gram_map = {
-            "Gram+": 0,
-            "Gram-": 0,
-            "Грибы": 0,
-            "Не классифицировано": 0
-        }
-
-        for m in microbes:
-            gram = m.get("gram", "Не классифицировано")
-            if gram not in gram_map:
-                gram = "Не классифицировано"
-            gram_map[gram] += int(m.get("count", 0))
-
-        for gram, count in gram_map.items():
-            if count and total:
-                percent = round(count / total * 100, 1)
-                doc.add_paragraph(
-                    f"{gram}: {count} ({percent}%)",
-                    style="List Bullet"
-                )
-
-        # ---------- ГРАФИК: микроорганизмы ----------
-        img_microbes = os.path.join(tmp_dir, "microbes_counts.png")
-        fig = Figure(figsize=(8.5, 5), dpi=130)
-        ax = fig.add_subplot(111)
-
-        labels = [m["microbe"] for m in microbes][::-1]
-        values = [int(m["count"]) for m in microbes][::-1]
-
-        barh_with_value_labels(
-            ax,
-            labels,
-            values,
-            title="Микроорганизмы (количество)",
-            xlabel="Количество"
-        )
-
-        fig.tight_layout()
-        fig.savefig(img_microbes)
-        doc.add_picture(img_microbes, width=Inches(6.5))
-
-        # ---------- ГРАФИК: Gram ----------
-        img_gram = os.path.join(tmp_dir, "gram.png")
-        fig2 = Figure(figsize=(7.5, 4.5), dpi=130)
-        ax2 = fig2.add_subplot(111)
-
-        g_labels = [k for k, v in gram_map.items() if v > 0]
-        g_values = [gram_map[k] for k in g_labels]
-
-        bar_with_value_labels(
-            ax2,
-            g_labels,
-            g_values,
-            title="Распределение по Gram"
-        )
-
-        fig2.tight_layout()
-        fig2.savefig(img_gram)
-        doc.add_picture(img_gram, width=Inches(6.5))
-
-    # ==================================================
-    # 2. ЛОКУСЫ
-    # ==================================================
-    if report_state.get("loci"):
-        r = report_state["loci"]
-        groups = r.get("groups", [])
-
-        doc.add_heading("2. Локусы", level=2)
-
-        for g in groups:
-            doc.add_paragraph(
-                f"{g.get('group','')} — {g.get('count',0)} ({g.get('percent',0)}%)",
-                style="List Bullet"
-            )
-            for it in g.get("items", []) or []:
-                doc.add_paragraph(
-                    f"{it.get('name','')} — {it.get('count',0)} ({it.get('percent',0)}%)",
-                    style="List Bullet 2"
-                )
-
-        has_items = any(g.get("items") for g in groups)
-        if has_items:
-            img_loci = os.path.join(tmp_dir, "loci_stacked.png")
-
-            groups_sorted = sorted(groups, key=lambda x: x["count"], reverse=True)
-            group_names = [g["group"] for g in groups_sorted]
-
-            totals = {}
-            for g in groups_sorted:
-                for it in g.get("items", []):
-                    totals[it["name"]] = totals.get(it["name"], 0) + int(it["count"])
+    archive_path = archive_report_path(ARCHIVE_DIR, current_department, current_month, current_year)
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
 
-            loci_order = sorted(totals.keys(), key=lambda k: totals[k], reverse=True)
+    # снимок данных: вкладки могут пересчитаться, пока отчёт собирается в фоне
+    state = dict(report_state)
+    department, month, year = current_department, current_month, current_year
 
-            fig = Figure(figsize=(10, 5.2), dpi=130)
-            ax = fig.add_subplot(111)
-
-            group_totals = [g["count"] for g in groups_sorted]
-            max_total = max(group_totals) if group_totals else 0
-            groups_items = [g.get("items", []) for g in groups_sorted]
-            stacked_barh(
-                ax,
-                group_names,
-                loci_order,
-                groups_items,
-                colors_map=LOCUS_COLORS
-            )
-
-            for i, total in enumerate(group_totals):
-                ax.text(
-                    total + (max_total * 0.01 + 0.5 if max_total else 0.5),
-                    i,
-                    str(total),
-                    va="center",
-                    fontsize=9,
-                    fontweight="bold"
-                )
-
-            ax.set_title("Структура биоматериалов по локусам")
-            ax.set_xlabel("Количество")
-            ax.set_xlim(0, max_total * 1.2 if max_total else 10)
-
-            ax.legend(
-                title="Локус",
-                fontsize=8,
-                bbox_to_anchor=(1.02, 1),
-                loc="upper left"
-            )
-
-            fig.tight_layout()
-            fig.savefig(img_loci)
-            doc.add_picture(img_loci, width=Inches(6.5))
-
-    # ==================================================
-    # 3. РЕЗИСТЕНТНОСТЬ
-    # ==================================================
-    if report_state.get("resistance"):
-        r = report_state["resistance"]
-
-        doc.add_heading("3. Резистентность", level=2)
-
-        microbes = sorted(r.get("microbes", []), key=lambda x: x["r_percent"], reverse=True)
-        antibiotics = sorted(r.get("antibiotics", []), key=lambda x: x["r_percent"], reverse=True)
-
-        doc.add_paragraph("Резистентность по микроорганизмам")
-        for m in microbes:
-            doc.add_paragraph(
-                f'{m["microbe"]} — R {m["r_percent"]}% ({m["r_count"]}/{m["total"]})',
-                style="List Bullet"
-            )
-
-        doc.add_paragraph("Резистентность по антибиотикам")
-        for a in antibiotics:
-            doc.add_paragraph(
-                f'{a["antibiotic"]} — R {a["r_percent"]}% ({a["r_count"]}/{a["total"]})',
-                style="List Bullet"
-            )
-
-        # --- график микроорганизмы ---
-        img_m = os.path.join(tmp_dir, "res_microbes.png")
-        fig_m = Figure(figsize=(8.5, 5), dpi=130)
-        ax_m = fig_m.add_subplot(111)
-
-        labels = [m["microbe"] for m in microbes][::-1]
-        values = [m["r_percent"] for m in microbes][::-1]
-
-        barh_with_value_labels(
-            ax_m,
-            labels,
-            values,
-            title="Резистентность по микроорганизмам",
-            xlabel="R (%)",
-            value_fmt=lambda v: str(int(v)) if float(v).is_integer() else str(v)
-        )
-
-        fig_m.tight_layout()
-        fig_m.savefig(img_m)
-        doc.add_picture(img_m, width=Inches(6.5))
-
-        # --- график антибиотики ---
-        img_a = os.path.join(tmp_dir, "res_antibiotics.png")
-        fig_a = Figure(figsize=(8.5, 5), dpi=130)
-        ax_a = fig_a.add_subplot(111)
-
-        labels = [a["antibiotic"] for a in antibiotics][::-1]
-        values = [a["r_percent"] for a in antibiotics][::-1]
-
-        barh_with_value_labels(
-            ax_a,
-            labels,
-            values,
-            title="Резистентность по антибиотикам",
-            xlabel="R (%)",
-            value_fmt=lambda v: str(int(v)) if float(v).is_integer() else str(v)
-        )
-
-        fig_a.tight_layout()
-        fig_a.savefig(img_a)
-        doc.add_picture(img_a, width=Inches(6.5))
-
-    # ==================================================
-    # СОХРАНЕНИЕ
-    # ==================================================
-    try:
-        doc.save(file)
-        doc.save(archive_path)
-
-        # синхронизируем сохранённый отчёт в WebDAV (если настроен)
-        webdav_sync.upload_file(archive_path, DATA_ROOT)
+    busy = _show_busy_window("Формируем отчёт, пожалуйста подождите…")
 
+    def _finish(error):
+        try:
+            busy.destroy()
+        except Exception:
+            pass
+        if error is not None:
+            messagebox.showerror("Ошибка сохранения", str(error))
+            return
         messagebox.showinfo(
             "Готово",
             "DOCX-отчёт успешно сохранён\n\n"
             "• в выбранную папку\n"
             "• в архив программы"
         )
-    except Exception as e:
-        messagebox.showerror("Ошибка сохранения", str(e))
+
+    def _worker():
+        # отчёт собирает analysis/monthly_report в фоновом потоке; окно не ждёт
+        try:
+            doc = build_monthly_report(state, department, month, year)
+
+            doc.save(file)
+            doc.save(archive_path)
+
+            # синхронизируем сохранённый отчёт в WebDAV (если настроен)
+            webdav_sync.upload_file(archive_path, DATA_ROOT)
+        except Exception as e:
+            main_frame.after(0, _finish, e)
+            return
+        main_frame.after(0, _finish, None)
+
+    threading.Thread(target=_worker, daemon=True).start()
 
 
 
@@ -475,6 +252,11 @@ def do_save_report_docx():
 # ROOT (ОДИН РАЗ) + ЗАСТАВКА
 # ======================================================
 
+if __name__ == "__main__":
+    # в собранном exe процессы пула (разбор годовых книг журнала смывов)
+    # запускаются этим же файлом — им окно не нужно
+    multiprocessing.freeze_support()
+
 root = tk.Tk()
 root.withdraw()   # скрываем главное окно
 root.title("ЭпидМонитор")
@@ -1331,17 +1113,7 @@ def open_microbio_files_wizard(parent, on_done):
         rows[kind]["status"].config(fg="#16a34a" if ok else "#6b7280")
 
     def _apply_microbes_result(result):
-        from utils.gram import classify_gram
-        for m in result.get("microbes", []):
-            if m.get("gram_source") == "manual":
-                continue
-            gram_raw = (m.get("gram") or "").strip()
-            if gram_raw in ("Gram+", "Gram-", "Грибы", "Не классифицировано"):
-                m["gram"] = gram_raw
-            else:
-                m["gram"] = normalize_gram(classify_gram(m.get("microbe", "")))
-            m["gram_source"] = m.get("gram_source") or "auto"
-        report_state["microbes"] = result
+        report_state["microbes"] = apply_gram(result)
 
     def _assign(kind: str, file_path: str, result):
         if kind == "microbes":
@@ -1,11 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from analysis.loci import analyze_loci, LOCUS_COLORS
-from utils.charts import barh_with_value_labels, reset_canvas, stacked_barh
+from utils.charts import ChartSpec, chart_figure, reset_canvas
 
 
 def build_loci_tab(parent, report_state):
@@ -61,9 +60,6 @@ def build_loci_tab(parent, report_state):
     def render(result):
         reset_canvas(current_canvas)
 
-        fig = Figure(figsize=(11, 6), dpi=100)
-        ax = fig.add_subplot(111)
-
         groups = sort_groups_for_plot(result["groups"])
         group_names = [g["group"] for g in groups]
 
@@ -88,54 +84,33 @@ def build_loci_tab(parent, report_state):
             text_box.insert(tk.END, "\n")
 
         if mode.get() == "groups":
-            values = [g["count"] for g in groups]
-
-            barh_with_value_labels(
-                ax,
-                group_names[::-1],
-                values[::-1],
+            spec = ChartSpec(
+                kind="barh",
                 title="Биоматериалы по группам",
-                xlabel="Количество"
+                xlabel="Количество",
+                labels=tuple(group_names)[::-1],
+                values=tuple(g["count"] for g in groups)[::-1],
             )
 
         else:
-            loci = loci_sorted_by_total(groups)
-            group_totals = [int(g["count"]) for g in groups]
-            max_total = max(group_totals) if group_totals else 0
-            groups_items = [g.get("items", []) for g in groups]
-            stacked_barh(
-                ax,
-                group_names,
-                loci,
-                groups_items,
-                colors_map=LOCUS_COLORS
-            )
-
-            for idx, total_val in enumerate(group_totals):
-                ax.text(
-                    total_val + (max_total * 0.01 + 0.5 if max_total else 0.5),
-                    idx,
-                    str(total_val),
-                    va="center",
-                    fontsize=9,
-                    fontweight="bold"
-                )
-
-            ax.set_title("Структура биоматериалов по локусам (стековая диаграмма)")
-            ax.set_xlabel("Количество")
-
-            if max_total:
-                ax.set_xlim(0, max_total * 1.20)
-
-            ax.legend(
-                title="Локус",
-                fontsize=8,
-                bbox_to_anchor=(1.02, 1),
-                loc="upper left",
-                borderaxespad=0
+            loci = tuple(loci_sorted_by_total(groups))
+            spec = ChartSpec(
+                kind="stacked",
+                title="Структура биоматериалов по локусам (стековая диаграмма)",
+                xlabel="Количество",
+                labels=tuple(group_names),
+                values=tuple(int(g["count"]) for g in groups),
+                series=loci,
+                stacks=tuple(
+                    tuple((it["name"], int(it["count"])) for it in g.get("items", []))
+                    for g in groups
+                ),
+                colors=tuple((k, LOCUS_COLORS[k]) for k in loci if k in LOCUS_COLORS),
+                legend_title="Локус",
             )
 
-        fig.tight_layout()
+        # переключение режимов туда-обратно берёт готовую фигуру из кеша графиков
+        fig = chart_figure([spec])
 
         canvas = FigureCanvasTkAgg(fig, master=canvas_holder)
         canvas.draw()
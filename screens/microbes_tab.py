@@ -1,11 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from analysis.microbes import analyze_microbes
-from utils.charts import bar_with_value_labels, barh_with_value_labels, reset_canvas
+from utils.charts import ChartSpec, chart_figure, reset_canvas
 
 
 def build_microbes_tab(parent, report_state, normalize_gram):
@@ -221,25 +220,17 @@ def build_microbes_tab(parent, report_state, normalize_gram):
         # ---------- ГРАФИКИ ----------
         reset_canvas(current_canvas)
 
-        fig = Figure(figsize=(11, 6), dpi=100)
-        ax1 = fig.add_subplot(121)
-        ax2 = fig.add_subplot(122)
-
         # --- МИКРООРГАНИЗМЫ ---
-        labels = [m["microbe"] for m in microbes][::-1]
-        values = [int(m.get("count", 0)) for m in microbes][::-1]
-
-        barh_with_value_labels(
-            ax1,
-            labels,
-            values,
+        microbes_spec = ChartSpec(
+            kind="barh",
             title="Микроорганизмы (количество)",
-            xlabel="Количество"
+            xlabel="Количество",
+            labels=tuple(m["microbe"] for m in microbes)[::-1],
+            values=tuple(int(m.get("count", 0)) for m in microbes)[::-1],
         )
 
         # --- GRAM ---
-        g_labels = [k for k, v in gram_map.items() if v["count"] > 0]
-        g_values = [gram_map[k]["count"] for k in g_labels]
+        g_labels = tuple(k for k, v in gram_map.items() if v["count"] > 0)
 
         color_map = {
             "Gram+": "#4E79A7",
@@ -248,15 +239,16 @@ def build_microbes_tab(parent, report_state, normalize_gram):
             "Не классифицировано": "#9D9D9D",
         }
 
-        bar_with_value_labels(
-            ax2,
-            g_labels,
-            g_values,
+        gram_spec = ChartSpec(
+            kind="bar",
             title="Распределение по Gram",
-            colors=[color_map.get(k, "#cccccc") for k in g_labels]
+            labels=g_labels,
+            values=tuple(gram_map[k]["count"] for k in g_labels),
+            colors=tuple((k, color_map[k]) for k in g_labels if k in color_map),
         )
 
-        fig.tight_layout()
+        # одинаковые данные — та же фигура из кеша графиков
+        fig = chart_figure([microbes_spec, gram_spec])
 
         canvas = FigureCanvasTkAgg(fig, master=canvas_holder)
         canvas.draw()
@@ -1,11 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from analysis.resistance import analyze_resistance
-from utils.charts import barh_with_value_labels, reset_canvas
+from utils.charts import ChartSpec, chart_figure, reset_canvas
 
 
 def build_resistance_tab(parent, report_state):
@@ -93,60 +92,40 @@ def build_resistance_tab(parent, report_state):
 
         reset_canvas(current_canvas)
 
-        # ДВА ГРАФИКА В ОДНОЙ FIGURE
-        fig = Figure(figsize=(11, 6), dpi=100)
+        def r_color(v):
+            if v >= 20:
+                return "#E15759"
+            if v >= 10:
+                return "#F28E2B"
+            return "#59A14F"
+
+        def r_spec(title, labels, values):
+            return ChartSpec(
+                kind="barh",
+                title=title,
+                xlabel="R (%)",
+                value_fmt="percent",
+                labels=tuple(labels)[::-1],
+                values=tuple(values)[::-1],
+                colors=tuple((label, r_color(v)) for label, v in zip(labels, values)),
+            )
 
         # ===== 1. МИКРООРГАНИЗМЫ =====
-        ax1 = fig.add_subplot(121)
-
-        m_labels = [m["microbe"] for m in microbes]
-        m_values = [float(m["r_percent"]) for m in microbes]
-
-        m_colors = []
-        for v in m_values:
-            if v >= 20:
-                m_colors.append("#E15759")
-            elif v >= 10:
-                m_colors.append("#F28E2B")
-            else:
-                m_colors.append("#59A14F")
-
-        barh_with_value_labels(
-            ax1,
-            m_labels[::-1],
-            m_values[::-1],
-            title="Резистентность по микроорганизмам",
-            xlabel="R (%)",
-            colors=m_colors[::-1],
-            value_fmt=lambda v: f"{v}%"
+        m_spec = r_spec(
+            "Резистентность по микроорганизмам",
+            [m["microbe"] for m in microbes],
+            [float(m["r_percent"]) for m in microbes],
         )
 
         # ===== 2. АНТИБИОТИКИ =====
-        ax2 = fig.add_subplot(122)
-
-        a_labels = [a["antibiotic"] for a in antibiotics]
-        a_values = [float(a["r_percent"]) for a in antibiotics]
-
-        a_colors = []
-        for v in a_values:
-            if v >= 20:
-                a_colors.append("#E15759")
-            elif v >= 10:
-                a_colors.append("#F28E2B")
-            else:
-                a_colors.append("#59A14F")
-
-        barh_with_value_labels(
-            ax2,
-            a_labels[::-1],
-            a_values[::-1],
-            title="Резистентность по антибиотикам",
-            xlabel="R (%)",
-            colors=a_colors[::-1],
-            value_fmt=lambda v: f"{v}%"
+        a_spec = r_spec(
+            "Резистентность по антибиотикам",
+            [a["antibiotic"] for a in antibiotics],
+            [float(a["r_percent"]) for a in antibiotics],
         )
 
-        fig.tight_layout()
+        # ДВА ГРАФИКА В ОДНОЙ FIGURE (из кеша, если данные те же)
+        fig = chart_figure([m_spec, a_spec])
 
         canvas = FigureCanvasTkAgg(fig, master=canvas_holder)
         canvas.draw()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import re
 import shutil
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from pathlib import Path
@@ -10,12 +11,20 @@ from pathlib import Path
 import pandas as pd
 
 from config.app_config import load_config, save_config
-from analysis.swabs_journal import SwabsJournal, SHEETS_DEFAULT
+from analysis.swabs_journal import SwabsJournal, SHEETS_DEFAULT, JournalLoadCancelled, journal_signature
 from analysis.dep_mapper import load_aliases, save_aliases, try_match_department
 from screens.dep_map_dialog import ask_user_map_unknowns
 from services import webdav_sync
+from services.copy_queue import DONE as COPY_DONE, get_copy_queue
+from services.journal_watcher import JournalWatcher
 
-from analysis.report_builder import build_docx_report
+from analysis.report_builder import build_combined_report, build_docx_report, combined_file_name, report_file_name
+from analysis.report_batch import batch_pairs, build_reports_batch, combined_sections, summarize
+
+
+# автообновление: как часто смотреть на файл журнала и сколько ждать, пока он "успокоится"
+JOURNAL_WATCH_INTERVAL_SEC = 15.0
+JOURNAL_WATCH_DEBOUNCE_SEC = 10.0
 
 
 # === ПУТЬ К ШАБЛОНУ DOCX (жёстко в коде, как изначально) ===
@@ -90,6 +99,7 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
 
     cfg = load_config()
     webdav_url = (cfg.get("webdav_url") or "").strip()
+    pdf_backend = (cfg.get("swabs_pdf_backend") or "word").strip()
     if webdav_url:
         from microbio_app import DATA_ROOT
         webdav_sync.sync_down(DATA_ROOT)
@@ -203,6 +213,7 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
         cfg["swabs_journal_xlsx"] = new_file
         save_config(cfg)
         journal_lbl.config(text=f"Файл: {cfg.get('swabs_journal_xlsx', '')}")
+        watcher.set_path(new_file)
         reload_journal()
 
     btn_journal = ttk.Button(top, text="Путь файла", command=change_journal_path)
@@ -211,6 +222,26 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
     btn_refresh = ttk.Button(top, text="Обновить", command=lambda: reload_journal())
     btn_refresh.pack(side="right", padx=(6, 0))
 
+    # очередь отправки отчётов в сетевые папки (services/copy_queue.py): клик — повторить сейчас
+    copy_queue = get_copy_queue()
+    net_lbl = tk.Label(top, text="", bg="#f4f6f8", fg="#444", cursor="hand2")
+    net_lbl.pack(side="right", padx=(6, 0))
+    net_lbl.bind("<Button-1>", lambda e: copy_queue.retry_now())
+
+    def _refresh_net_status():
+        if not net_lbl.winfo_exists():
+            return
+        st = copy_queue.summary()
+        if not st["pending"] and not st["failed"]:
+            net_lbl.config(text="", fg="#444")
+            return
+        text = f"Отправка в сеть: {st['pending']} в очереди"
+        if st["failed"]:
+            text += f", не отправлено: {st['failed']}"
+        if st["error"]:
+            text += " (нет доступа — повторим; нажмите, чтобы сейчас)"
+        net_lbl.config(text=text, fg="#b00020" if st["error"] else "#444")
+
     # ===== Основная область =====
     body = tk.Frame(root, bg="#f4f6f8")
     body.pack(expand=True, fill="both")
@@ -304,6 +335,26 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
     dates_all_list = tk.Listbox(tab_by_date, width=18, height=24)
     dates_all_list.pack(anchor="w", pady=(4, 0))
 
+    # протоколы за выбранную дату сразу по всем отделениям
+    btn_batch = tk.Button(
+        tab_by_date,
+        text="Протоколы за дату",
+        font=("Segoe UI", 10, "bold"),
+        bg=base_btn_color,
+        fg="white",
+        activebackground="#1d4ed8",
+        activeforeground="white",
+        relief="flat",
+        padx=10,
+        pady=6,
+        cursor="hand2"
+    )
+    btn_batch.pack(anchor="w", pady=(8, 0))
+
+    # все отделения за дату одним документом (с оглавлением) — для печати
+    btn_combined = ttk.Button(tab_by_date, text="Сводный протокол за дату")
+    btn_combined.pack(anchor="w", pady=(6, 0))
+
     # ===== ПРАВАЯ ЧАСТЬ =====
     right = tk.Frame(body, bg="#f4f6f8")
     right.pack(side="left", expand=True, fill="both")
@@ -339,7 +390,13 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
     status = tk.Label(root, text="", bg="#f4f6f8", fg="#444", anchor="w")
     status.pack(fill="x", pady=(8, 0))
 
-    journal = SwabsJournal(path=cfg.get("swabs_journal_xlsx", ""))
+    # fill_tree показывает все колонки листа ("№ п/п", "Примечание" и т.д.) — читаем всё,
+    # а не только USED_COLUMNS (их хватает report_batch и отчётам)
+    journal = SwabsJournal(
+        path=cfg.get("swabs_journal_xlsx", ""),
+        columns=None,
+        engine=cfg.get("swabs_journal_engine", "auto") or "auto",
+    )
 
     # выбранная пара для отчёта
     selected_dep: str = ""
@@ -410,9 +467,9 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
                 nb.tab(tab_by_sheet[sh], text=base_tab_text[sh])
             return
 
+        present = set(journal.sheets_with_data(dep, day))
         for sh in SHEETS_DEFAULT:
-            df = journal.filter_day(dep, day, sh)
-            has_data = df is not None and not df.empty
+            has_data = sh in present
 
             title = base_tab_text[sh]
             if has_data:
@@ -439,27 +496,34 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
         except Exception as e:
             messagebox.showwarning("Привязки", f"Не удалось создать/прочитать файл привязок:\n{p}\n\n{e}")
 
-    def build_mapping_with_dialog() -> dict:
+    def build_base_mapping(jrn: SwabsJournal) -> dict:
         """
-        mapping строим "как надо":
+        mapping без окон (можно звать из фонового потока):
         - базово берём aliases.json
         - добираем точные совпадения (exact_norm)
-        - спрашиваем только реально неизвестные (unknown_departments_for_mapping)
         """
-        aliases_path = _aliases_path()
-        aliases = load_aliases(aliases_path)
+        aliases = load_aliases(_aliases_path())
         mapping = dict(aliases)
 
-        # добираем то, что можно сопоставить без окна (exact_norm)
-        for raw in journal.unique_raw_departments():
+        for raw in jrn.unique_raw_departments():
             if raw in mapping:
                 continue
             matched, _reason = try_match_department(raw, departments, aliases)
             if matched:
                 mapping[raw] = matched
 
-        unknown = journal.unknown_departments_for_mapping(mapping)
+        return mapping
+
+    def ask_unknown_departments(jrn: SwabsJournal, mapping: dict) -> dict:
+        """
+        Спрашиваем только реально неизвестные (unknown_departments_for_mapping).
+        Только из UI-потока.
+        """
+        mapping = dict(mapping)
+        unknown = jrn.unknown_departments_for_mapping(mapping)
         if unknown:
+            aliases_path = _aliases_path()
+            aliases = load_aliases(aliases_path)
             manual = ask_user_map_unknowns(main_frame, unknown, departments)
             if manual:
                 manual = {k: v for k, v in manual.items() if isinstance(k, str) and isinstance(v, str)}
@@ -490,6 +554,8 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
         frame.pack(fill="both", expand=True)
 
         tk.Label(frame, text=message, font=("Segoe UI", 10)).pack(pady=(0, 8))
+        status_var = tk.StringVar(value="")
+        tk.Label(frame, textvariable=status_var, font=("Segoe UI", 9), fg="#475569").pack()
         dots_var = tk.StringVar(value="...")
         dots_lbl = tk.Label(frame, textvariable=dots_var, font=("Segoe UI", 10))
         dots_lbl.pack(pady=(0, 8))
@@ -517,7 +583,11 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
         animate_dots()
         win.configure(cursor="watch")
 
-        return win, pb
+        def _set_wait_status(text: str) -> None:
+            if win.winfo_exists():
+                status_var.set(text)
+
+        return win, pb, _set_wait_status
 
     def do_make_report():
         nonlocal selected_dep, selected_day
@@ -535,22 +605,15 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
         df_air = journal.filter_day(selected_dep, selected_day, "Воздух")
         df_smears = journal.filter_day(selected_dep, selected_day, "Персонал")
 
-        date_str = pd.Timestamp(selected_day).strftime("%d.%m.%Y")
         has_air = df_air is not None and not df_air.empty
         has_smears = df_smears is not None and not df_smears.empty
-
-        file_name = f"Протокол результатов {selected_dep} {date_str}"
-        if has_air:
-            file_name += " + воздух"
-        if has_smears:
-            file_name += " + мазок"
-        file_name += ".docx"
+        file_name = report_file_name(selected_dep, selected_day, has_air, has_smears)
 
         temp_dir = Path.cwd() / "_tmp_reports"
         temp_dir.mkdir(parents=True, exist_ok=True)
         out_path = str(temp_dir / file_name)
 
-        wait_win, wait_pb = _show_wait_dialog("Формируем отчет, пожалуйста подождите…")
+        wait_win, wait_pb, wait_status = _show_wait_dialog("Формируем отчет, пожалуйста подождите…")
 
         def _finish(ok, payload):
             try:
@@ -564,34 +627,25 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
                 return
 
             saved_docx, auto_word_docx, auto_pdf = payload
+            # в сетевую папку файлы доносит очередь отправки (webdav — там же, после доставки)
+            queued = {os.path.normpath(j.dst) for j in copy_queue.jobs()}
+            note = " (в очереди на отправку)"
             msg = "Отчет успешно сформирован и сохранен:\n\n"
             if auto_word_docx:
-                msg += f"Word:\n{auto_word_docx}\n\n"
+                msg += f"Word:\n{auto_word_docx}{note if auto_word_docx in queued else ''}\n\n"
             else:
                 msg += "Word:\n(не удалось сохранить в сетевую папку)\n\n"
 
             if auto_pdf:
-                msg += f"PDF:\n{auto_pdf}"
+                msg += f"PDF:\n{auto_pdf}{note if auto_pdf in queued else ''}"
             else:
                 msg += "PDF:\n(не удалось сохранить в сетевую папку)"
 
-            if webdav_url:
-                try:
-                    from microbio_app import DATA_ROOT
-                    for p in (auto_word_docx, auto_pdf):
-                        if p and os.path.abspath(p).startswith(os.path.abspath(DATA_ROOT)):
-                            webdav_sync.upload_file(p, DATA_ROOT)
-                except Exception:
-                    pass
-
+            _refresh_net_status()
             messagebox.showinfo("Готово", msg)
 
         def _worker():
-            try:
-                import pythoncom  # type: ignore
-                pythoncom.CoInitialize()
-            except Exception:
-                pythoncom = None
+            # Word (COM) живёт в потоке сервиса конвертации — здесь CoInitialize не нужен
             try:
                 result = build_docx_report(
                     template_path=template_path,
@@ -603,43 +657,366 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
                     df_smears=df_smears,
                     auto_word_dir=report_dir,
                     auto_pdf_dir=report_dir,
+                    pdf_backend=pdf_backend,
+                    pdf_status=lambda job: _post(wait_status, f"PDF: {job.status_text()}"),
+                    copy_queue=copy_queue,
                 )
             except Exception as e:
                 main_frame.after(0, _finish, False, e)
                 return
-            finally:
+
+            main_frame.after(0, _finish, True, result)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    btn_report.configure(command=do_make_report)
+
+    # ===== Пакет протоколов за дату =====
+    def _show_batch_dialog(total: int, cancel: threading.Event):
+        win = tk.Toplevel(main_frame)
+        win.title("Протоколы за дату")
+        win.transient(main_frame)
+        win.grab_set()
+        win.resizable(False, False)
+
+        frame = tk.Frame(win, padx=20, pady=16)
+        frame.pack(fill="both", expand=True)
+
+        text_var = tk.StringVar(value=f"Готово 0 из {total}")
+        tk.Label(frame, textvariable=text_var, font=("Segoe UI", 10), width=40, anchor="w").pack(pady=(0, 8))
+
+        pb = ttk.Progressbar(frame, mode="determinate", length=300, maximum=max(total, 1))
+        pb.pack(pady=(0, 10))
+
+        def _cancel():
+            cancel.set()
+            btn_cancel.configure(state="disabled")
+            text_var.set("Отмена… дожидаемся начатых протоколов")
+
+        btn_cancel = ttk.Button(frame, text="Отмена", command=_cancel)
+        btn_cancel.pack()
+        win.protocol("WM_DELETE_WINDOW", _cancel)
+
+        win.update_idletasks()
+        w = win.winfo_reqwidth()
+        h = win.winfo_reqheight()
+        x = max(0, int((win.winfo_screenwidth() - w) / 2))
+        y = max(0, int((win.winfo_screenheight() - h) / 2))
+        win.geometry(f"{w}x{h}+{x}+{y}")
+        win.configure(cursor="watch")
+
+        def update(done: int, item) -> None:
+            if not win.winfo_exists():
+                return
+            pb["value"] = done
+            if not cancel.is_set():
+                mark = "" if item.ok else " (ошибка)"
+                text_var.set(f"Готово {done} из {total}: {item.dep}{mark}")
+
+        return win, update
+
+    def _show_batch_summary(text: str):
+        win = tk.Toplevel(main_frame)
+        win.title("Итоги пакета")
+        win.transient(main_frame)
+
+        frame = tk.Frame(win, padx=12, pady=12)
+        frame.pack(fill="both", expand=True)
+
+        txt = tk.Text(frame, width=70, height=min(20, text.count("\n") + 2), font=("Segoe UI", 10), wrap="word")
+        txt.insert("1.0", text)
+        txt.configure(state="disabled")
+        txt.pack(fill="both", expand=True)
+
+        ttk.Button(frame, text="Закрыть", command=win.destroy).pack(pady=(8, 0))
+
+    def do_make_batch():
+        sel = dates_all_list.curselection()
+        if not sel:
+            messagebox.showinfo("Протоколы за дату", "Выберите дату в списке.")
+            return
+        date_str = dates_all_list.get(sel[0])
+        day_ts = pd.to_datetime(date_str, dayfirst=True).normalize()
+
+        report_dir = _ensure_report_dir()
+        if not report_dir:
+            return
+        template_path = _ensure_template_path()
+        if not template_path:
+            return
+
+        # журнал может замениться фоновой перезагрузкой — пакет доделываем по тому, что выбрали
+        batch_journal = journal
+        pairs = batch_pairs(batch_journal, day_ts)
+        if not pairs:
+            messagebox.showinfo("Протоколы за дату", f"На {date_str} нет данных ни по одному отделению.")
+            return
+
+        deps = ", ".join(dep for dep, _ in pairs)
+        if not messagebox.askyesno(
+            "Протоколы за дату",
+            f"Сформировать протоколы за {date_str}?\n\nОтделений: {len(pairs)}\n{deps}",
+        ):
+            return
+
+        cancel = threading.Event()
+        win, update = _show_batch_dialog(len(pairs), cancel)
+
+        def _finish(items, err):
+            try:
+                win.destroy()
+            except Exception:
+                pass
+
+            if err is not None:
+                messagebox.showerror("Ошибка", f"Не удалось сформировать протоколы:\n{err}")
+                return
+
+            if webdav_url:
                 try:
-                    if pythoncom is not None:
-                        pythoncom.CoUninitialize()
+                    from microbio_app import DATA_ROOT
+                    root = os.path.abspath(DATA_ROOT)
+                    for it in items:
+                        for p in (it.docx, it.pdf):
+                            if p and os.path.abspath(p).startswith(root):
+                                webdav_sync.upload_file(p, DATA_ROOT)
                 except Exception:
                     pass
 
-            main_frame.after(0, _finish, True, result)
+            _show_batch_summary(f"{date_str}\n\n{summarize(items)}\n\nПапка: {report_dir}")
+
+        def _worker():
+            try:
+                items = build_reports_batch(
+                    batch_journal, template_path, pairs, report_dir,
+                    pdf_backend=pdf_backend,
+                    progress=lambda done, total, item: _post(update, done, item),
+                    cancel=cancel,
+                )
+            except Exception as e:
+                _post(_finish, None, e)
+                return
+            _post(_finish, items, None)
 
-        import threading
         threading.Thread(target=_worker, daemon=True).start()
 
-    btn_report.configure(command=do_make_report)
+    btn_batch.configure(command=do_make_batch)
 
-    def reload_journal():
-        ensure_aliases_file()
+    def do_make_combined():
+        sel = dates_all_list.curselection()
+        if not sel:
+            messagebox.showinfo("Сводный протокол", "Выберите дату в списке.")
+            return
+        date_str = dates_all_list.get(sel[0])
+        day_ts = pd.to_datetime(date_str, dayfirst=True).normalize()
 
-        try:
-            journal.path = cfg.get("swabs_journal_xlsx", "")
-            journal.load()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось прочитать журнал:\n{e}")
-            set_status("Ошибка чтения журнала")
+        report_dir = _ensure_report_dir()
+        if not report_dir:
+            return
+        template_path = _ensure_template_path()
+        if not template_path:
             return
 
+        sections = combined_sections(journal, day_ts)
+        if not sections:
+            messagebox.showinfo("Сводный протокол", f"На {date_str} нет данных ни по одному отделению.")
+            return
+
+        temp_dir = Path.cwd() / "_tmp_reports"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        out_path = str(temp_dir / combined_file_name(day_ts))
+
+        wait_win, wait_pb, wait_status = _show_wait_dialog(
+            f"Формируем сводный протокол ({len(sections)} отд.), пожалуйста подождите…"
+        )
+
+        def _finish(ok, payload):
+            try:
+                wait_pb.stop()
+                wait_win.destroy()
+            except Exception:
+                pass
+
+            if not ok:
+                messagebox.showerror("Ошибка", f"Не удалось сформировать сводный протокол:\n{payload}")
+                return
+
+            saved_docx, auto_word_docx, auto_pdf = payload
+            queued = {os.path.normpath(j.dst) for j in copy_queue.jobs()}
+            note = " (в очереди на отправку)"
+            msg = f"Сводный протокол за {date_str} ({len(sections)} отд.):\n\n"
+            msg += f"Word:\n{auto_word_docx or saved_docx}{note if auto_word_docx in queued else ''}\n\n"
+            if auto_pdf:
+                msg += f"PDF:\n{auto_pdf}{note if auto_pdf in queued else ''}"
+            else:
+                msg += "PDF:\n(не удалось сохранить в сетевую папку)"
+
+            _refresh_net_status()
+            messagebox.showinfo("Готово", msg)
+
+        def _worker():
+            try:
+                result = build_combined_report(
+                    template_path, out_path, day_ts, sections,
+                    auto_word_dir=report_dir,
+                    auto_pdf_dir=report_dir,
+                    pdf_backend=pdf_backend,
+                    pdf_status=lambda job: _post(wait_status, f"PDF: {job.status_text()}"),
+                    copy_queue=copy_queue,
+                )
+            except Exception as e:
+                _post(_finish, False, e)
+                return
+            _post(_finish, True, result)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    btn_combined.configure(command=do_make_combined)
+
+    # ===== Загрузка журнала (в фоне) =====
+    load_state = {"cancel": None}
+
+    STAGE_TEXT = {
+        "read": "Чтение листа «{}»…",
+        "clean": "Обработка листа «{}»…",
+        "map": "Привязка подразделений…",
+        "index": "Индексация…",
+    }
+
+    def _post(fn, *args):
+        # из фонового потока в UI-поток; экран могли уже закрыть
         try:
-            mapping = build_mapping_with_dialog()
-            journal.apply_department_mapping(mapping)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка привязки подразделений:\n{e}")
+            main_frame.after(0, fn, *args)
+        except Exception:
+            pass
 
-        set_status(f"Журнал загружен: {journal.path}")
-        on_left_tab_changed()
+    def _load_is_current(cancel: threading.Event) -> bool:
+        return not cancel.is_set() and load_state.get("cancel") is cancel and status.winfo_exists()
+
+    def _on_load_progress(cancel: threading.Event, stage: str, detail: str):
+        if _load_is_current(cancel):
+            set_status(STAGE_TEXT.get(stage, "{}").format(detail))
+
+    def _on_load_failed(cancel: threading.Event, err: Exception):
+        if not _load_is_current(cancel):
+            return
+        load_state["cancel"] = None
+        messagebox.showerror("Ошибка", f"Не удалось прочитать журнал:\n{err}")
+        set_status("Ошибка чтения журнала")
+
+    def _on_load_done(cancel: threading.Event, fresh: SwabsJournal, mode: str, auto: bool):
+        nonlocal journal
+        if not _load_is_current(cancel):
+            return
+        load_state["cancel"] = None
+
+        has_unknown = bool(fresh.unknown_departments_for_mapping(fresh.mapping or {}))
+        if mode == "unchanged" and (auto or not has_unknown):
+            if not auto:
+                set_status(f"Журнал не изменился: {fresh.path}")
+            return
+
+        note = ""
+        if has_unknown:
+            if auto:
+                # окно привязки не всплывает само по себе — только по кнопке "Обновить"
+                note = " (есть подразделения без привязки — нажмите «Обновить»)"
+            else:
+                try:
+                    fresh.apply_department_mapping(ask_unknown_departments(fresh, fresh.mapping or {}))
+                except Exception as e:
+                    messagebox.showerror("Ошибка", f"Ошибка привязки подразделений:\n{e}")
+
+        journal = fresh
+        if auto:
+            refresh_current_view()
+            set_status(f"Журнал обновлён автоматически: {pd.Timestamp.now():%H:%M}{note}")
+        else:
+            set_status(f"Журнал загружен: {journal.path}{note}")
+            on_left_tab_changed()
+
+    def reload_journal(auto: bool = False):
+        """
+        Журнал грузится в фоне в КОПИЮ: пока она читается, экран работает с прежними данными,
+        по готовности копия подменяет журнал. Новая загрузка отменяет предыдущую.
+
+        auto=True — обновление от наблюдателя: не перебивает уже идущую загрузку,
+        не открывает окно привязки и не сбрасывает текущий выбор на экране.
+        """
+        if not root.winfo_exists():
+            return
+        if auto and load_state.get("cancel") is not None:
+            # идёт загрузка — проверим ещё раз чуть позже, чтобы не потерять правку
+            main_frame.after(int(JOURNAL_WATCH_DEBOUNCE_SEC * 1000), reload_journal, True)
+            return
+
+        if not auto:
+            ensure_aliases_file()
+
+        prev = load_state.get("cancel")
+        if prev is not None:
+            prev.set()
+        cancel = threading.Event()
+        load_state["cancel"] = cancel
+
+        work = journal.copy()
+        work.path = cfg.get("swabs_journal_xlsx", "")
+
+        def progress(stage: str, detail: str):
+            _post(_on_load_progress, cancel, stage, detail)
+
+        def _worker():
+            try:
+                # дописанные строки разбираются отдельно; при правке старых — полный разбор
+                mode = work.refresh(progress=progress, cancel=cancel)
+                if mode != "unchanged":
+                    # при "append" refresh() уже привязал и проиндексировал только новые строки;
+                    # полная перепривязка — после полного разбора или если привязка поменялась
+                    # (алиасы, новое отделение среди дописанных строк)
+                    mapping = build_base_mapping(work)
+                    if mode == "full" or mapping != work.mapping:
+                        work.apply_department_mapping(mapping, progress=progress, cancel=cancel)
+            except JournalLoadCancelled:
+                return
+            except Exception as e:
+                _post(_on_load_failed, cancel, e)
+                return
+            _post(_on_load_done, cancel, work, mode, auto)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    watcher = JournalWatcher(
+        cfg.get("swabs_journal_xlsx", ""),
+        lambda: _post(reload_journal, True),
+        interval=JOURNAL_WATCH_INTERVAL_SEC,
+        debounce=JOURNAL_WATCH_DEBOUNCE_SEC,
+        signature=journal_signature,
+    )
+
+    def _on_copy_event(job):
+        # поток очереди отправки: доставленное в DATA_ROOT — дальше на webdav, затем статус в UI
+        if job.status == COPY_DONE and webdav_url:
+            try:
+                from microbio_app import DATA_ROOT
+                if os.path.abspath(job.dst).startswith(os.path.abspath(DATA_ROOT)):
+                    webdav_sync.upload_file(job.dst, DATA_ROOT)
+            except Exception:
+                pass
+        _post(_refresh_net_status)
+
+    copy_queue.add_listener(_on_copy_event)
+    _refresh_net_status()
+
+    def _on_screen_destroy(event):
+        # ушли с экрана — фоновую загрузку и наблюдение больше никто не ждёт
+        if event.widget is root:
+            watcher.stop()
+            copy_queue.remove_listener(_on_copy_event)
+            c = load_state.get("cancel")
+            if c is not None:
+                c.set()
+
+    root.bind("<Destroy>", _on_screen_destroy, add="+")
 
     # ===== Режим "По отделению" =====
     def update_dates(event=None):
@@ -726,6 +1103,50 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
 
         set_status(f"Все отделения — {date_str}")
 
+    def _listbox_selected(lb: tk.Listbox) -> str | None:
+        sel = lb.curselection()
+        return lb.get(sel[0]) if sel else None
+
+    def _sync_listbox(lb: tk.Listbox, items: list[str], keep: str | None) -> bool:
+        """
+        Обновляет список только если он изменился; выбор сохраняется. True — выбранное значение на месте.
+        """
+        if list(lb.get(0, tk.END)) != items:
+            lb.delete(0, tk.END)
+            for it in items:
+                lb.insert(tk.END, it)
+        if keep is not None and keep in items:
+            i = items.index(keep)
+            lb.selection_clear(0, tk.END)
+            lb.selection_set(i)
+            lb.see(i)
+            return True
+        return False
+
+    def refresh_current_view():
+        """
+        После автообновления: перерисовываем только то, что выбрано сейчас,
+        без сброса отделения/даты и без перестройки всего экрана.
+        """
+        tab_text = left_nb.tab(left_nb.select(), "text")
+        if tab_text == "По датам":
+            cur = _listbox_selected(dates_all_list)
+            items = [d.strftime("%d.%m.%Y") for d in journal.list_all_dates()]
+            if _sync_listbox(dates_all_list, items, cur):
+                show_day_all()
+            elif cur is None and items:
+                update_dates_all()
+            return
+
+        if not dep_var.get().strip():
+            return
+        cur = _listbox_selected(dates_list)
+        items = [d.strftime("%d.%m.%Y") for d in journal.list_dates_for_department(dep_var.get().strip())]
+        if _sync_listbox(dates_list, items, cur):
+            show_day()
+        else:
+            update_dates()
+
     def on_left_tab_changed(event=None):
         tab_text = left_nb.tab(left_nb.select(), "text")
         if tab_text == "По датам":
@@ -745,4 +1166,14 @@ def build_swab_monitoring_screen(main_frame, build_header, go_back_callback):
     dates_all_list.bind("<<ListboxSelect>>", show_day_all)
     left_nb.bind("<<NotebookTabChanged>>", on_left_tab_changed)
 
+    # сразу показываем прошлый снимок (без обращения к сети), свежие данные подменят его позже
+    if journal.restore_snapshot():
+        try:
+            journal.apply_department_mapping(build_base_mapping(journal))
+        except Exception:
+            pass
+        on_left_tab_changed()
+        set_status("Показаны данные прошлой загрузки, журнал обновляется…")
+
     reload_journal()
+    watcher.start()
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+# -------------------------
+# статусы задачи
+# -------------------------
+PENDING = "pending"
+COPYING = "copying"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class CopyJob:
+    id: str
+    src: str
+    dst: str
+    created: float
+    attempts: int = 0
+    next_try: float = 0.0
+    status: str = PENDING
+    error: Optional[str] = None
+    owned: bool = False     # src — наш файл из outbox, удалить после доставки
+
+
+def default_journal_path() -> str:
+    """
+    Журнал очереди — локально, рядом с кэшем: переживает перезапуск программы.
+    """
+    return os.path.join(
+        os.environ.get("APPDATA", os.path.expanduser("~")),
+        "EpidMonitor",
+        "cache",
+        "copy_queue.jsonl",
+    )
+
+
+class CopyQueue:
+    """
+    Очередь отправки готовых файлов в сетевые папки (\\\\w00164\\e$ и т.п.).
+
+    submit() только дописывает строку в локальный журнал и сразу возвращается — отчёт
+    не ждёт SMB. Фоновый поток копирует по одной задаче (во временный .part, затем replace),
+    при ошибке повторяет с нарастающей паузой (base_delay * 2^попытка, не больше max_delay).
+    Незавершённые задачи после перезапуска программы подхватываются из журнала.
+
+    Журнал — JSONL из событий (add / retry / done / failed / drop); при старте
+    переписывается компактно, только с незавершёнными задачами.
+
+    Слушатели (add_listener) вызываются из потока очереди на каждую смену статуса —
+    UI-код должен сам перейти в свой поток (after).
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, *,
+                 base_delay: float = 5.0, max_delay: float = 600.0, max_attempts: int = 50):
+        self.journal_path = journal_path or default_journal_path()
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+        self._jobs: Dict[str, CopyJob] = {}
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[CopyJob], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._loaded = False
+
+    def outbox_path(self, name: str) -> str:
+        """
+        Локальный путь для файла, который создаётся только ради отправки (например, PDF):
+        папка outbox рядом с журналом. Такой файл отдаётся в submit(..., owned=True).
+        """
+        outbox = os.path.join(os.path.dirname(self.journal_path), "outbox")
+        os.makedirs(outbox, exist_ok=True)
+        return os.path.join(outbox, name)
+
+    # --- журнал ---
+
+    def _append(self, op: str, job: CopyJob) -> None:
+        rec = {"op": op, **asdict(job)}
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"CopyQueue: не удалось записать журнал: {e}")
+
+    def _load(self) -> None:
+        """
+        Восстановить незавершённые задачи и переписать журнал без завершённых.
+        """
+        jobs: Dict[str, CopyJob] = {}
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue    # оборванная последняя строка
+                    op = rec.pop("op", "")
+                    try:
+                        job = CopyJob(**rec)
+                    except TypeError:
+                        continue
+                    if op in ("done", "drop"):
+                        jobs.pop(job.id, None)
+                    else:
+                        jobs[job.id] = job
+        except OSError:
+            pass
+
+        for job in jobs.values():
+            if job.status == COPYING:      # прервались посреди копирования
+                job.status = PENDING
+        self._jobs = jobs
+
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            tmp = f"{self.journal_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for job in jobs.values():
+                    f.write(json.dumps({"op": "add", **asdict(job)}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.journal_path)
+        except OSError as e:
+            print(f"CopyQueue: не удалось переписать журнал: {e}")
+
+    # --- API ---
+
+    def start(self) -> "CopyQueue":
+        with self._cond:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+            self._stop = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="CopyQueue", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    def submit(self, src: str, dst: str, *, owned: bool = False) -> CopyJob:
+        """
+        Поставить копирование src -> dst. Незавершённая отправка в тот же dst заменяется новой:
+        доставлять устаревший файл незачем. owned=True — src удаляется после доставки.
+        """
+        self.start()   # журнал должен быть поднят до первой новой задачи
+        src = os.path.normpath(os.path.abspath(src))
+        dst = os.path.normpath(dst)
+        job = CopyJob(id=uuid.uuid4().hex, src=src, dst=dst, created=time.time(), owned=owned)
+
+        with self._cond:
+            for old in list(self._jobs.values()):
+                if old.dst == dst and old.status in (PENDING, FAILED):
+                    del self._jobs[old.id]
+                    self._append("drop", old)
+            self._jobs[job.id] = job
+            self._append("add", job)
+            self._cond.notify_all()
+        self._notify(job)
+        return job
+
+    def jobs(self) -> List[CopyJob]:
+        with self._cond:
+            return [CopyJob(**asdict(j)) for j in self._jobs.values()]
+
+    def pending_destinations(self) -> Set[str]:
+        """
+        Куда ещё идёт доставка (ждёт или копируется) — пути в том же виде, что dst в submit.
+        """
+        with self._cond:
+            return {j.dst for j in self._jobs.values() if j.status in (PENDING, COPYING)}
+
+    def summary(self) -> Dict[str, object]:
+        """
+        {"pending": ждут/копируются, "failed": бросили после max_attempts, "error": последняя ошибка}.
+        """
+        with self._cond:
+            jobs = list(self._jobs.values())
+        waiting = [j for j in jobs if j.status in (PENDING, COPYING)]
+        failed = [j for j in jobs if j.status == FAILED]
+        errors = [j for j in waiting + failed if j.error]
+        return {
+            "pending": len(waiting),
+            "failed": len(failed),
+            "error": errors[-1].error if errors else None,
+        }
+
+    def retry_now(self) -> None:
+        """
+        Повторить всё незавершённое сейчас (в том числе брошенное), не дожидаясь паузы.
+        """
+        with self._cond:
+            for job in self._jobs.values():
+                if job.status in (PENDING, FAILED):
+                    job.status = PENDING
+                    job.next_try = 0.0
+                    if job.attempts >= self.max_attempts:
+                        job.attempts = 0
+            self._cond.notify_all()
+        self.start()
+
+    def add_listener(self, fn: Callable[[CopyJob], None]) -> None:
+        with self._cond:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[CopyJob], None]) -> None:
+        with self._cond:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    # --- поток очереди ---
+
+    def _notify(self, job: CopyJob) -> None:
+        with self._cond:
+            listeners = list(self._listeners)
+        snapshot = CopyJob(**asdict(job))
+        for fn in listeners:
+            try:
+                fn(snapshot)
+            except Exception as e:
+                print(f"CopyQueue: ошибка обработчика: {e}")
+
+    def _next_job(self) -> Optional[CopyJob]:
+        """
+        Ближайшая по времени задача; ждёт, пока она созреет или придёт новая.
+        """
+        with self._cond:
+            while not self._stop:
+                pending = [j for j in self._jobs.values() if j.status == PENDING]
+                if pending:
+                    job = min(pending, key=lambda j: (j.next_try, j.created))
+                    delay = job.next_try - time.time()
+                    if delay <= 0:
+                        job.status = COPYING
+                        return job
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+        return None
+
+    @staticmethod
+    def _copy(src: str, dst: str) -> None:
+        if not os.path.exists(src):
+            raise FileNotFoundError(f"Исходный файл пропал: {src}")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        part = dst + ".part"
+        shutil.copy2(src, part)
+        os.replace(part, dst)
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._notify(job)
+
+            try:
+                self._copy(job.src, job.dst)
+            except Exception as e:
+                with self._cond:
+                    if self._jobs.get(job.id) is not job:
+                        continue    # пока копировали, задачу заменили новой
+                    job.attempts += 1
+                    job.error = str(e) or e.__class__.__name__
+                    gone = isinstance(e, FileNotFoundError) and not os.path.exists(job.src)
+                    if gone or job.attempts >= self.max_attempts:
+                        job.status = FAILED
+                        self._append("failed", job)
+                    else:
+                        job.status = PENDING
+                        job.next_try = time.time() + min(self.max_delay, self.base_delay * 2 ** (job.attempts - 1))
+                        self._append("retry", job)
+                self._notify(job)
+                continue
+
+            with self._cond:
+                job.status = DONE
+                job.error = None
+                if self._jobs.get(job.id) is job:
+                    del self._jobs[job.id]
+                    self._append("done", job)
+                # тот же outbox-файл могла взять новая задача в тот же dst
+                still_used = any(j.src == job.src for j in self._jobs.values())
+            if job.owned and not still_used:
+                try:
+                    os.remove(job.src)
+                except OSError:
+                    pass
+            self._notify(job)
+
+
+# -------------------------
+# общая очередь на процесс
+# -------------------------
+
+_QUEUE: Optional[CopyQueue] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_copy_queue() -> CopyQueue:
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = CopyQueue().start()
+        return _QUEUE
+
+
+def _shutdown() -> None:
+    if _QUEUE is not None:
+        _QUEUE.stop()
+
+
+atexit.register(_shutdown)
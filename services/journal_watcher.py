@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from analysis.swabs_cache import file_signature
+
+
+class JournalWatcher:
+    """
+    Следит за xlsx-журналом: раз в interval секунд делает stat (размер + mtime) —
+    на SMB это дёшево, сам файл не открывается.
+
+    Изменение засчитывается, когда сигнатура перестала меняться debounce секунд:
+    Excel/лаборатория сохраняют файл в несколько приёмов, дёргать загрузку
+    на каждый промежуточный stat незачем.
+
+    on_change вызывается из потока наблюдателя — UI-код должен сам перейти в свой поток (after).
+    signature — чем снимать состояние пути (по умолчанию stat одного файла; для маски
+    годовых книг — swabs_journal.journal_signature).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Callable[[], None],
+        *,
+        interval: float = 15.0,
+        debounce: float = 10.0,
+        signature: Callable[[Any], Optional[Any]] = file_signature,
+    ):
+        self._path = path
+        self._signature = signature
+        self._on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last: Optional[Any] = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def set_path(self, path: str) -> None:
+        """
+        Сменить файл (например, выбрали другой журнал): текущее состояние считается исходным.
+        """
+        with self._lock:
+            self._path = path
+            self._last = self._signature(path) if path else None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        with self._lock:
+            self._last = self._signature(self._path) if self._path else None
+        self._thread = threading.Thread(target=self._run, name="JournalWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        pending: Optional[Any] = None
+        pending_since = 0.0
+
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                path = self._path
+                last = self._last
+            if not path:
+                continue
+
+            sig = self._signature(path)
+            if sig is None:
+                # сеть/файл временно недоступны (или файл как раз перезаписывают)
+                continue
+
+            if sig == last:
+                pending = None
+                continue
+
+            now = time.monotonic()
+            if sig != pending:
+                pending = sig
+                pending_since = now
+                continue
+
+            if now - pending_since < self.debounce:
+                continue
+
+            with self._lock:
+                if self._path != path:
+                    continue
+                self._last = sig
+            pending = None
+
+            try:
+                self._on_change()
+            except Exception as e:
+                print(f"JournalWatcher: ошибка обработчика: {e}")
@@ -0,0 +1,610 @@
+from __future__ import annotations
+
+import atexit
+import glob
+import itertools
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# -------------------------
+# статусы задачи
+# -------------------------
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+STATUS_TEXT = {
+    QUEUED: "в очереди",
+    RUNNING: "конвертация",
+    DONE: "готово",
+    FAILED: "ошибка",
+    CANCELLED: "отменено",
+}
+
+
+# -------------------------
+# бэкенды
+# -------------------------
+
+class PdfBackend:
+    """
+    Конвертер DOCX -> PDF. start/convert/close вызываются только из потока сервиса,
+    поэтому COM-объекты Word живут в одном потоке.
+    """
+
+    name = "base"
+
+    def start(self) -> None:
+        pass
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class WordBackend(PdfBackend):
+    """
+    Microsoft Word через COM (только Windows): один процесс Word на много документов.
+    """
+
+    name = "word"
+
+    def __init__(self):
+        self._word = None
+        self._com = None
+
+    def start(self) -> None:
+        import win32com.client  # type: ignore
+
+        try:
+            import pythoncom  # type: ignore
+            pythoncom.CoInitialize()
+            self._com = pythoncom
+        except Exception:
+            self._com = None
+
+        word = win32com.client.DispatchEx("Word.Application")
+        word.Visible = False
+        word.DisplayAlerts = 0
+        self._word = word
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        doc = None
+        try:
+            doc = self._word.Documents.Open(docx_path, ReadOnly=1)
+            # поля (оглавление сводного протокола) — номера страниц по раскладке самого Word
+            if doc.Fields.Count:
+                doc.Fields.Update()
+            # 17 = wdFormatPDF
+            doc.SaveAs(pdf_path, FileFormat=17)
+        finally:
+            try:
+                if doc is not None:
+                    doc.Close(False)
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        word, self._word = self._word, None
+        if word is not None:
+            try:
+                word.Quit()
+            except Exception:
+                pass
+        if self._com is not None:
+            try:
+                self._com.CoUninitialize()
+            except Exception:
+                pass
+            self._com = None
+
+
+# выполняется питоном LibreOffice (в нём есть uno): подключиться к запущенному
+# soffice --accept по именованному каналу и сделать одно действие.
+#   argv: <канал> ping <таймаут>  |  <канал> quit  |  <канал> convert <docx> <pdf>
+_UNO_HELPER = r"""
+import sys, time
+import uno
+from com.sun.star.beans import PropertyValue
+
+def prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+pipe, action = sys.argv[1], sys.argv[2]
+local = uno.getComponentContext()
+resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+deadline = time.time() + (float(sys.argv[3]) if action == "ping" else 5.0)
+while True:
+    try:
+        ctx = resolver.resolve("uno:pipe,name=%s;urp;StarOffice.ComponentContext" % pipe)
+        break
+    except Exception:
+        if time.time() > deadline:
+            raise
+        time.sleep(0.2)
+desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+if action == "quit":
+    try:
+        desktop.terminate()
+    except Exception:
+        pass    # соединение рвётся вместе с процессом
+elif action == "convert":
+    src, dst = sys.argv[3], sys.argv[4]
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(src), "_blank", 0, (prop("Hidden", True), prop("ReadOnly", True)))
+    try:
+        # поля (оглавление сводного протокола) — номера страниц по раскладке LibreOffice
+        doc.getTextFields().refresh()
+        doc.storeToURL(uno.systemPathToFileUrl(dst), (prop("FilterName", "writer_pdf_Export"),))
+    finally:
+        doc.close(True)
+"""
+
+
+class LibreOfficeBackend(PdfBackend):
+    """
+    LibreOffice без окна: один soffice на много документов, как Word через COM.
+
+    start() поднимает soffice --headless --accept=pipe (свой временный профиль — не мешает
+    открытому у пользователя LibreOffice), convert() отдаёт ему документ через UNO.
+    UNO есть только в питоне LibreOffice (program\\python.exe рядом с soffice), поэтому
+    каждую задачу выполняет короткий вызов этого питона (_UNO_HELPER) — сам офис уже прогрет.
+
+    Питона с uno нет (сборки без него, часть Linux-пакетов) — каждая задача запускает
+    soffice --convert-to с холодного старта, как раньше; warm в этом случае False.
+    """
+
+    name = "libreoffice"
+
+    _pipes = itertools.count(1)
+
+    def __init__(self, soffice: Optional[str] = None, timeout: float = 120.0,
+                 python: Optional[str] = None, start_timeout: float = 60.0):
+        self.soffice = soffice
+        self.timeout = timeout
+        self.python = python
+        self.start_timeout = start_timeout
+        self._profile: Optional[str] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._pipe: Optional[str] = None
+
+    @staticmethod
+    def find_soffice() -> Optional[str]:
+        found = shutil.which("soffice") or shutil.which("libreoffice")
+        if found:
+            return found
+        for pattern in (r"C:\Program Files\LibreOffice\program\soffice.exe",
+                        r"C:\Program Files (x86)\LibreOffice\program\soffice.exe"):
+            hits = glob.glob(pattern)
+            if hits:
+                return hits[0]
+        return None
+
+    @staticmethod
+    def find_python(soffice: str) -> Optional[str]:
+        """
+        Питон с модулем uno: встроенный в LibreOffice (Windows) или системный python3
+        с пакетом python3-uno (Linux).
+        """
+        program = os.path.dirname(os.path.realpath(soffice))
+        candidates = [os.path.join(program, n) for n in ("python.exe", "python")]
+        if os.name != "nt":
+            candidates.append(shutil.which("python3") or "")
+        for cand in candidates:
+            if not cand or not os.path.isfile(cand):
+                continue
+            try:
+                res = subprocess.run([cand, "-c", "import uno"], capture_output=True, timeout=30)
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if res.returncode == 0:
+                return cand
+        return None
+
+    @property
+    def warm(self) -> bool:
+        return self._proc is not None
+
+    def _profile_url(self) -> str:
+        return "file:///" + self._profile.replace("\\", "/").lstrip("/")
+
+    def _helper(self, *args: str, timeout: float) -> None:
+        res = subprocess.run([self.python, "-c", _UNO_HELPER, self._pipe, *args],
+                             capture_output=True, timeout=timeout)
+        if res.returncode != 0:
+            err = (res.stderr or res.stdout or b"").decode("utf-8", "replace").strip()
+            raise RuntimeError(f"LibreOffice (UNO): {err[-300:]}")
+
+    def start(self) -> None:
+        self.soffice = self.soffice or self.find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) не найден")
+        self._profile = tempfile.mkdtemp(prefix="epid_lo_")
+
+        self.python = self.python or self.find_python(self.soffice)
+        if not self.python:
+            print("LibreOffice: питон с uno не найден — каждый PDF через soffice --convert-to")
+            return
+
+        self._pipe = f"epid_lo_{os.getpid()}_{next(self._pipes)}"
+        self._proc = subprocess.Popen(
+            [
+                self.soffice, "--headless", "--invisible", "--nodefault", "--nologo",
+                "--norestore", "--nolockcheck", f"-env:UserInstallation={self._profile_url()}",
+                f"--accept=pipe,name={self._pipe};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            # первый запуск с новым профилем — самый долгий; дальше документы идут в живой офис
+            self._helper("ping", str(self.start_timeout), timeout=self.start_timeout + 30)
+        except Exception:
+            self.close()
+            raise
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        if self._proc is None:
+            self._convert_cold(docx_path, pdf_path)
+            return
+        if self._proc.poll() is not None:
+            # упал — PdfConverter закроет бэкенд и повторит задачу на новом
+            raise RuntimeError(f"soffice завершился (код {self._proc.returncode})")
+
+        # во временный файл рядом: незаконченный PDF не должен оказаться на месте готового
+        tmp = f"{pdf_path}.{os.getpid()}.part.pdf"
+        try:
+            self._helper("convert", docx_path, tmp, timeout=self.timeout)
+            if not os.path.exists(tmp):
+                raise RuntimeError("LibreOffice не создал PDF")
+            os.replace(tmp, pdf_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _convert_cold(self, docx_path: str, pdf_path: str) -> None:
+        out_dir = tempfile.mkdtemp(prefix="epid_lo_out_")
+        try:
+            cmd = [
+                self.soffice, "--headless", "--norestore", "--nolockcheck",
+                f"-env:UserInstallation={self._profile_url()}",
+                "--convert-to", "pdf", "--outdir", out_dir, docx_path,
+            ]
+            res = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+            if res.returncode != 0 or not os.path.exists(produced):
+                err = (res.stderr or res.stdout or b"").decode("utf-8", "replace").strip()
+                raise RuntimeError(f"soffice: код {res.returncode}. {err[:300]}")
+            shutil.move(produced, pdf_path)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            if proc.poll() is None:
+                try:
+                    self._helper("quit", timeout=15)
+                except Exception:
+                    pass
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait(10)
+        self._pipe = None
+        if self._profile:
+            shutil.rmtree(self._profile, ignore_errors=True)
+        self._profile = None
+
+
+class NativeBackend(PdfBackend):
+    """
+    reportlab (analysis/report_pdf.py) — без офиса, рисует DOCX заново.
+    """
+
+    name = "native"
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        from analysis.report_pdf import save_pdf_native
+        save_pdf_native(docx_path, pdf_path)
+
+
+# минимальный одностраничный PDF — заглушка вместо настоящей конвертации
+_STUB_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 842 595]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+class StubBackend(PdfBackend):
+    """
+    Заглушка для проверок без Word/LibreOffice: пишет пустой PDF.
+    delay — имитация времени конвертации, fail — какие по счёту вызовы convert падают (с 1).
+    """
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0, fail: Optional[set] = None):
+        self.delay = delay
+        self.fail = set(fail or ())
+        self.calls: List[str] = []
+        self.starts = 0
+
+    def start(self) -> None:
+        self.starts += 1
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        self.calls.append(docx_path)
+        if self.delay:
+            time.sleep(self.delay)
+        if len(self.calls) in self.fail:
+            raise RuntimeError(f"stub: сбой на вызове {len(self.calls)}")
+        with open(pdf_path, "wb") as f:
+            f.write(_STUB_PDF)
+
+
+BACKENDS: Dict[str, Callable[[], PdfBackend]] = {
+    WordBackend.name: WordBackend,
+    LibreOfficeBackend.name: LibreOfficeBackend,
+    NativeBackend.name: NativeBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+# -------------------------
+# очередь
+# -------------------------
+
+class PdfJob:
+    """
+    Задача конвертации. status меняется в потоке сервиса; on_status (если задан)
+    вызывается оттуда же на каждую смену — UI-код должен сам перейти в свой поток (after).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, docx_path: str, pdf_path: str,
+                 on_status: Optional[Callable[["PdfJob"], None]] = None):
+        self.id = next(self._ids)
+        self.docx_path = docx_path
+        self.pdf_path = pdf_path
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.position = 0            # сколько задач было впереди при постановке
+        self._on_status = on_status
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def status_text(self) -> str:
+        text = STATUS_TEXT.get(self.status, self.status)
+        if self.status == QUEUED and self.position:
+            text += f" (впереди {self.position})"
+        if self.status == FAILED and self.error:
+            text += f": {self.error}"
+        return text
+
+    def cancel(self) -> bool:
+        """
+        Снять задачу, пока она в очереди. Уже идущую конвертацию не прерывает.
+        """
+        return self._move(QUEUED, CANCELLED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _move(self, expected: str, status: str) -> bool:
+        # отмена из UI и взятие в работу потоком сервиса не должны разминуться
+        with self._lock:
+            if self.status != expected:
+                return False
+            self.status = status
+        self._set(status)
+        return True
+
+    def _set(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        if self._on_status is not None:
+            try:
+                self._on_status(self)
+            except Exception as e:
+                print(f"PdfConverter: ошибка обработчика статуса: {e}")
+        # wait() отпускаем после обработчика: дождавшийся видит уже обработанный результат
+        if status in (DONE, FAILED, CANCELLED):
+            self._done.set()
+
+
+class PdfConverter:
+    """
+    Сервис DOCX -> PDF: один поток, один "прогретый" экземпляр бэкенда, задачи по очереди.
+
+    - бэкенд поднимается при первой задаче и держится, пока есть работа;
+      после idle_timeout секунд простоя закрывается (Word не висит в памяти зря)
+    - после restart_every задач бэкенд перезапускается (Word со временем распухает)
+    - при ошибке бэкенд перезапускается и задача повторяется retries раз
+    """
+
+    def __init__(self, backend_factory: Callable[[], PdfBackend], *,
+                 restart_every: int = 50, retries: int = 1, idle_timeout: float = 300.0):
+        self._factory = backend_factory
+        self.restart_every = restart_every
+        self.retries = retries
+        self.idle_timeout = idle_timeout
+
+        self._queue: "queue.Queue[Optional[PdfJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._backend: Optional[PdfBackend] = None
+        self._since_start = 0
+        self.current: Optional[PdfJob] = None
+
+    def submit(self, docx_path: str, pdf_path: str,
+               on_status: Optional[Callable[[PdfJob], None]] = None) -> PdfJob:
+        job = PdfJob(
+            os.path.normpath(os.path.abspath(docx_path)),
+            os.path.normpath(os.path.abspath(pdf_path)),
+            on_status,
+        )
+        if not os.path.exists(job.docx_path):
+            job._set(FAILED, f"DOCX не найден: {job.docx_path}")
+            return job
+
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("PdfConverter остановлен")
+            job.position = self.pending()
+        # "в очереди" сообщаем до постановки: потом статус уже меняет поток сервиса
+        job._set(QUEUED)
+        with self._lock:
+            self._queue.put(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="PdfConverter", daemon=True)
+                self._thread.start()
+        return job
+
+    def convert(self, docx_path: str, pdf_path: str,
+                on_status: Optional[Callable[[PdfJob], None]] = None,
+                timeout: Optional[float] = None) -> str:
+        """
+        submit + ожидание. Ошибку конвертации поднимает как RuntimeError.
+        """
+        job = self.submit(docx_path, pdf_path, on_status)
+        if not job.wait(timeout):
+            job.cancel()
+            raise TimeoutError(f"PDF не готов за {timeout} с: {job.docx_path}")
+        if job.status != DONE:
+            raise RuntimeError(job.error or STATUS_TEXT.get(job.status, job.status))
+        return job.pdf_path
+
+    def pending(self) -> int:
+        return self._queue.qsize() + (1 if self.current is not None else 0)
+
+    def stop(self, wait: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        Остановить сервис: задачи из очереди снимаются, бэкенд закрывается потоком сервиса.
+        """
+        with self._lock:
+            self._stopped = True
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.cancel()
+        self._queue.put(None)
+        if wait and self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- поток сервиса ---
+
+    def _close_backend(self) -> None:
+        backend, self._backend = self._backend, None
+        self._since_start = 0
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception as e:
+                print(f"PdfConverter: ошибка закрытия {backend.name}: {e}")
+
+    def _convert(self, job: PdfJob) -> None:
+        attempts = self.retries + 1
+        for attempt in range(attempts):
+            try:
+                if self._backend is None:
+                    backend = self._factory()
+                    backend.start()
+                    self._backend = backend
+                os.makedirs(os.path.dirname(job.pdf_path), exist_ok=True)
+                self._backend.convert(job.docx_path, job.pdf_path)
+            except Exception as e:
+                # сбой: экземпляр мог остаться в плохом состоянии — следующий подъём с нуля
+                self._close_backend()
+                if attempt + 1 >= attempts:
+                    job._set(FAILED, str(e) or e.__class__.__name__)
+                    return
+                continue
+
+            self._since_start += 1
+            if self.restart_every and self._since_start >= self.restart_every:
+                self._close_backend()
+            job._set(DONE)
+            return
+
+    def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.idle_timeout if self._backend is not None else None)
+                except queue.Empty:
+                    self._close_backend()
+                    continue
+                if job is None:
+                    break
+                if not job._move(QUEUED, RUNNING):
+                    continue   # отменена, пока ждала
+
+                self.current = job
+                try:
+                    self._convert(job)
+                finally:
+                    self.current = None
+        finally:
+            self._close_backend()
+
+
+# -------------------------
+# общий сервис на процесс
+# -------------------------
+
+_CONVERTERS: Dict[str, PdfConverter] = {}
+_CONVERTERS_LOCK = threading.Lock()
+
+
+def get_converter(backend: str = "word") -> PdfConverter:
+    """
+    Общий на процесс сервис для бэкенда (word / libreoffice / native / stub).
+    """
+    with _CONVERTERS_LOCK:
+        conv = _CONVERTERS.get(backend)
+        if conv is None:
+            factory = BACKENDS.get(backend)
+            if factory is None:
+                raise ValueError(f"Неизвестный PDF-бэкенд: {backend!r}")
+            conv = PdfConverter(factory)
+            _CONVERTERS[backend] = conv
+        return conv
+
+
+def shutdown() -> None:
+    with _CONVERTERS_LOCK:
+        convs = list(_CONVERTERS.values())
+        _CONVERTERS.clear()
+    for conv in convs:
+        # зависший Word не должен держать выход из программы
+        conv.stop(wait=True, timeout=10.0)
+
+
+atexit.register(shutdown)
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import pytest
+
+from services.copy_queue import DONE, FAILED, CopyQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = CopyQueue(str(tmp_path / "q" / "copy_queue.jsonl"), base_delay=0.05, max_delay=0.1, max_attempts=3)
+    yield q
+    q.stop()
+
+
+def _wait_for(q, status, timeout=5.0):
+    """
+    Слушатель очереди: (событие, {"job": задача}, timeout) — событие взводится,
+    когда какая-то задача приходит в статус status.
+    """
+    got = {}
+    ev = threading.Event()
+
+    def on_job(job):
+        if job.status == status:
+            got["job"] = job
+            ev.set()
+
+    q.add_listener(on_job)
+    return ev, got, timeout
+
+
+def test_delivers_and_removes_owned_source(queue, tmp_path):
+    src = queue.outbox_path("a.docx")
+    with open(src, "w", encoding="utf-8") as f:
+        f.write("протокол")
+    dst = str(tmp_path / "net" / "a.docx")
+
+    ev, got, timeout = _wait_for(queue, DONE)
+    queue.submit(src, dst, owned=True)
+    assert ev.wait(timeout)
+
+    with open(dst, encoding="utf-8") as f:
+        assert f.read() == "протокол"
+    assert not os.path.exists(src)
+    assert queue.jobs() == []
+    assert queue.pending_destinations() == set()
+
+
+def test_failed_copy_is_retried_then_dropped(queue, tmp_path):
+    blocker = tmp_path / "blocked"
+    blocker.write_text("")         # файл вместо папки — копирование всегда падает
+    src = tmp_path / "a.txt"
+    src.write_text("x")
+    dst = str(blocker / "a.txt")
+
+    ev, got, timeout = _wait_for(queue, FAILED)
+    queue.submit(str(src), dst)
+    assert ev.wait(timeout)
+    assert got["job"].attempts == 3
+    assert queue.summary()["failed"] == 1
+    assert os.path.normpath(dst) not in queue.pending_destinations()
+
+
+def test_pending_job_survives_restart(tmp_path):
+    journal = str(tmp_path / "q" / "copy_queue.jsonl")
+    blocker = tmp_path / "blocked"
+    blocker.write_text("")
+    src = tmp_path / "a.txt"
+    src.write_text("x")
+    dst = os.path.normpath(str(blocker / "a.txt"))
+
+    q = CopyQueue(journal, base_delay=60)
+    q.submit(str(src), dst)
+    q.stop()
+    assert dst in q.pending_destinations()
+
+    # сеть вернулась, программу перезапустили — задача подхватывается из журнала
+    blocker.unlink()
+    q2 = CopyQueue(journal, base_delay=60)
+    ev, got, timeout = _wait_for(q2, DONE)
+    q2.retry_now()      # старт: журнал поднимается, пауза после неудачи сбрасывается
+    try:
+        assert ev.wait(timeout)
+        assert got["job"].dst == dst
+        assert os.path.exists(dst)
+    finally:
+        q2.stop()
+
+
+def test_new_submit_replaces_undelivered_job(tmp_path):
+    q = CopyQueue(str(tmp_path / "q" / "copy_queue.jsonl"), base_delay=60)
+    blocker = tmp_path / "blocked"
+    blocker.write_text("")
+    src = tmp_path / "a.txt"
+    src.write_text("x")
+    dst = str(blocker / "a.txt")
+    try:
+        first = q.submit(str(src), dst)
+        second = q.submit(str(src), dst)
+        ids = [j.id for j in q.jobs()]
+        assert second.id in ids and first.id not in ids
+    finally:
+        q.stop()
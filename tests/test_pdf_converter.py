@@ -0,0 +1,176 @@
+import threading
+
+import pytest
+
+from services.pdf_converter import CANCELLED, DONE, FAILED, QUEUED, RUNNING, PdfConverter, StubBackend
+
+
+class _Factory:
+    """
+    Фабрика бэкендов для PdfConverter: запоминает все созданные заглушки (= запуски бэкенда).
+    """
+
+    def __init__(self, **stub_kwargs):
+        self.stub_kwargs = stub_kwargs
+        self.backends = []
+
+    def __call__(self):
+        backend = StubBackend(**self.stub_kwargs)
+        self.backends.append(backend)
+        return backend
+
+    @property
+    def calls(self):
+        return sum(len(b.calls) for b in self.backends)
+
+
+@pytest.fixture
+def docx(tmp_path):
+    path = tmp_path / "Протокол.docx"
+    path.write_bytes(b"docx")
+    return str(path)
+
+
+def test_statuses_reported_per_job(docx, tmp_path):
+    factory = _Factory()
+    conv = PdfConverter(factory)
+    seen = []
+    try:
+        pdf = conv.convert(docx, str(tmp_path / "out" / "a.pdf"),
+                           on_status=lambda job: seen.append(job.status), timeout=10)
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert seen == [QUEUED, RUNNING, DONE]
+    with open(pdf, "rb") as f:
+        assert f.read().startswith(b"%PDF")
+
+
+def test_backend_reused_and_restarted_every_n_jobs(docx, tmp_path):
+    factory = _Factory()
+    conv = PdfConverter(factory, restart_every=2)
+    try:
+        jobs = [conv.submit(docx, str(tmp_path / f"{i}.pdf")) for i in range(5)]
+        assert all(job.wait(10) for job in jobs)
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert [job.status for job in jobs] == [DONE] * 5
+    # 2 + 2 + 1: после каждой второй задачи бэкенд поднимается заново
+    assert [len(b.calls) for b in factory.backends] == [2, 2, 1]
+    assert all(b.starts == 1 for b in factory.backends)
+
+
+def test_failure_restarts_backend_and_retries(docx, tmp_path):
+    factory = _Factory(fail={1})     # первый вызов каждого экземпляра падает
+    conv = PdfConverter(factory, retries=1)
+    try:
+        job = conv.submit(docx, str(tmp_path / "a.pdf"))
+        assert job.wait(10)
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    # повтор на новом экземпляре тоже первый его вызов — задача падает после retries
+    assert job.status == FAILED
+    assert "stub" in job.error
+    assert len(factory.backends) == 2
+
+
+def test_retry_on_fresh_backend_succeeds(docx, tmp_path):
+    failing = StubBackend(fail={1})
+    backends = iter([failing, StubBackend()])
+    conv = PdfConverter(lambda: next(backends), retries=1)
+    seen = []
+    try:
+        job = conv.submit(docx, str(tmp_path / "a.pdf"), on_status=lambda j: seen.append(j.status))
+        assert job.wait(10)
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert job.status == DONE
+    assert seen == [QUEUED, RUNNING, DONE]    # повтор внутри задачи статусов не плодит
+    assert len(failing.calls) == 1
+
+
+def test_cancel_queued_job(docx, tmp_path):
+    release = threading.Event()
+
+    class _Slow(StubBackend):
+        def convert(self, docx_path, pdf_path):
+            release.wait(10)
+            super().convert(docx_path, pdf_path)
+
+    backend = _Slow()
+    conv = PdfConverter(lambda: backend)
+    try:
+        first = conv.submit(docx, str(tmp_path / "1.pdf"))
+        second = conv.submit(docx, str(tmp_path / "2.pdf"))
+        third = conv.submit(docx, str(tmp_path / "3.pdf"))
+        assert second.position >= 1
+
+        assert second.cancel()
+        release.set()
+        assert first.wait(10) and second.wait(10) and third.wait(10)
+        assert not first.cancel()        # уже идущую/готовую не снять
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert (first.status, second.status, third.status) == (DONE, CANCELLED, DONE)
+    assert len(backend.calls) == 2
+
+
+def test_stop_cancels_queued_jobs(docx, tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    class _Slow(StubBackend):
+        def convert(self, docx_path, pdf_path):
+            started.set()
+            release.wait(10)
+            super().convert(docx_path, pdf_path)
+
+    conv = PdfConverter(_Slow)
+    first = conv.submit(docx, str(tmp_path / "1.pdf"))
+    rest = [conv.submit(docx, str(tmp_path / f"{i}.pdf")) for i in range(2, 4)]
+    assert started.wait(10)
+    conv.stop()
+    release.set()
+    conv.stop(wait=True, timeout=10)
+
+    assert first.wait(10) and first.status == DONE
+    assert [job.status for job in rest] == [CANCELLED, CANCELLED]
+    with pytest.raises(RuntimeError):
+        conv.submit(docx, str(tmp_path / "late.pdf"))
+
+
+def test_idle_timeout_closes_backend(docx, tmp_path):
+    factory = _Factory()
+    closed = threading.Event()
+
+    def make():
+        backend = factory()
+        backend.close = closed.set
+        return backend
+
+    conv = PdfConverter(make, idle_timeout=0.1)
+    try:
+        conv.convert(docx, str(tmp_path / "a.pdf"), timeout=10)
+        assert closed.wait(5)             # простой — бэкенд закрыт, не дожидаясь stop()
+        closed.clear()
+        conv.convert(docx, str(tmp_path / "b.pdf"), timeout=10)
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert len(factory.backends) == 2     # после простоя поднимается заново
+
+
+def test_missing_docx_fails_without_backend(tmp_path):
+    factory = _Factory()
+    conv = PdfConverter(factory)
+    try:
+        job = conv.submit(str(tmp_path / "нет.docx"), str(tmp_path / "a.pdf"))
+    finally:
+        conv.stop(wait=True, timeout=10)
+
+    assert job.status == FAILED and job.finished
+    assert factory.backends == []
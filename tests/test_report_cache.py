@@ -0,0 +1,125 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from analysis import report_cache
+
+DAY = pd.Timestamp("2026-01-12")
+
+
+@pytest.fixture
+def reports(tmp_path):
+    reports_dir = tmp_path / "Протоколы"
+    reports_dir.mkdir()
+    docx = reports_dir / "Протокол результатов ГО 12.01.2026.docx"
+    pdf = reports_dir / "Протокол результатов ГО 12.01.2026.pdf"
+    docx.write_bytes(b"docx")
+    pdf.write_bytes(b"pdf")
+    return str(reports_dir), str(docx), str(pdf), str(tmp_path / "index")
+
+
+def _key(df=None):
+    df = pd.DataFrame({"a": [1, 2]}) if df is None else df
+    return report_cache.report_key("ГО", DAY, (df, None, None), "tpl", 1)
+
+
+def _record(reports_dir, docx, pdf, index_dir, key, backend="native"):
+    name = os.path.basename(docx)
+    report_cache.record(reports_dir, {name: report_cache.make_entry(key, docx, pdf, backend)}, index_dir=index_dir)
+    return name
+
+
+def test_key_depends_on_data():
+    assert _key() == _key()
+    assert _key() != _key(pd.DataFrame({"a": [1, 3]}))
+
+
+def test_hit_after_record(reports):
+    reports_dir, docx, pdf, index_dir = reports
+    name = _record(reports_dir, docx, pdf, index_dir, _key())
+
+    assert report_cache.lookup(reports_dir, name, _key(), "native", index_dir=index_dir) == (docx, pdf)
+    assert report_cache.lookup(reports_dir, name, _key(), None, index_dir=index_dir) == (docx, None)
+
+
+def test_index_is_local(reports):
+    reports_dir, docx, pdf, index_dir = reports
+    _record(reports_dir, docx, pdf, index_dir, _key())
+
+    assert len(os.listdir(reports_dir)) == 2     # в папке отчётов только сами протоколы
+    assert os.path.exists(report_cache.index_path(reports_dir, index_dir))
+
+
+def test_record_does_not_touch_reports_dir(reports, tmp_path):
+    _, docx, pdf, index_dir = reports
+    missing = str(tmp_path / "нет такой папки")
+    _record(missing, docx, pdf, index_dir, _key())
+
+    assert not os.path.exists(missing)
+    assert report_cache.lookup(missing, os.path.basename(docx), _key(), "native", index_dir=index_dir) == (docx, pdf)
+
+
+def test_miss_on_other_key_or_backend(reports):
+    reports_dir, docx, pdf, index_dir = reports
+    name = _record(reports_dir, docx, pdf, index_dir, _key())
+
+    assert report_cache.lookup(reports_dir, name, _key(pd.DataFrame({"a": [5]})), "native", index_dir=index_dir) is None
+    assert report_cache.lookup(reports_dir, name, _key(), "word", index_dir=index_dir) is None
+    # промах по ключу/способу PDF запись не выбрасывает
+    assert report_cache.lookup(reports_dir, name, _key(), "native", index_dir=index_dir) == (docx, pdf)
+
+
+@pytest.mark.parametrize("which", ["docx", "pdf"])
+def test_changed_file_is_miss_and_pruned(reports, which):
+    reports_dir, docx, pdf, index_dir = reports
+    name = _record(reports_dir, docx, pdf, index_dir, _key())
+
+    target = docx if which == "docx" else pdf
+    with open(target, "ab") as f:
+        f.write(b" edited")
+
+    assert report_cache.lookup(reports_dir, name, _key(), "native", index_dir=index_dir) is None
+    assert report_cache._load(report_cache.index_path(reports_dir, index_dir)) == {}
+
+
+def test_deleted_file_is_miss(reports):
+    reports_dir, docx, pdf, index_dir = reports
+    name = _record(reports_dir, docx, pdf, index_dir, _key())
+    os.remove(docx)
+
+    assert report_cache.lookup(reports_dir, name, _key(), None, index_dir=index_dir) is None
+
+
+def test_entry_signed_from_local_source(reports, tmp_path):
+    reports_dir, _, _, index_dir = reports
+    src = tmp_path / "outbox.docx"
+    src.write_bytes(b"queued")
+    dst = os.path.join(reports_dir, "Сводный.docx")
+    report_cache.record(reports_dir, {"Сводный.docx": report_cache.make_entry(_key(), dst, docx_src=str(src))},
+                        index_dir=index_dir)
+
+    # файла ещё нет в папке отчётов — промах
+    assert report_cache.lookup(reports_dir, "Сводный.docx", _key(), index_dir=index_dir) is None
+
+    report_cache.record(reports_dir, {"Сводный.docx": report_cache.make_entry(_key(), dst, docx_src=str(src))},
+                        index_dir=index_dir)
+    shutil.copy2(src, dst)      # как доставит очередь
+    assert report_cache.lookup(reports_dir, "Сводный.docx", _key(), index_dir=index_dir) == (dst, None)
+
+
+def test_pending_delivery_is_hit_without_stat(reports, tmp_path, monkeypatch):
+    reports_dir, _, _, index_dir = reports
+    src = tmp_path / "outbox.docx"
+    src.write_bytes(b"queued")
+    dst = os.path.join(str(tmp_path / "сеть лежит"), "Протокол.docx")
+    report_cache.record(reports_dir, {"Протокол.docx": report_cache.make_entry(_key(), dst, docx_src=str(src))},
+                        index_dir=index_dir)
+
+    def no_network(path):
+        raise AssertionError(f"stat по сети: {path}")
+
+    monkeypatch.setattr(report_cache, "file_signature", no_network)
+    assert report_cache.lookup(reports_dir, "Протокол.docx", _key(), index_dir=index_dir,
+                               pending={dst}) == (dst, None)
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from analysis import swabs_cache
+from analysis.swabs_journal import (
+    BUILDING_COL, DATE_COL, DEP_COL, SHEETS_DEFAULT, USED_COLUMNS, SwabsJournal,
+)
+
+
+def _book(tmp_path):
+    path = str(tmp_path / "Журнал смывов 2026.xlsx")
+    row = {"№ п/п": 1, DATE_COL: pd.Timestamp("2026-01-05"), DEP_COL: "ГО", BUILDING_COL: "1", "Примечание": "повтор"}
+    with pd.ExcelWriter(path, engine="openpyxl") as xw:
+        for sh in SHEETS_DEFAULT:
+            pd.DataFrame([row]).to_excel(xw, sheet_name=sh, index=False)
+    return path
+
+
+def test_column_sets_keep_separate_snapshots(tmp_path):
+    path = _book(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+
+    # экран мониторинга читает все колонки, report_batch — только нужные отчётам
+    for columns in (None, USED_COLUMNS):
+        j = SwabsJournal(path, columns=columns, cache_dir=cache_dir)
+        j.load()
+        assert not j.loaded_from_cache
+
+    for columns in (None, USED_COLUMNS):
+        j = SwabsJournal(path, columns=columns, cache_dir=cache_dir)
+        j.load()
+        assert j.loaded_from_cache, columns
+        assert ("Примечание" in j.data_by_sheet[SHEETS_DEFAULT[0]].columns) == (columns is None)
+
+    assert len([n for n in os.listdir(cache_dir) if n.endswith(".pkl")]) == 2
+
+
+def test_snapshot_path_depends_on_key(tmp_path):
+    path = str(tmp_path / "j.xlsx")
+    assert swabs_cache.snapshot_path(path, str(tmp_path), {"columns": None}) != \
+        swabs_cache.snapshot_path(path, str(tmp_path), {"columns": list(USED_COLUMNS)})
+    assert swabs_cache.snapshot_path(path, str(tmp_path), {"columns": None}) == \
+        swabs_cache.snapshot_path(path, str(tmp_path), {"columns": None})
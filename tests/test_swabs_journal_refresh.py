@@ -0,0 +1,103 @@
+import os
+
+import pandas as pd
+import pytest
+
+from analysis.swabs_journal import (
+    BUILDING_COL, CULTURE_COL, DATE_COL, DEP_COL, PLACE_COL, ROOM_COL, SHEETS_DEFAULT, SwabsJournal,
+)
+
+SHEET = SHEETS_DEFAULT[0]
+
+
+def _rows(n, start=0):
+    return [
+        {
+            DATE_COL: pd.Timestamp("2026-01-01") + pd.Timedelta(days=(start + i) % 28),
+            DEP_COL: f"Отделение {(start + i) % 3}",
+            BUILDING_COL: "1",
+            ROOM_COL: f"Палата {start + i}",
+            PLACE_COL: "Стол",
+            CULTURE_COL: "",
+        }
+        for i in range(n)
+    ]
+
+
+def _write(path, rows):
+    with pd.ExcelWriter(path, engine="openpyxl") as xw:
+        for sh in SHEETS_DEFAULT:
+            pd.DataFrame(rows if sh == SHEET else _rows(3)).to_excel(xw, sheet_name=sh, index=False)
+    # mtime с запасом вперёд: правка в пределах одного тика не должна выглядеть "unchanged"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def _cultures(journal):
+    df = journal.data_by_sheet[SHEET]
+    return dict(zip(df[ROOM_COL].astype(str), df[CULTURE_COL].astype(str)))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    rows = _rows(60)
+    path = str(tmp_path / "Журнал смывов 2026.xlsx")
+    _write(path, rows)
+    j = SwabsJournal(path, cache_dir=str(tmp_path / "cache"))
+    j.load()
+    return j, path, rows
+
+
+def test_unchanged(journal):
+    j, _, _ = journal
+    assert j.refresh() == "unchanged"
+
+
+def test_append_only(journal):
+    j, path, rows = journal
+    _write(path, rows + _rows(2, start=60))
+
+    assert j.refresh() == "append"
+    assert len(j.data_by_sheet[SHEET]) == 62
+    assert "Палата 61" in _cultures(j)
+
+
+@pytest.mark.parametrize("edited", [55, 10], ids=["recent-row", "old-row"])
+def test_edit_plus_append_is_full(journal, edited):
+    j, path, rows = journal
+    rows = [dict(r) for r in rows]
+    rows[edited][CULTURE_COL] = "S. aureus"
+    _write(path, rows + _rows(1, start=60))
+
+    assert j.refresh() == "full"
+    assert _cultures(j)[f"Палата {edited}"] == "S. aureus"
+    assert len(j.data_by_sheet[SHEET]) == 61
+
+
+def test_restored_snapshot_sees_old_edit(journal, tmp_path):
+    _, path, rows = journal
+    rows = [dict(r) for r in rows]
+    rows[3][CULTURE_COL] = "E. coli"
+    _write(path, rows + _rows(1, start=60))
+
+    j = SwabsJournal(path, cache_dir=str(tmp_path / "cache"))
+    assert j.restore_snapshot()
+    assert j.refresh() == "full"
+    assert _cultures(j)["Палата 3"] == "E. coli"
+
+
+def test_append_maps_new_rows_without_rebuilding_index(journal, monkeypatch):
+    j, path, rows = journal
+    mapping = {f"Отделение {i}": f"ОТД{i}" for i in range(3)}
+    j.apply_department_mapping(mapping)
+    _write(path, rows + _rows(3, start=60))
+
+    rebuilt = []
+    monkeypatch.setattr(SwabsJournal, "_build_index", lambda self: rebuilt.append(self))
+    assert j.refresh() == "append"
+
+    assert rebuilt == []
+    assert j.mapping == mapping      # экран (reload_journal) тогда не перепривязывает журнал
+    day = pd.Timestamp("2026-01-01") + pd.Timedelta(days=62 % 28)
+    rooms = set(j.filter_day("ОТД2", day, SHEET)[ROOM_COL].astype(str))
+    assert "Палата 62" in rooms
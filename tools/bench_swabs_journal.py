@@ -0,0 +1,368 @@
+"""
+Бенчмарки журнала смывов.
+
+  normalize — построчный apply vs векторная нормализация (сверка результатов + ускорение)
+  pipeline  — весь путь на синтетической книге с настоящими листами и шапками:
+              разбор xlsx, загрузка из снимка, привязка отделений, filter_day, build_docx_report
+              (с --pdf native — и PDF через reportlab);
+              по каждому этапу — время и пик памяти (tracemalloc)
+
+Запуск из корня проекта:
+    python tools/bench_swabs_journal.py normalize --rows 100000
+    python tools/bench_swabs_journal.py pipeline --rows 1000 10000 100000
+    python tools/bench_swabs_journal.py pipeline --rows 500000 --workdir D:\\bench --template D:\\шаблон.docx
+    python tools/bench_swabs_journal.py pipeline --rows 10000 --pdf native
+
+--workdir сохраняет сгенерированные книги между запусками (генерация 500k строк — минуты).
+Без --template отчёт строится по упрощённому шаблону той же структуры (три акта с таблицами).
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.swabs_journal import (  # noqa: E402
+    BUILDING_COL,
+    DATE_COL,
+    DEP_COL,
+    OMCH_COL,
+    PLACE_COL,
+    ROOM_COL,
+    SHEETS_DEFAULT,
+    SwabsJournal,
+    _clean_text,
+    _clean_text_series,
+    _to_date,
+    _to_date_series,
+)
+
+
+DEPARTMENTS = [
+    "1АФО", " 1 АФО ", "АО", "1ОАПБ", "2ОАПБ", "ГО", "ХО\xa0", "ОРИТН",
+    "Оперблок 2 этаж", "оперблок  6 эт.", "Оперблок 4​этаж", "ОПЕРБЛОК 3",
+    "ОАР\n", "Клиническая\tгенетика", "ОРИТН_ФПЦ", "ОН1", "Пищеблок",
+]
+BUILDINGS = ["Главный", "главный корпус", "ФПЦ", "КДЦ", "Надстройка", "", None]
+
+# оперблоки так, как их реально пишут в журнале: _canon_operblock должен разобрать этаж и корпус
+OPERBLOCKS = [
+    ("Оперблок 2 этаж", "Главный корпус"),
+    ("оперблок  6 эт.", "ФПЦ"),
+    ("ОПЕРБЛОК 6 ЭТАЖ", " главный "),
+    ("Оперблок 4\u200bэтаж", "КДЦ"),
+    ("оперблок 3 эт", "Надстройка"),
+    ("Оперблок\xa05 этаж", "Главный"),
+    ("Оперблок №8", "главный корпус"),
+    ("Оперблок 7 этаж", "Главный"),      # такого этажа нет — уходит в ручную привязку
+    ("оперблок", "ФПЦ"),                 # без этажа
+]
+
+ROOMS = ["Палата 1", "Палата 2", "Процедурная", "Пост медсестры", "Операционная №1",
+         "Перевязочная", "Манипуляционная", "Санитарная комната", "Буфет"]
+PLACES = ["Стол", "Руки", "Кран", "Кушетка", "Дверная ручка", "Тумбочка", "Монитор", "Халат"]
+CULTURES = ["-", "-", "-", "", None, "—", "S. aureus", "Klebsiella pneumoniae",
+            "E. coli", "Pseudomonas aeruginosa", "Acinetobacter baumannii"]
+CONDITIONS = ["до", "после", "до работы", "после уборки"]
+STAFF = [f"{s} {i}.{o}." for s in ("Иванова", "Петрова", "Сидоров", "Кузнецова", "Смирнов")
+         for i in "АВЕМН" for o in "АИП"]
+
+CULTURE_COL_FULL = "Выделенная культура (эпид.значимая)"
+COND_COL_FULL = "Условия отбора (до/после)"
+FIO_COL_FULL = "ФИО сотрудника"
+
+# лишние колонки реального журнала: их должен отсекать usecols
+SHEET_HEADERS = {
+    "Абиотические": ["№ п/п", DATE_COL, DEP_COL, BUILDING_COL, ROOM_COL, PLACE_COL, CULTURE_COL_FULL, "Примечание"],
+    "Воздух": ["№ п/п", DATE_COL, DEP_COL, BUILDING_COL, ROOM_COL, COND_COL_FULL, OMCH_COL, CULTURE_COL_FULL],
+    "Персонал": ["№ п/п", DATE_COL, DEP_COL, BUILDING_COL, FIO_COL_FULL, PLACE_COL, CULTURE_COL_FULL],
+}
+SHEET_SHARE = {"Абиотические": 0.70, "Воздух": 0.18, "Персонал": 0.12}
+
+
+def _format_date_cell(rnd: random.Random, d: dt.date):
+    kind = rnd.random()
+    if kind < 0.6:
+        return dt.datetime(d.year, d.month, d.day)
+    if kind < 0.85:
+        return d.strftime("%d.%m.%Y")
+    if kind < 0.95:
+        return d.strftime("%d.%m.%Y") + " г."
+    if kind < 0.98:
+        return d.strftime("%Y-%m-%d")
+    return None
+
+
+def _random_date_cell(rnd: random.Random, base: dt.date):
+    return _format_date_cell(rnd, base + dt.timedelta(days=rnd.randrange(0, 365)))
+
+
+def synthetic_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    base = dt.date(2026, 1, 1)
+    return pd.DataFrame({
+        "Дата исследования": [_random_date_cell(rnd, base) for _ in range(rows)],
+        "Подразделение": [rnd.choice(DEPARTMENTS) for _ in range(rows)],
+        "Корпус": [rnd.choice(BUILDINGS) for _ in range(rows)],
+    })
+
+
+# -------------------------
+# синтетическая книга и шаблон
+# -------------------------
+
+def _sampling_events(rnd: random.Random, rows: int, year: int) -> list:
+    """
+    Выезды на отбор: (отделение, корпус, дата). Строки листов раскладываются по ним,
+    поэтому на (отделение, день) приходится пачка строк — как в настоящем журнале.
+    """
+    base = dt.date(year, 1, 1)
+    events = []
+    for _ in range(max(1, rows // 12)):
+        if rnd.random() < 0.3:
+            dep, building = rnd.choice(OPERBLOCKS)
+        else:
+            dep, building = rnd.choice(DEPARTMENTS), rnd.choice(BUILDINGS)
+        events.append((dep, building, base + dt.timedelta(days=rnd.randrange(0, 365))))
+    return events
+
+
+def _sheet_frame(rnd: random.Random, sh: str, n: int, events: list) -> pd.DataFrame:
+    picked = sorted((rnd.choice(events) for _ in range(n)), key=lambda e: e[2])
+    cols = {
+        "№ п/п": list(range(1, n + 1)),
+        DATE_COL: [_format_date_cell(rnd, e[2]) for e in picked],
+        DEP_COL: [e[0] for e in picked],
+        BUILDING_COL: [e[1] for e in picked],
+        ROOM_COL: [rnd.choice(ROOMS) for _ in range(n)],
+        PLACE_COL: [rnd.choice(PLACES) for _ in range(n)],
+        CULTURE_COL_FULL: [rnd.choice(CULTURES) for _ in range(n)],
+        COND_COL_FULL: [rnd.choice(CONDITIONS) for _ in range(n)],
+        OMCH_COL: [rnd.randrange(0, 600) for _ in range(n)],
+        FIO_COL_FULL: [rnd.choice(STAFF) for _ in range(n)],
+        "Примечание": [rnd.choice(["", "", "повтор", None]) for _ in range(n)],
+    }
+    return pd.DataFrame({c: cols[c] for c in SHEET_HEADERS[sh]})
+
+
+def write_workbook(path: str, rows: int, seed: int = 42, year: int = 2026) -> str:
+    """
+    Книга журнала на rows строк (по всем листам) с настоящими названиями листов и шапками.
+    """
+    rnd = random.Random(seed)
+    events = _sampling_events(rnd, rows, year)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with pd.ExcelWriter(path) as w:
+        for sh in SHEETS_DEFAULT:
+            n = max(1, int(rows * SHEET_SHARE[sh]))
+            _sheet_frame(rnd, sh, n, events).to_excel(w, sheet_name=sh, index=False)
+    return path
+
+
+def write_template(path: str) -> str:
+    """
+    Упрощённый шаблон протокола: три акта (смывы/воздух/персонал), в каждом строка
+    "Дата отбора проб: ...", абзац отделения и таблица с шапкой — этого хватает build_docx_report.
+    """
+    from docx import Document
+
+    acts = [
+        ("АКТ отбора смывов", ["№", "Наименование помещения", "Место отбора проб", "Выделенная культура"]),
+        ("АКТ отбора проб воздуха", ["№", "Наименование помещения", "Условия отбора", "ОМЧ", "Выделенная культура"]),
+        ("АКТ отбора мазков у персонала", ["№", "ФИО сотрудника", "Место отбора проб", "Выделенная культура"]),
+    ]
+    doc = Document()
+    for title, header in acts:
+        doc.add_paragraph(title)
+        doc.add_paragraph("Дата отбора проб: __.__.____")
+        doc.add_paragraph("Отделение")
+        table = doc.add_table(rows=1, cols=len(header))
+        for cell, text in zip(table.rows[0].cells, header):
+            cell.text = text
+        doc.add_paragraph("")
+    doc.save(path)
+    return path
+
+
+# -------------------------
+# замеры
+# -------------------------
+
+def _timeit(fn):
+    t0 = time.perf_counter()
+    res = fn()
+    return res, time.perf_counter() - t0
+
+
+def _measure(fn, trace: bool = True):
+    """
+    (результат, секунды, пик памяти в байтах или None). Под tracemalloc код медленнее —
+    для чистого времени есть --no-trace.
+    """
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        res = fn()
+        wall = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return res, wall, peak
+
+
+def _mb(n) -> str:
+    return "-" if n is None else f"{n / 2 ** 20:.1f}"
+
+
+def _print_stage(rows: int, stage: str, wall: float, peak, note: str = "") -> None:
+    print(f"{rows:>8} {stage:<14} {wall:>9.3f} s {_mb(peak):>9} MB  {note}")
+
+
+def bench_normalize(rows: int) -> None:
+    df = synthetic_frame(rows)
+
+    old_dates, t_old_d = _timeit(lambda: df["Дата исследования"].apply(_to_date))
+    old_dep, t_old_t1 = _timeit(lambda: df["Подразделение"].apply(_clean_text))
+    old_b, t_old_t2 = _timeit(lambda: df["Корпус"].apply(_clean_text))
+
+    new_dates, t_new_d = _timeit(lambda: _to_date_series(df["Дата исследования"]))
+    new_dep, t_new_t1 = _timeit(lambda: _clean_text_series(df["Подразделение"]))
+    new_b, t_new_t2 = _timeit(lambda: _clean_text_series(df["Корпус"]))
+
+    old_dates = pd.to_datetime(old_dates)
+    assert old_dates.equals(new_dates), "_date отличается"
+    assert old_dep.equals(new_dep), "_dep_raw_clean отличается"
+    assert old_b.equals(new_b), "_building_clean отличается"
+
+    def _row(name, t_old, t_new):
+        speedup = t_old / t_new if t_new else float("inf")
+        print(f"{name:<18} {t_old:>9.3f} s {t_new:>9.3f} s {speedup:>8.1f}x")
+
+    print(f"rows: {rows}")
+    print(f"{'stage':<18} {'apply':>11} {'vector':>11} {'speedup':>9}")
+    _row("_date", t_old_d, t_new_d)
+    _row("_dep_raw_clean", t_old_t1, t_new_t1)
+    _row("_building_clean", t_old_t2, t_new_t2)
+    _row("total", t_old_d + t_old_t1 + t_old_t2, t_new_d + t_new_t1 + t_new_t2)
+
+
+def bench_pipeline(rows: int, workdir: str, template: str, *, seed: int = 42, engine: str = "auto",
+                   days: int = 200, reports: int = 5, pdf: str | None = None, trace: bool = True) -> None:
+    from analysis.report_builder import build_docx_report
+
+    book = os.path.join(workdir, f"journal_{rows}_{seed}.xlsx")
+    if not os.path.exists(book):
+        _, t_gen = _timeit(lambda: write_workbook(book, rows, seed))
+        print(f"{rows:>8} {'(генерация)':<14} {t_gen:>9.3f} s")
+
+    cache_dir = os.path.join(workdir, f"cache_{rows}_{seed}")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def _journal():
+        return SwabsJournal(path=book, cache_dir=cache_dir, engine=engine)
+
+    j, wall, peak = _measure(lambda: _load(_journal()), trace)
+    _print_stage(rows, "load", wall, peak, f"разбор xlsx, engine={engine}")
+
+    j, wall, peak = _measure(lambda: _load(_journal()), trace)
+    _print_stage(rows, "load (снимок)", wall, peak, f"из снимка: {j.loaded_from_cache}")
+
+    mem = j.memory_report()
+    stored = sum(r["bytes"] for r in mem.values())
+    as_object = sum(r["bytes_object"] for r in mem.values())
+    print(f"{rows:>8} {'(память)':<14} {_mb(stored):>9} MB в кадрах, {_mb(as_object)} MB без категорий")
+
+    mapping = {d: _clean_text(d).upper() for d in j.unique_raw_departments()}
+    _, wall, peak = _measure(lambda: j.apply_department_mapping(mapping), trace)
+    _print_stage(rows, "mapping", wall, peak, f"{len(mapping)} отделений")
+
+    rnd = random.Random(seed)
+    pairs = [(dep, d) for dep in sorted(set(mapping.values())) for d in j.list_dates_for_department(dep)]
+    pairs = rnd.sample(pairs, min(days, len(pairs)))
+
+    def _filter_all():
+        return [[j.filter_day(dep, d, sh) for sh in j.sheets] for dep, d in pairs]
+
+    frames, wall, peak = _measure(_filter_all, trace)
+    per_call = wall / max(1, len(pairs) * len(j.sheets)) * 1000
+    _print_stage(rows, "filter_day", wall, peak, f"{len(pairs)} дней x {len(j.sheets)} листа, {per_call:.2f} мс/вызов")
+
+    chosen = [(p, f) for p, f in zip(pairs, frames) if any(not x.empty for x in f)][:reports]
+    out_dir = os.path.join(workdir, f"reports_{rows}_{seed}")
+
+    def _reports():
+        # сообщения о несохранённых копиях/PDF глушим — мерим только время
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [
+                build_docx_report(
+                    template, os.path.join(out_dir, f"{dep}_{d:%d.%m.%Y}.docx"), dep, d, sw, air, sm,
+                    auto_word_dir=os.path.join(out_dir, "word"), auto_pdf_dir=os.path.join(out_dir, "pdf"),
+                    pdf_backend=pdf,
+                )
+                for (dep, d), (sw, air, sm) in chosen
+            ]
+
+    built, wall, peak = _measure(_reports, trace)
+    note = f"{len(chosen)} протокол(а) DOCX"
+    if pdf:
+        note += f" + PDF ({pdf}): {sum(1 for r in built if r[2])} готово"
+    _print_stage(rows, "report", wall, peak, note)
+
+
+def _load(j: SwabsJournal) -> SwabsJournal:
+    j.load()
+    return j
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("suite", nargs="?", choices=("normalize", "pipeline"), default="normalize")
+    ap.add_argument("--rows", type=int, nargs="+", help="строк в книге (можно несколько: 1000 10000 500000)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--engine", default="auto", help="чем читать xlsx (см. SwabsJournal.engine)")
+    ap.add_argument("--days", type=int, default=200, help="сколько (отделение, день) выбирать в filter_day")
+    ap.add_argument("--reports", type=int, default=5, help="сколько протоколов строить")
+    ap.add_argument("--pdf", choices=("word", "libreoffice", "native"), help="делать и PDF протоколов (по умолчанию — только DOCX)")
+    ap.add_argument("--template", help="шаблон протокола .docx (по умолчанию — упрощённый синтетический)")
+    ap.add_argument("--workdir", help="папка для книг/снимков/протоколов (сохраняется между запусками)")
+    ap.add_argument("--no-trace", action="store_true", help="без tracemalloc: чистое время, без пика памяти")
+    args = ap.parse_args()
+
+    if args.suite == "normalize":
+        for rows in args.rows or [100_000]:
+            bench_normalize(rows)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_swabs_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        template = args.template or write_template(os.path.join(workdir, "template.docx"))
+        print(f"{'rows':>8} {'stage':<14} {'wall':>11} {'peak':>12}")
+        for rows in args.rows or [1_000, 10_000, 100_000]:
+            bench_pipeline(
+                rows, workdir, template, seed=args.seed, engine=args.engine,
+                days=args.days, reports=args.reports, pdf=args.pdf, trace=not args.no_trace,
+            )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
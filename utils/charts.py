@@ -1,3 +1,12 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
 def reset_canvas(current_canvas):
     if current_canvas.get("obj"):
         current_canvas["obj"].get_tk_widget().destroy()
@@ -94,3 +103,210 @@ def stacked_barh(
             linewidth=linewidth
         )
         left = [l + v for l, v in zip(left, values)]
+
+
+# -------------------------
+# графики для DOCX: описание -> PNG в памяти
+# -------------------------
+
+def fmt_number(v) -> str:
+    """
+    12.0 -> "12", 12.5 -> "12.5" (подписи процентов).
+    """
+    return str(int(v)) if float(v).is_integer() else str(v)
+
+
+def fmt_percent(v) -> str:
+    return f"{v}%"
+
+
+# value_fmt в ChartSpec — имя, а не функция: описание уходит в другой процесс
+VALUE_FORMATS = {"number": fmt_number, "percent": fmt_percent}
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """
+    Описание графика отчёта — только данные (кортежи/строки/числа): годится ключом кеша
+    и передаётся в процесс пула вместе с задачей (пакет отчётов по отделениям). Рисует render_chart_png.
+
+    kind: "barh" / "bar" — barh_with_value_labels / bar_with_value_labels по labels/values;
+          "stacked" — stacked_barh: labels — строки, values — итоги строк,
+          series — слои по порядку, stacks — [(слой, значение), ...] для каждой строки.
+    colors — подпись (или слой) -> цвет; пусто — цвета matplotlib по умолчанию.
+    figsize/dpi — размер отдельного PNG; в chart_figure размер задаёт вся фигура.
+    """
+    kind: str
+    title: str
+    labels: Tuple[str, ...] = ()
+    values: Tuple[float, ...] = ()
+    xlabel: str = ""
+    value_fmt: Optional[str] = None
+    series: Tuple[str, ...] = ()
+    stacks: Tuple[Tuple[Tuple[str, int], ...], ...] = ()
+    colors: Tuple[Tuple[str, str], ...] = ()
+    legend_title: str = ""
+    figsize: Tuple[float, float] = (8.5, 5.0)
+    dpi: int = 130
+
+
+def _draw_stacked(ax, spec: ChartSpec) -> None:
+    groups_items = [[{"name": n, "count": c} for n, c in row] for row in spec.stacks]
+    stacked_barh(ax, list(spec.labels), list(spec.series), groups_items, colors_map=dict(spec.colors))
+
+    totals = list(spec.values)
+    max_total = max(totals) if totals else 0
+    for i, total in enumerate(totals):
+        ax.text(
+            total + (max_total * 0.01 + 0.5 if max_total else 0.5),
+            i,
+            str(total),
+            va="center",
+            fontsize=9,
+            fontweight="bold"
+        )
+
+    ax.set_title(spec.title)
+    ax.set_xlabel(spec.xlabel)
+    ax.set_xlim(0, max_total * 1.2 if max_total else 10)
+    ax.legend(
+        title=spec.legend_title,
+        fontsize=8,
+        bbox_to_anchor=(1.02, 1),
+        loc="upper left"
+    )
+
+
+def _draw_axes(ax, spec: ChartSpec) -> None:
+    value_fmt = VALUE_FORMATS.get(spec.value_fmt) if spec.value_fmt else None
+    colors = None
+    if spec.colors:
+        colors_map = dict(spec.colors)
+        colors = [colors_map.get(label, "#cccccc") for label in spec.labels]
+
+    if spec.kind == "barh":
+        barh_with_value_labels(ax, list(spec.labels), list(spec.values),
+                               title=spec.title, xlabel=spec.xlabel, colors=colors, value_fmt=value_fmt)
+    elif spec.kind == "bar":
+        bar_with_value_labels(ax, list(spec.labels), list(spec.values),
+                              title=spec.title, colors=colors, value_fmt=value_fmt)
+    elif spec.kind == "stacked":
+        _draw_stacked(ax, spec)
+    else:
+        raise ValueError(f"Неизвестный тип графика: {spec.kind}")
+
+
+def draw_charts(fig, specs: Sequence[ChartSpec]) -> None:
+    """
+    Рисует specs на фигуре рядом, слева направо (одна строка подграфиков).
+    """
+    for i, spec in enumerate(specs, start=1):
+        _draw_axes(fig.add_subplot(1, len(specs), i), spec)
+    fig.tight_layout()
+
+
+def draw_chart(fig, spec: ChartSpec) -> None:
+    """
+    Рисует spec на фигуре.
+    """
+    draw_charts(fig, [spec])
+
+
+def render_chart_png(spec: ChartSpec) -> bytes:
+    """
+    PNG графика в памяти (Agg, без окна и без временных файлов).
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec.figsize, dpi=spec.dpi)
+    FigureCanvasAgg(fig)
+    draw_chart(fig, spec)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_charts_png(specs: Sequence[ChartSpec]) -> List[bytes]:
+    """
+    PNG для всех specs (в том же порядке). Уже нарисованные за сессию берутся из кеша,
+    остальные рисуются здесь же по очереди: окно вызывает это из фонового потока, а пул
+    процессов на пять графиков дороже самих графиков (каждый процесс заново грузит
+    matplotlib и шрифты).
+    """
+    specs = list(specs)
+    keys = [chart_key([spec]) for spec in specs]
+    images: Dict[str, bytes] = {}
+    for key, spec in zip(keys, specs):
+        if key in images:
+            continue    # одинаковые графики в одном отчёте — один раз
+        png = _cache_get(_PNGS, key)
+        if png is None:
+            png = render_chart_png(spec)
+            _cache_put(_PNGS, key, png, _PNGS_MAX)
+        images[key] = png
+    return [images[key] for key in keys]
+
+
+# -------------------------
+# кеш графиков на сессию
+# -------------------------
+
+# ключ chart_key -> PNG (отчёты DOCX) / Figure (вкладки). Порядок dict — порядок
+# использования: попадание переносит запись в конец, вытесняется самая давняя.
+_PNGS: Dict[str, bytes] = {}
+_PNGS_MAX = 64
+_FIGURES: Dict[str, object] = {}
+_FIGURES_MAX = 12
+_CHARTS_LOCK = threading.Lock()
+
+
+def chart_key(specs: Sequence[ChartSpec], figsize: Optional[Tuple[float, float]] = None,
+              dpi: Optional[int] = None) -> str:
+    """
+    sha1 от типа, подписей, значений, цветов и размера графиков (всех полей ChartSpec).
+    figsize/dpi — размер общей фигуры (chart_figure); None — размер из самого spec.
+    """
+    h = hashlib.sha1(repr((tuple(specs), figsize, dpi)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cache_get(store: Dict[str, object], key: str):
+    with _CHARTS_LOCK:
+        value = store.pop(key, None)
+        if value is not None:
+            store[key] = value
+        return value
+
+
+def _cache_put(store: Dict[str, object], key: str, value, limit: int) -> None:
+    with _CHARTS_LOCK:
+        store.pop(key, None)
+        while len(store) >= limit:
+            store.pop(next(iter(store)))
+        store[key] = value
+
+
+def chart_figure(specs: Sequence[ChartSpec], *, figsize: Tuple[float, float] = (11, 6), dpi: int = 100):
+    """
+    Готовая Figure с графиками specs рядом — для FigureCanvasTkAgg во вкладках.
+    Та же фигура возвращается, пока данные не изменились: переключение вкладок и режимов
+    не строит график заново. Фигура показывается в одном холсте за раз — новый
+    FigureCanvasTkAgg перецепляет её к себе; вызывать только из потока Tk.
+    """
+    from matplotlib.figure import Figure
+
+    specs = list(specs)
+    key = chart_key(specs, figsize, dpi)
+    fig = _cache_get(_FIGURES, key)
+    if fig is None:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        draw_charts(fig, specs)
+        _cache_put(_FIGURES, key, fig, _FIGURES_MAX)
+    return fig
+
+
+def clear_chart_cache() -> None:
+    with _CHARTS_LOCK:
+        _PNGS.clear()
+        _FIGURES.clear()
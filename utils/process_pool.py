@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import os
+import sys
+from contextlib import contextmanager
+from typing import Optional
+
+
+@contextmanager
+def spawn_without_main():
+    """
+    На Windows процесс пула (spawn) заново исполняет главный модуль, а microbio_app
+    на уровне модуля создаёт окно Tk. Воркерам главный модуль не нужен (их функции лежат
+    в analysis/...), поэтому на время запуска процессов (submit) прячем __main__.__file__/__spec__ —
+    тогда spawn его не импортирует.
+    """
+    main = sys.modules.get("__main__")
+    saved = {k: main.__dict__[k] for k in ("__file__", "__spec__") if main is not None and k in main.__dict__}
+    try:
+        if main is not None:
+            main.__dict__.pop("__file__", None)
+            if "__spec__" in saved:
+                main.__spec__ = None
+        yield
+    finally:
+        if main is not None:
+            main.__dict__.update(saved)
+
+
+def pool_size(jobs: int, workers: Optional[int] = None) -> int:
+    """
+    Сколько процессов запускать под jobs задач: не больше задач и (по умолчанию) ядер.
+    <= 1 — пул не нужен, считаем в текущем потоке.
+    """
+    return max(0, min(jobs, workers or os.cpu_count() or 1))